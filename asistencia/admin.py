@@ -1,13 +1,47 @@
+from django import forms
 from django.contrib import admin
+from .archivo import PeriodoArchivado, verificar_abierto
 from .models import Proyecto, Trabajador, Asistencia
 from .models import Dispositivo
 
+
+class AsistenciaAdminForm(forms.ModelForm):
+    """Un mes archivado (archivo.py) no se edita desde el admin: error de formulario, no 500."""
+    class Meta:
+        model = Asistencia
+        fields = '__all__'
+
+    def clean(self):
+        datos = super().clean()
+        proyecto, fecha = datos.get('proyecto'), datos.get('fecha')
+        if proyecto is not None and fecha is not None:
+            try:
+                verificar_abierto({(proyecto.pk, fecha)})
+            except PeriodoArchivado as e:
+                raise forms.ValidationError({'fecha': str(e)})
+        return datos
+
+
+class AsistenciaAdmin(admin.ModelAdmin):
+    form = AsistenciaAdminForm
+
+
 admin.site.register(Proyecto)
 admin.site.register(Trabajador)
-admin.site.register(Asistencia)
+admin.site.register(Asistencia, AsistenciaAdmin)
 from django.contrib import admin
-from .models import Dispositivo, SesionAsistencia
+from .models import Dispositivo, SesionAsistencia, EscaneoQR
+from .models import ResumenDiarioProyecto, ResumenMensualTrabajador, Horario, Cambio, AsistenciaMensual
+from .models import AsistenciaArchivada, RevocacionQR
 
 # Registra ambos modelos para que los veas en el panel de Admin
 admin.site.register(Dispositivo)
 admin.site.register(SesionAsistencia)
+admin.site.register(EscaneoQR)
+admin.site.register(ResumenDiarioProyecto)
+admin.site.register(ResumenMensualTrabajador)
+admin.site.register(Horario)
+admin.site.register(Cambio)
+admin.site.register(AsistenciaMensual)
+admin.site.register(AsistenciaArchivada)
+admin.site.register(RevocacionQR)
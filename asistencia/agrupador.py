@@ -0,0 +1,117 @@
+"""
+Agrupación de escaneos QR concurrentes para la ruta ASGI.
+
+Al inicio de turno cientos de escaneos llegan a la vez; grabados de a uno,
+cada uno abre su transacción y espera su turno en el único escritor de
+SQLite. La vista async (views.registrar_qr_async_view) deja su escaneo en
+la cola del event loop y espera su resultado; un consumidor toma todo lo
+que se acumuló (hasta ASISTENCIA_ESCANEO_LOTE, esperando a lo más
+ASISTENCIA_ESCANEO_VENTANA_MS a que lleguen más) y lo graba con
+registro.registrar_escaneos en una sola transacción.
+
+Las escrituras corren en un único hilo propio (un escritor, como SQLite):
+mientras un lote se graba, el siguiente se va juntando, así que el tamaño
+de los lotes crece solo con la carga y un escaneo aislado no espera a
+nadie. Si un lote falla se reintenta escaneo por escaneo, para que uno
+inválido no arrastre a los demás. `manage.py bench_escaneo_async` compara
+contra la ruta WSGI.
+"""
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .registro import registrar_escaneos
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def _hilo_escritor():
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tasal-escaneos")
+    return _escritor
+
+
+def _grabar(escaneos):
+    """Graba el lote; devuelve por escaneo su Clasificacion o la excepción que lo rechazó."""
+    close_old_connections()
+    try:
+        return registrar_escaneos(escaneos)
+    except Exception as error:
+        if len(escaneos) == 1:
+            return [error]
+    resultados = []
+    for escaneo in escaneos:
+        try:
+            resultados.append(registrar_escaneos([escaneo])[0])
+        except Exception as error:
+            resultados.append(error)
+    return resultados
+
+
+class AgrupadorEscaneos:
+    """Cola de escaneos de un event loop y su consumidor."""
+
+    def __init__(self, lote=None, ventana_ms=None):
+        self.lote = lote or getattr(settings, "ASISTENCIA_ESCANEO_LOTE", 100)
+        self.ventana = (ventana_ms if ventana_ms is not None
+                        else getattr(settings, "ASISTENCIA_ESCANEO_VENTANA_MS", 0)) / 1000
+        self._cola = asyncio.Queue()
+        self._consumidor = None
+        self.lotes = 0
+        self.escaneos = 0
+
+    async def registrar(self, trabajador_id, dispositivo_id, proyecto_id, ahora):
+        """Encola el escaneo y devuelve su Clasificacion cuando su lote se confirma."""
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.put_nowait(((trabajador_id, dispositivo_id, proyecto_id, ahora), futuro))
+        if self._consumidor is None or self._consumidor.done():
+            self._consumidor = asyncio.create_task(self._consumir())
+        return await futuro
+
+    def _tomar(self, pendientes):
+        while len(pendientes) < self.lote and not self._cola.empty():
+            pendientes.append(self._cola.get_nowait())
+
+    async def _consumir(self):
+        # Termina con la cola vacía; registrar() lo vuelve a lanzar
+        loop = asyncio.get_running_loop()
+        while not self._cola.empty():
+            pendientes = []
+            self._tomar(pendientes)
+            if self.ventana and len(pendientes) < self.lote:
+                await asyncio.sleep(self.ventana)
+                self._tomar(pendientes)
+            try:
+                resultados = await loop.run_in_executor(
+                    _hilo_escritor(), _grabar, [escaneo for escaneo, _ in pendientes]
+                )
+            except Exception as error:  # p. ej. el hilo escritor ya se cerró
+                resultados = [error] * len(pendientes)
+            self.lotes += 1
+            self.escaneos += len(pendientes)
+            for (_, futuro), resultado in zip(pendientes, resultados):
+                if futuro.done():  # la petición se canceló
+                    continue
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+
+_agrupadores = weakref.WeakKeyDictionary()
+
+
+def agrupador():
+    """El AgrupadorEscaneos del event loop en curso (uno por loop)."""
+    loop = asyncio.get_running_loop()
+    instancia = _agrupadores.get(loop)
+    if instancia is None:
+        instancia = _agrupadores[loop] = AgrupadorEscaneos()
+    return instancia
@@ -0,0 +1,226 @@
+"""
+Archivo de asistencia histórica (tablas vivas / frías).
+
+Los meses cerrados de un proyecto (más antiguos que ASISTENCIA_ARCHIVO_MESES)
+salen de Asistencia y SesionAsistencia y quedan en una fila de
+AsistenciaArchivada: las columnas de ese mes en JSON comprimido con zlib.
+Así las tablas vivas, sus índices y los listados sin filtro solo cargan el
+periodo reciente.
+
+- archivar_mes / restaurar_mes: un proyecto-mes por transacción, para que
+  el bloqueo de escritura de SQLite dure lo que tarda un mes y no todo el
+  histórico (`manage.py archivar`).
+- Lectura transparente: los resúmenes y la asistencia compacta del mes se
+  conservan, así que exportación y tableros no cambian; el reporte de
+  nómina completa las filas con archivadas() (reportes.py).
+- verificar_abierto: las escrituras sobre un mes archivado se rechazan
+  (PeriodoArchivado) hasta restaurarlo; sus resúmenes ya no podrían
+  recalcularse desde las tablas vivas. El mes en curso y el anterior nunca
+  se archivan, así que el registro diario no paga la verificación.
+
+Los borrados del archivado no pasan por señales: el mes no cambia, solo de
+tabla. Al restaurar se omiten las filas de trabajadores o dispositivos que
+ya no existen.
+"""
+import json
+import zlib
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Asistencia, AsistenciaArchivada, Dispositivo, SesionAsistencia, Trabajador
+from .resumenes import fin_de_mes, inicio_de_mes
+
+# El mes en curso y el anterior siguen abiertos (nómina en proceso)
+MESES_ABIERTOS = 2
+
+
+class PeriodoArchivado(Exception):
+    """Se intentó escribir asistencia en un mes archivado."""
+
+
+def restar_meses(mes, n):
+    total = mes.year * 12 + mes.month - 1 - n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def corte(meses):
+    """Primer mes que sigue vivo: se archiva lo anterior."""
+    return restar_meses(inicio_de_mes(timezone.localdate()), max(meses, MESES_ABIERTOS) - 1)
+
+
+def meses_archivados(dias):
+    """
+    Consulta (sin ejecutar) de los (proyecto_id, mes) archivados entre los
+    (proyecto_id, fecha) de `dias`; None si todos caen en meses abiertos.
+    """
+    primer_abierto = corte(MESES_ABIERTOS)
+    antiguos = {(p, inicio_de_mes(f)) for p, f in dias if f < primer_abierto}
+    if not antiguos:
+        return None
+    condicion = Q()
+    for proyecto_id, mes in antiguos:
+        condicion |= Q(proyecto_id=proyecto_id, mes=mes)
+    return AsistenciaArchivada.objects.filter(condicion).values_list("proyecto_id", "mes")
+
+
+def periodo_archivado(proyecto_id, mes):
+    return PeriodoArchivado(
+        f"El mes {mes:%Y-%m} del proyecto {proyecto_id} está archivado; "
+        f"restáurelo con `manage.py archivar --restaurar`."
+    )
+
+
+def verificar_abierto(dias):
+    """Lanza PeriodoArchivado si algún (proyecto_id, fecha) cae en un mes archivado."""
+    archivados = meses_archivados(dias)
+    archivado = archivados.first() if archivados is not None else None
+    if archivado:
+        raise periodo_archivado(*archivado)
+
+
+# =======================================================
+# Codificación
+# =======================================================
+def _codificar(asistencias, sesiones):
+    datos = {
+        "asistencias": [list(columna) for columna in zip(*asistencias)] if asistencias else [],
+        "sesiones": [list(columna) for columna in zip(*sesiones)] if sesiones else [],
+    }
+    return zlib.compress(json.dumps(datos, separators=(",", ":"), default=_iso).encode(), 9)
+
+
+def _iso(valor):
+    return valor.isoformat()
+
+
+def _decodificar(datos):
+    """(asistencias, sesiones) como listas de tuplas en el orden de COLUMNAS_*."""
+    datos = json.loads(zlib.decompress(datos))
+    return list(zip(*datos["asistencias"])), list(zip(*datos["sesiones"]))
+
+
+# dispositivo_id va al final: los archivos anteriores a esa columna no la traen
+COLUMNAS_ASISTENCIA = ("pk", "trabajador_id", "fecha", "presente", "tipo_retraso", "hora_entrada", "dispositivo_id")
+COLUMNAS_SESION = ("pk", "dispositivo_id", "fecha", "hora_base")
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor)
+
+
+def _momento(valor):
+    return datetime.fromisoformat(valor) if valor else None
+
+
+# =======================================================
+# Archivado y restauración
+# =======================================================
+def pendientes(meses, proyecto_id=None):
+    """[(proyecto_id, mes), …] con datos vivos anteriores al corte, del más antiguo al más reciente."""
+    limite = corte(meses)
+    claves = set()
+    for modelo in (Asistencia, SesionAsistencia):
+        qs = modelo.objects.filter(fecha__lt=limite)
+        if proyecto_id:
+            qs = qs.filter(proyecto_id=proyecto_id)
+        claves.update(
+            qs.order_by().annotate(mes=TruncMonth("fecha")).values_list("proyecto_id", "mes").distinct()
+        )
+    return sorted(claves, key=lambda c: (c[1], c[0]))
+
+
+def archivar_mes(proyecto_id, mes):
+    """
+    Mueve a AsistenciaArchivada las asistencias y sesiones del proyecto en
+    `mes`. Devuelve la fila creada, o None si no había nada que mover. Si
+    el mes ya tenía archivo (restauración parcial), se rechaza.
+    """
+    rango = (mes, fin_de_mes(mes))
+    with transaction.atomic():
+        if AsistenciaArchivada.objects.filter(proyecto_id=proyecto_id, mes=mes).exists():
+            raise PeriodoArchivado(f"El mes {mes:%Y-%m} del proyecto {proyecto_id} ya está archivado.")
+        asistencias = Asistencia.objects.filter(proyecto_id=proyecto_id, fecha__range=rango).order_by()
+        sesiones = SesionAsistencia.objects.filter(proyecto_id=proyecto_id, fecha__range=rango).order_by()
+        filas = list(asistencias.order_by("trabajador_id", "fecha").values_list(*COLUMNAS_ASISTENCIA))
+        filas_sesiones = list(sesiones.order_by("pk").values_list(*COLUMNAS_SESION))
+        if not filas and not filas_sesiones:
+            return None
+        archivo = AsistenciaArchivada.objects.create(
+            proyecto_id=proyecto_id, mes=mes,
+            asistencias=len(filas), sesiones=len(filas_sesiones),
+            datos=_codificar(filas, filas_sesiones),
+        )
+        # Sin señales: los resúmenes, la bitácora y los tableros no cambian
+        asistencias._raw_delete(asistencias.db)
+        sesiones._raw_delete(sesiones.db)
+    return archivo
+
+
+def restaurar_mes(proyecto_id, mes):
+    """Devuelve el mes archivado a las tablas vivas; (asistencias, sesiones) restauradas."""
+    with transaction.atomic():
+        archivo = AsistenciaArchivada.objects.filter(proyecto_id=proyecto_id, mes=mes).first()
+        if archivo is None:
+            return 0, 0
+        filas, filas_sesiones = _decodificar(archivo.datos)
+        trabajadores = set(
+            Trabajador.objects.filter(pk__in={f[1] for f in filas}).values_list("pk", flat=True)
+        )
+        dispositivos = set(
+            Dispositivo.objects.filter(
+                pk__in={f[1] for f in filas_sesiones} | {f[6] for f in filas if len(f) > 6}
+            ).values_list("pk", flat=True)
+        )
+        asistencias = Asistencia.objects.bulk_create(
+            (
+                Asistencia(pk=pk, trabajador_id=t, proyecto_id=proyecto_id, fecha=_fecha(f),
+                           presente=presente, tipo_retraso=tipo, hora_entrada=_momento(hora),
+                           dispositivo_id=disp[0] if disp and disp[0] in dispositivos else None)
+                for pk, t, f, presente, tipo, hora, *disp in filas if t in trabajadores
+            ),
+            batch_size=2000,
+        )
+        sesiones = SesionAsistencia.objects.bulk_create(
+            (
+                SesionAsistencia(pk=pk, dispositivo_id=d, proyecto_id=proyecto_id, fecha=_fecha(f),
+                                 hora_base=_momento(base))
+                for pk, d, f, base in filas_sesiones if d in dispositivos
+            ),
+            batch_size=2000,
+        )
+        archivo.delete()
+    return len(asistencias), len(sesiones)
+
+
+# =======================================================
+# Lectura
+# =======================================================
+def proyectos_archivados(desde, hasta, proyectos=None):
+    """Ids de proyecto con algún mes archivado que toca [desde, hasta]."""
+    qs = AsistenciaArchivada.objects.filter(mes__range=(inicio_de_mes(desde), hasta))
+    if proyectos:
+        qs = qs.filter(proyecto_id__in=proyectos)
+    return set(qs.order_by().values_list("proyecto_id", flat=True).distinct())
+
+
+def archivadas(proyecto_id, desde, hasta):
+    """
+    Asistencias archivadas del proyecto en [desde, hasta] como
+    {trabajador_id: [(fecha, presente, tipo_retraso), …]} ordenadas por fecha.
+    """
+    resultado = {}
+    for datos in (
+        AsistenciaArchivada.objects
+        .filter(proyecto_id=proyecto_id, mes__range=(inicio_de_mes(desde), hasta))
+        .order_by("mes").values_list("datos", flat=True)
+    ):
+        filas, _ = _decodificar(datos)
+        for _, trabajador_id, fecha, presente, tipo, *_ in filas:
+            fecha = _fecha(fecha)
+            if desde <= fecha <= hasta:
+                resultado.setdefault(trabajador_id, []).append((fecha, presente, tipo))
+    return resultado
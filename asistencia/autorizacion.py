@@ -0,0 +1,224 @@
+"""
+Caché de autorización para el escaneo QR.
+
+Guarda device_id -> (pk, proyectos autorizados) y trabajador -> proyectos,
+de modo que decidir si un escaneo procede no cuesta consultas. Por defecto
+vive en memoria del proceso; con ASISTENCIA_CACHE_AUTORIZACION apuntando a un
+alias de CACHES se usa ese backend (compartido entre procesos).
+
+Las entradas se invalidan desde asistencia/signals.py cuando cambian
+Dispositivo.proyectos, Trabajador.proyectos o los propios registros; el TTL
+acota lo que puede durar una entrada si el cambio ocurrió en otro proceso.
+Los ids que no existen no se guardan (cualquiera puede inventarlos) y la
+caché local es LRU con ASISTENCIA_CACHE_AUTORIZACION_MAXIMO entradas.
+
+Cada invalidación avanza una generación por tipo de entrada (en el backend
+compartido, una llave más). Un fallo anota la generación antes de leer la
+base y no guarda lo leído si cambió mientras tanto: una invalidación que
+llega durante la carga no queda tapada por el valor viejo hasta el TTL.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Dispositivo, Trabajador
+
+_FALTA = object()
+
+
+class CacheAutorizacion:
+    PREFIJO = "asistencia:autorizacion"
+
+    def __init__(self, alias=None, timeout=None, maximo=10000):
+        self.alias   = alias
+        self.timeout = timeout
+        self.maximo  = maximo
+        self._local  = OrderedDict()
+        self._lock   = threading.Lock()
+        self._contadores = Counter()
+        self._generaciones = Counter()
+
+    # ---------------------------------------------------
+    # Consultas
+    # ---------------------------------------------------
+    def dispositivo(self, device_id):
+        """(pk, frozenset de proyectos autorizados) o None si el dispositivo no existe."""
+        return self._obtener("dispositivo", device_id, self._cargar_dispositivo)
+
+    def proyectos_trabajador(self, trabajador_id):
+        """Tupla ordenada de ids de proyecto o None si el trabajador no existe."""
+        return self._obtener("trabajador", trabajador_id, self._cargar_trabajador)
+
+    # Para vistas async: un acierto en la caché local se resuelve sin salir
+    # del event loop; un fallo (o un backend compartido) va a sync_to_async.
+    async def adispositivo(self, device_id):
+        return await self._aobtener("dispositivo", device_id, self.dispositivo)
+
+    async def aproyectos_trabajador(self, trabajador_id):
+        return await self._aobtener("trabajador", trabajador_id, self.proyectos_trabajador)
+
+    async def _aobtener(self, tipo, clave, obtener):
+        if not self.alias:
+            valor = self._leer_local(f"{self.PREFIJO}:{tipo}:{clave}")
+            if valor is not _FALTA:
+                self._contar(tipo, "hits")
+                return valor
+        return await sync_to_async(obtener)(clave)
+
+    @staticmethod
+    def _cargar_dispositivo(device_id):
+        filas = list(
+            Dispositivo.objects.filter(device_id=device_id).values_list("pk", "proyectos")
+        )
+        if not filas:
+            return None
+        return filas[0][0], frozenset(p for _, p in filas if p is not None)
+
+    @staticmethod
+    def _cargar_trabajador(trabajador_id):
+        filas = list(Trabajador.objects.filter(pk=trabajador_id).values_list("proyectos", flat=True))
+        if not filas:
+            return None
+        return tuple(sorted(p for p in filas if p is not None))
+
+    def _obtener(self, tipo, clave, cargar):
+        llave   = f"{self.PREFIJO}:{tipo}:{clave}"
+        backend = self._backend()
+        if backend:
+            valor = backend.get(llave, _FALTA)
+        else:
+            valor = self._leer_local(llave)
+        if valor is not _FALTA:
+            self._contar(tipo, "hits")
+            return valor
+
+        self._contar(tipo, "misses")
+        generacion = self._generacion(tipo)
+        valor = cargar(clave)
+        if valor is None:
+            return None
+        if backend:
+            if self._generacion(tipo) == generacion:
+                backend.set(llave, valor, self.timeout)
+        else:
+            expira = time.monotonic() + self.timeout if self.timeout is not None else 0
+            with self._lock:
+                if self._generaciones[tipo] != generacion:
+                    return valor  # se invalidó durante la carga: no se guarda
+                self._local[llave] = (valor, expira)
+                self._local.move_to_end(llave)
+                while len(self._local) > self.maximo:
+                    self._local.popitem(last=False)
+        return valor
+
+    def _leer_local(self, llave):
+        """Valor vigente de la caché local (y lo marca como reciente), o _FALTA."""
+        with self._lock:
+            valor, expira = self._local.get(llave, (_FALTA, 0))
+            if valor is _FALTA:
+                return _FALTA
+            if self.timeout is not None and expira < time.monotonic():
+                del self._local[llave]
+                return _FALTA
+            self._local.move_to_end(llave)
+            return valor
+
+    # ---------------------------------------------------
+    # Invalidación
+    # ---------------------------------------------------
+    def invalidar_dispositivos(self, device_ids=(), pks=()):
+        """Descarta dispositivos por device_id y/o por pk."""
+        llaves = {f"{self.PREFIJO}:dispositivo:{d}" for d in device_ids}
+        if pks:
+            pks = set(pks)
+            llaves.update(
+                f"{self.PREFIJO}:dispositivo:{d}"
+                for d in Dispositivo.objects.filter(pk__in=pks).values_list("device_id", flat=True)
+            )
+            # Entradas locales cuyo device_id ya cambió en la base
+            with self._lock:
+                locales = list(self._local.items())
+            llaves.update(
+                llave for llave, (valor, _) in locales
+                if llave.startswith(f"{self.PREFIJO}:dispositivo:") and valor and valor[0] in pks
+            )
+        self._borrar("dispositivo", llaves)
+
+    def invalidar_trabajadores(self, trabajador_ids):
+        self._borrar("trabajador", {f"{self.PREFIJO}:trabajador:{t}" for t in trabajador_ids})
+
+    def limpiar(self, tipo=None):
+        """Vacía la caché local (o solo un tipo); con backend compartido borra todo el backend."""
+        backend = self._backend()
+        if backend and tipo is None:
+            backend.clear()
+        prefijo = f"{self.PREFIJO}:{tipo}:" if tipo else f"{self.PREFIJO}:"
+        with self._lock:
+            for t in (tipo,) if tipo else ("dispositivo", "trabajador"):
+                self._generaciones[t] += 1
+            for llave in [k for k in self._local if k.startswith(prefijo)]:
+                del self._local[llave]
+
+    def _borrar(self, tipo, llaves):
+        # La generación avanza aunque no haya nada guardado: puede haber una carga en curso
+        backend = self._backend()
+        if backend:
+            contador = f"{self.PREFIJO}:generacion:{tipo}"
+            try:
+                backend.incr(contador)
+            except ValueError:  # aún no existe (o el backend la desalojó)
+                backend.add(contador, 1, None)
+            if llaves:
+                backend.delete_many(list(llaves))
+        with self._lock:
+            self._generaciones[tipo] += 1
+            for llave in llaves:
+                self._local.pop(llave, None)
+
+    def _generacion(self, tipo):
+        backend = self._backend()
+        if backend:
+            return backend.get(f"{self.PREFIJO}:generacion:{tipo}", 0)
+        with self._lock:
+            return self._generaciones[tipo]
+
+    def _backend(self):
+        return caches[self.alias] if self.alias else None
+
+    # ---------------------------------------------------
+    # Contadores
+    # ---------------------------------------------------
+    def _contar(self, tipo, evento):
+        with self._lock:
+            self._contadores[(tipo, evento)] += 1
+
+    def estadisticas(self):
+        """Aciertos, fallos y tasa de aciertos por tipo de entrada."""
+        with self._lock:
+            contadores = dict(self._contadores)
+        resultado = {}
+        for tipo in ("dispositivo", "trabajador"):
+            hits   = contadores.get((tipo, "hits"), 0)
+            misses = contadores.get((tipo, "misses"), 0)
+            total  = hits + misses
+            resultado[tipo] = {
+                "hits": hits,
+                "misses": misses,
+                "tasa_aciertos": hits / total if total else 0.0,
+            }
+        return resultado
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            self._contadores.clear()
+
+
+cache_autorizacion = CacheAutorizacion(
+    alias=getattr(settings, "ASISTENCIA_CACHE_AUTORIZACION", None),
+    timeout=getattr(settings, "ASISTENCIA_CACHE_AUTORIZACION_TTL", 300),
+    maximo=getattr(settings, "ASISTENCIA_CACHE_AUTORIZACION_MAXIMO", 10000),
+)
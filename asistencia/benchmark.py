@@ -0,0 +1,313 @@
+"""
+Utilidades para los comandos de benchmark.
+
+Los benchmarks corren sobre una base de datos de prueba temporal (la misma
+que usa `manage.py test`), nunca sobre db.sqlite3.
+
+- poblar(): datos sintéticos reproducibles (misma semilla, mismos datos):
+  proyectos, trabajadores, dispositivos, sesiones y años de asistencia.
+- ESCENARIOS / correr_escenario(): peticiones cronometradas a los
+  endpoints con el cliente de pruebas; `manage.py bench_suite` los corre,
+  los compara contra la línea base guardada y falla si hay regresión.
+"""
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, time as hora, timedelta
+
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from gestion_obra.metricas import Observador
+
+from .autorizacion import cache_autorizacion
+from .busqueda import indice_trabajadores
+from .models import Asistencia, Dispositivo, Proyecto, SesionAsistencia, Trabajador
+from .registro import olvidar_sesiones
+from .resumenes import reconstruir_resumenes
+
+
+@contextmanager
+def base_de_datos_temporal(verbosity=0):
+    """Crea la base de prueba, la deja activa durante el bloque y la destruye al salir."""
+    nombre_original = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=verbosity)
+
+
+def medir(funcion, *args, **kwargs):
+    """Ejecuta `funcion` y devuelve (resultado, segundos, número de consultas)."""
+    with CaptureQueriesContext(connection) as ctx:
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+    return resultado, segundos, len(ctx.captured_queries)
+
+
+def crear_cuadrilla(proyecto, cantidad, prefijo="Bench"):
+    """
+    Da de alta `cantidad` trabajadores asignados a `proyecto` con bulk_create
+    (sin pasar por Trabajador.save, que genera el QR) y devuelve sus ids.
+    """
+    trabajadores = Trabajador.objects.bulk_create([
+        Trabajador(
+            nombre=f"{prefijo} {i}",
+            apellido_paterno="Paterno",
+            apellido_materno="Materno",
+            categoria="Ayudante",
+            telefono="0000000000",
+            codigo_qr=f"codigos_qr/{prefijo.lower()}_{i}.png",
+        )
+        for i in range(cantidad)
+    ])
+    Trabajador.proyectos.through.objects.bulk_create([
+        Trabajador.proyectos.through(trabajador_id=t.pk, proyecto_id=proyecto.pk)
+        for t in trabajadores
+    ])
+    return [t.pk for t in trabajadores]
+
+
+def crear_proyecto(nombre="Proyecto benchmark"):
+    return Proyecto.objects.create(nombre=nombre)
+
+
+# =======================================================
+# Generador de datos
+# =======================================================
+# Tamaños predefinidos de `bench_suite --escala`
+ESCALAS = {
+    "chica":    {"proyectos": 3, "trabajadores": 300,  "dias": 90,  "dispositivos": 2},
+    "media":    {"proyectos": 5, "trabajadores": 2000, "dias": 365, "dispositivos": 3},
+    "completa": {"proyectos": 8, "trabajadores": 4000, "dias": 730, "dispositivos": 3},
+}
+# Proporción de cada tipo_retraso entre los presentes con escaneo
+PESOS_RETRASO = (("puntual", 80), ("retardo_leve", 15), ("retardo_alto", 5))
+LOTE = 5000
+
+
+@dataclass
+class DatosBench:
+    proyectos: list
+    trabajadores: dict            # proyecto_id -> [trabajador_id, …]
+    dispositivos: dict            # proyecto_id -> [device_id, …]
+    primer_dia: date
+    ultimo_dia: date
+    asistencias: int = 0
+
+
+def poblar(proyectos, trabajadores, dias, dispositivos, semilla=1):
+    """
+    Genera los datos del benchmark y devuelve un DatosBench. Los
+    trabajadores se reparten entre los proyectos; cada uno tiene asistencia
+    de lunes a sábado en los `dias` anteriores a hoy (90 % presentes, la
+    mayoría con escaneo QR). Al final reconstruye los resúmenes.
+    """
+    rnd = random.Random(semilla)
+    ids_proyectos = [crear_proyecto(f"Obra {i + 1}").pk for i in range(proyectos)]
+    por_proyecto = math.ceil(trabajadores / proyectos)
+    cuadrillas = {
+        pk: crear_cuadrilla(Proyecto(pk=pk), min(por_proyecto, trabajadores - i * por_proyecto), prefijo=f"P{i}")
+        for i, pk in enumerate(ids_proyectos)
+    }
+
+    dispositivos_creados = Dispositivo.objects.bulk_create([
+        Dispositivo(device_id=f"bench-{pk}-{n}", nombre=f"Tablet {n + 1}")
+        for pk in ids_proyectos for n in range(dispositivos)
+    ])
+    Dispositivo.proyectos.through.objects.bulk_create([
+        Dispositivo.proyectos.through(dispositivo_id=d.pk, proyecto_id=int(d.device_id.split("-")[1]))
+        for d in dispositivos_creados
+    ])
+    por_dispositivo = {}
+    for d in dispositivos_creados:
+        por_dispositivo.setdefault(int(d.device_id.split("-")[1]), []).append(d)
+
+    ultimo_dia = timezone.localdate() - timedelta(days=1)
+    primer_dia = ultimo_dia - timedelta(days=dias - 1)
+    tipos, pesos = zip(*PESOS_RETRASO)
+    zona = timezone.get_current_timezone()
+    sesiones, lote, total = [], [], 0
+    for d in range(dias):
+        fecha = primer_dia + timedelta(days=d)
+        if fecha.weekday() == 6:
+            continue
+        base = datetime.combine(fecha, hora(7, 0), tzinfo=zona)
+        for pk in ids_proyectos:
+            sesiones += [
+                SesionAsistencia(dispositivo=disp, proyecto_id=pk, fecha=fecha, hora_base=base)
+                for disp in por_dispositivo[pk]
+            ]
+            tablets = por_dispositivo[pk]
+            for n, trabajador_id in enumerate(cuadrillas[pk]):
+                presente = rnd.random() < 0.9
+                escaneo = presente and rnd.random() < 0.85
+                lote.append(Asistencia(
+                    trabajador_id=trabajador_id, proyecto_id=pk, fecha=fecha, presente=presente,
+                    tipo_retraso=rnd.choices(tipos, pesos)[0] if escaneo else None,
+                    hora_entrada=base + timedelta(minutes=rnd.randint(0, 50)) if escaneo else None,
+                    dispositivo=tablets[n % len(tablets)] if escaneo else None,
+                ))
+                if len(lote) >= LOTE:
+                    Asistencia.objects.bulk_create(lote)
+                    total += len(lote)
+                    lote = []
+    Asistencia.objects.bulk_create(lote)
+    SesionAsistencia.objects.bulk_create(sesiones, batch_size=LOTE)
+    total += len(lote)
+    reconstruir_resumenes(primer_dia, ultimo_dia)
+
+    cache_autorizacion.limpiar()
+    indice_trabajadores.limpiar()
+    olvidar_sesiones()
+    return DatosBench(
+        proyectos=ids_proyectos,
+        trabajadores=cuadrillas,
+        dispositivos={pk: [d.device_id for d in ds] for pk, ds in por_dispositivo.items()},
+        primer_dia=primer_dia,
+        ultimo_dia=ultimo_dia,
+        asistencias=total,
+    )
+
+
+# =======================================================
+# Escenarios
+# =======================================================
+# Cada escenario es una función (cliente, datos, i) -> respuesta para la
+# i-ésima petición; i distinto produce una escritura nueva en los de registro.
+CUADRILLA = 50
+
+
+def _registrar_qr(cliente, datos, i):
+    proyecto = datos.proyectos[i % len(datos.proyectos)]
+    cuadrilla = datos.trabajadores[proyecto]
+    trabajador = cuadrilla[(i // len(datos.proyectos)) % len(cuadrilla)]
+    return cliente.get(f"/asistencia/registrar-qr/{trabajador}/", {"device_id": datos.dispositivos[proyecto][0]})
+
+
+def _registrar(cliente, datos, i):
+    proyecto = datos.proyectos[i % len(datos.proyectos)]
+    # Fechas anteriores a los datos generados: cada petición inserta
+    fecha = datos.primer_dia - timedelta(days=1 + i // len(datos.proyectos))
+    return cliente.post("/asistencia/registrar/", {
+        "project": proyecto,
+        "date": fecha.isoformat(),
+        "asistencias": [{"trabajador": t, "presente": True} for t in datos.trabajadores[proyecto][:CUADRILLA]],
+    }, content_type="application/json")
+
+
+def _exportar(cliente, datos, i):
+    return cliente.get("/asistencia/exportar/", {
+        "project_id": datos.proyectos[i % len(datos.proyectos)],
+        "start_date": (datos.ultimo_dia - timedelta(days=29)).isoformat(),
+        "end_date": datos.ultimo_dia.isoformat(),
+    })
+
+
+def _api(ruta, filtros=lambda datos, i: {}):
+    def escenario(cliente, datos, i):
+        return cliente.get(ruta, filtros(datos, i))
+    return escenario
+
+
+ESCENARIOS = {
+    "registrar-qr": _registrar_qr,
+    "registrar": _registrar,
+    "exportar": _exportar,
+    "api-proyectos": _api("/api/proyectos/"),
+    "api-trabajadores": _api("/api/trabajadores/", lambda datos, i: {
+        "proyecto": datos.proyectos[i % len(datos.proyectos)],
+    }),
+    "api-asistencias": _api("/api/asistencias/", lambda datos, i: {
+        "proyecto": datos.proyectos[i % len(datos.proyectos)],
+        "fecha_desde": (datos.ultimo_dia - timedelta(days=6)).isoformat(),
+    }),
+}
+
+
+def _percentil(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+def correr_escenario(escenario, datos, peticiones, hilos=1, calentamiento=2):
+    """
+    Hace `peticiones` peticiones (repartidas en `hilos` clientes
+    concurrentes) y devuelve {"p50_ms", "p95_ms", "rps", "consultas"}:
+    consultas es el máximo por petición. Las de calentamiento no cuentan
+    (cargan cachés de autorización y horarios) y usan índices negativos
+    para no pisar las escrituras medidas.
+    """
+    cliente = Client()
+    for i in range(calentamiento):
+        respuesta = escenario(cliente, datos, -1 - i)
+        if respuesta.streaming:
+            b"".join(respuesta.streaming_content)
+
+    latencias, consultas = [], []
+    lock = threading.Lock()
+
+    def trabajar(indices):
+        cliente = Client()
+        try:
+            for i in indices:
+                observador = Observador()
+                with connection.execute_wrapper(observador):
+                    inicio = time.perf_counter()
+                    respuesta = escenario(cliente, datos, i)
+                    if respuesta.streaming:  # el cuerpo se genera al leerlo
+                        b"".join(respuesta.streaming_content)
+                    segundos = time.perf_counter() - inicio
+                if respuesta.status_code >= 400:
+                    raise AssertionError(f"HTTP {respuesta.status_code} en la petición {i}")
+                with lock:
+                    latencias.append(segundos)
+                    consultas.append(observador.consultas)
+        finally:
+            if hilos > 1:
+                connections.close_all()
+
+    inicio = time.perf_counter()
+    if hilos == 1:
+        trabajar(range(peticiones))
+    else:
+        with ThreadPoolExecutor(hilos) as pool:
+            list(pool.map(trabajar, [range(h, peticiones, hilos) for h in range(hilos)]))
+    total = time.perf_counter() - inicio
+    return {
+        "p50_ms": round(_percentil(latencias, 0.50) * 1000, 2),
+        "p95_ms": round(_percentil(latencias, 0.95) * 1000, 2),
+        "rps": round(peticiones / total, 1),
+        "consultas": max(consultas),
+    }
+
+
+def comparar(resultados, linea_base, umbral, minimo_ms=2.0):
+    """
+    Regresiones de `resultados` contra `linea_base` ({escenario: métricas}):
+    p95 más de `umbral` (fracción) y más de `minimo_ms` por encima (en
+    endpoints de pocos ms el ruido supera cualquier porcentaje), o más
+    consultas por petición. Devuelve una lista de textos; vacía si no hay
+    regresión.
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        base = linea_base.get(nombre)
+        if not base:
+            continue
+        if actual["p95_ms"] > max(base["p95_ms"] * (1 + umbral), base["p95_ms"] + minimo_ms):
+            regresiones.append(
+                f"{nombre}: p95 {actual['p95_ms']:.1f} ms vs {base['p95_ms']:.1f} ms "
+                f"(+{(actual['p95_ms'] / base['p95_ms'] - 1) * 100:.0f} %)"
+            )
+        if actual["consultas"] > base["consultas"]:
+            regresiones.append(f"{nombre}: {actual['consultas']} consultas por petición vs {base['consultas']}")
+    return regresiones
@@ -0,0 +1,301 @@
+"""
+Búsqueda de trabajadores por nombre, apellidos, CURP o NSS (typeahead).
+
+Un `icontains` sobre Trabajador no usa índices (comodín al inicio), así que
+la búsqueda va contra un índice en memoria del proceso:
+
+- Los textos se normalizan sin acentos ni mayúsculas (normalizar): "Peña"
+  y "pena" son el mismo token.
+- Cada término de la consulta debe coincidir con algún token del
+  trabajador: exacto, como prefijo (vocabulario ordenado + bisect) o, con
+  3 caracteres o más, en medio de la palabra (trigramas del vocabulario:
+  se revisan solo los tokens del trigrama menos frecuente).
+- Orden: exacto > prefijo > en medio, sumado por término; a igual puntaje,
+  por apellidos y nombre. Con muchos candidatos ("ma") se recorre la lista
+  global ya ordenada hasta juntar los primeros, en vez de ordenarlos.
+
+El índice se arma en la primera búsqueda (o al arrancar el servidor, ver
+gestion_obra/wsgi.py) con dos consultas y se mantiene al día desde
+signals.py sin consultas extra; las altas masivas (importacion.py) lo
+recargan por ids. Cambios hechos desde otro proceso se ven al vencer
+ASISTENCIA_BUSQUEDA_TTL. `manage.py bench_busqueda` mide la latencia.
+"""
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter, namedtuple
+from heapq import nsmallest
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Trabajador
+
+MINIMO_CARACTERES = 2
+MAXIMO_TERMINOS = 6
+CAMPOS = ("nombre", "apellido_paterno", "apellido_materno", "curp", "nss", "categoria")
+
+Ficha = namedtuple("Ficha", "id nombre apellido_paterno apellido_materno curp nss categoria")
+
+
+_SEPARADORES = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos ni diéresis (ñ -> n) y solo letras, dígitos y espacios."""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return _SEPARADORES.sub(" ", texto).strip()
+
+
+def _trigramas(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class IndiceTrabajadores:
+    """Índice de búsqueda de trabajadores; seguro entre hilos."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._fichas = None
+        self._armado = 0.0
+
+    # ---------------------------------------------------
+    # Armado
+    # ---------------------------------------------------
+    def _vaciar(self):
+        self._fichas = {}       # pk -> Ficha
+        self._tokens_de = {}    # pk -> tuple de tokens
+        self._orden = {}        # pk -> llave de orden (apellidos, nombre)
+        self._ordenadas = []    # llaves de orden ordenadas ...
+        self._en_orden = []     # ... y sus pk, en paralelo
+        self._postings = {}     # token -> pk, o set(pk) si lo comparten varios
+        self._vocabulario = []  # tokens ordenados (prefijos)
+        self._trigramas = {}    # trigrama -> [token, …]
+        self._proyectos = {}    # proyecto_id -> set(pk)
+        self._de_trabajador = {}  # pk -> set(proyecto_id)
+
+    def _vigente(self):
+        ttl = self.ttl if self.ttl is not None else getattr(settings, "ASISTENCIA_BUSQUEDA_TTL", 600)
+        return self._fichas is not None and (ttl is None or time.monotonic() - self._armado <= ttl)
+
+    def _asegurar(self):
+        """Arma el índice si falta o venció; se llama con el lock tomado."""
+        if self._vigente():
+            return
+        self._vaciar()
+        for fila in Trabajador.objects.order_by().values_list("pk", *CAMPOS).iterator(chunk_size=5000):
+            self._poner(Ficha(*fila), ordenar=False)
+        self._vocabulario = sorted(self._postings)
+        self._ordenadas = sorted(self._orden.values())
+        self._en_orden = [int(llave.rsplit("\0", 1)[1]) for llave in self._ordenadas]
+        for pk, proyecto_id in Trabajador.proyectos.through.objects.values_list("trabajador_id", "proyecto_id"):
+            self._asignar(pk, proyecto_id, True)
+        self._armado = time.monotonic()
+
+    def precargar(self, en_segundo_plano=True):
+        """Arma el índice ya, para que la primera búsqueda no lo pague."""
+        def armar():
+            with self._lock:
+                self._asegurar()
+        if not en_segundo_plano:
+            return armar()
+        threading.Thread(target=armar, name="indice-trabajadores", daemon=True).start()
+
+    def limpiar(self):
+        with self._lock:
+            self._fichas = None
+
+    # ---------------------------------------------------
+    # Mantenimiento (signals.py); sin índice armado no hace nada
+    # ---------------------------------------------------
+    def guardar(self, trabajador):
+        with self._lock:
+            if self._fichas is not None:
+                self._quitar(trabajador.pk)
+                self._poner(Ficha(trabajador.pk, *(getattr(trabajador, c) for c in CAMPOS)))
+
+    def quitar(self, pk):
+        with self._lock:
+            if self._fichas is not None:
+                self._quitar(pk)
+        self.desasignar(pk)
+
+    def asignar(self, pks, proyectos, asignado):
+        """Alta (asignado=True) o baja de los trabajadores `pks` en `proyectos`."""
+        with self._lock:
+            if self._fichas is not None:
+                for pk in pks:
+                    for proyecto_id in proyectos:
+                        self._asignar(pk, proyecto_id, asignado)
+
+    def desasignar(self, pk):
+        """Quita al trabajador de todos sus proyectos (trabajador.proyectos.clear())."""
+        with self._lock:
+            if self._fichas is not None:
+                for proyecto_id in self._de_trabajador.pop(pk, ()):
+                    self._proyectos[proyecto_id].discard(pk)
+
+    def quitar_proyecto(self, proyecto_id):
+        with self._lock:
+            if self._fichas is not None:
+                for pk in self._proyectos.pop(proyecto_id, ()):
+                    self._de_trabajador.get(pk, set()).discard(proyecto_id)
+
+    def recargar(self, pks):
+        """Vuelve a leer de la base los trabajadores `pks` (altas masivas sin señales)."""
+        with self._lock:
+            if self._fichas is None:
+                return
+            pks = list(pks)
+            filas = Trabajador.objects.filter(pk__in=pks).values_list("pk", *CAMPOS)
+            asignaciones = Trabajador.proyectos.through.objects.filter(
+                trabajador_id__in=pks).values_list("trabajador_id", "proyecto_id")
+            for pk in pks:
+                self._quitar(pk)
+                for proyecto_id in self._de_trabajador.pop(pk, ()):
+                    self._proyectos[proyecto_id].discard(pk)
+            for fila in filas:
+                self._poner(Ficha(*fila))
+            for pk, proyecto_id in asignaciones:
+                self._asignar(pk, proyecto_id, True)
+
+    def _poner(self, ficha, ordenar=True):
+        tokens = tuple(dict.fromkeys(
+            " ".join(normalizar(getattr(ficha, c)) for c in CAMPOS[:5]).split()
+        ))
+        self._fichas[ficha.id] = ficha
+        self._tokens_de[ficha.id] = tokens
+        llave = self._orden[ficha.id] = "\0".join((
+            normalizar(ficha.apellido_paterno), normalizar(ficha.apellido_materno),
+            normalizar(ficha.nombre), f"{ficha.id:010d}",
+        ))
+        if ordenar:
+            i = bisect_left(self._ordenadas, llave)
+            self._ordenadas.insert(i, llave)
+            self._en_orden.insert(i, ficha.id)
+        # CURP y NSS son casi siempre únicos: un int en lugar de un set por token
+        for token in tokens:
+            pks = self._postings.get(token)
+            if pks is None:
+                self._postings[token] = ficha.id
+                if ordenar:
+                    insort(self._vocabulario, token)
+                for trigrama in _trigramas(token):
+                    self._trigramas.setdefault(trigrama, []).append(token)
+            elif type(pks) is set:
+                pks.add(ficha.id)
+            else:
+                self._postings[token] = {pks, ficha.id}
+
+    def _quitar(self, pk):
+        if self._fichas.pop(pk, None) is None:
+            return
+        i = bisect_left(self._ordenadas, self._orden.pop(pk))
+        del self._ordenadas[i], self._en_orden[i]
+        for token in self._tokens_de.pop(pk):
+            pks = self._postings[token]
+            if type(pks) is set:
+                pks.discard(pk)
+                if len(pks) == 1:
+                    self._postings[token] = pks.pop()
+                continue
+            del self._postings[token]
+            del self._vocabulario[bisect_left(self._vocabulario, token)]
+            for trigrama in _trigramas(token):
+                tokens = self._trigramas[trigrama]
+                tokens.remove(token)
+                if not tokens:
+                    del self._trigramas[trigrama]
+
+    def _asignar(self, pk, proyecto_id, asignado):
+        if asignado:
+            self._proyectos.setdefault(proyecto_id, set()).add(pk)
+            self._de_trabajador.setdefault(pk, set()).add(proyecto_id)
+        else:
+            self._proyectos.get(proyecto_id, set()).discard(pk)
+            self._de_trabajador.get(pk, set()).discard(proyecto_id)
+
+    # ---------------------------------------------------
+    # Búsqueda
+    # ---------------------------------------------------
+    def _pks(self, tokens):
+        pks = set()
+        for token in tokens:
+            valor = self._postings[token]
+            if type(valor) is set:
+                pks |= valor
+            else:
+                pks.add(valor)
+        return pks
+
+    def _coincidencias(self, termino):
+        """(exactos, por prefijo, en medio): conjuntos de pk; los dos primeros se solapan."""
+        exactos = self._pks([termino] if termino in self._postings else ())
+        inicio = bisect_left(self._vocabulario, termino)
+        fin = bisect_left(self._vocabulario, termino + "\uffff", inicio)
+        prefijos = self._pks(self._vocabulario[inicio:fin])
+        en_medio = set()
+        if len(termino) >= 3:
+            menor = min((self._trigramas.get(t, ()) for t in _trigramas(termino)), key=len)
+            en_medio = self._pks(t for t in menor if termino in t and not t.startswith(termino))
+        return exactos, prefijos, en_medio
+
+    def buscar(self, consulta, limite=10, proyecto=None):
+        """Hasta `limite` Fichas que coinciden con todos los términos, mejor puntaje primero."""
+        terminos = normalizar(consulta).split()[:MAXIMO_TERMINOS]
+        if not terminos or len("".join(terminos)) < MINIMO_CARACTERES:
+            return []
+        with self._lock:
+            self._asegurar()
+            # Del término más largo (más selectivo) al más corto
+            terminos.sort(key=len, reverse=True)
+            candidatos = None if proyecto is None else set(self._proyectos.get(proyecto, ()))
+            niveles = []
+            for termino in terminos:
+                exactos, prefijos, en_medio = self._coincidencias(termino)
+                todos = prefijos | en_medio
+                candidatos = todos if candidatos is None else candidatos & todos
+                if not candidatos:
+                    return []
+                niveles.append((exactos, prefijos))
+
+            # Puntaje: +1 por término exacto y +1 por término como prefijo
+            if len(niveles) == 1:
+                exactos, prefijos = niveles[0]
+                por_nivel = {
+                    2: candidatos & exactos,
+                    1: (candidatos & prefijos) - exactos,
+                    0: candidatos - prefijos,
+                }
+            else:
+                puntaje = Counter()
+                for exactos, prefijos in niveles:
+                    puntaje.update(candidatos & exactos)
+                    puntaje.update(candidatos & prefijos)
+                por_nivel = {}
+                for pk, n in puntaje.items():
+                    por_nivel.setdefault(n, set()).add(pk)
+                por_nivel[0] = candidatos - puntaje.keys()
+
+            resultado = []
+            for n in sorted(por_nivel, reverse=True):
+                faltan = limite - len(resultado)
+                if faltan <= 0:
+                    break
+                resultado += self._primeros(por_nivel[n], faltan)
+            return [self._fichas[pk] for pk in resultado]
+
+    def _primeros(self, pks, n):
+        """Los n primeros de `pks` por apellidos y nombre."""
+        # Recorrer la lista global cuesta ~n·total/len(pks); ordenar, len(pks)
+        if len(pks) ** 2 > n * len(self._en_orden):
+            return list(islice((pk for pk in self._en_orden if pk in pks), n))
+        return nsmallest(n, pks, key=self._orden.__getitem__)
+
+
+indice_trabajadores = IndiceTrabajadores()
@@ -0,0 +1,266 @@
+"""
+Asistencia compacta: una fila de AsistenciaMensual por trabajador,
+proyecto y mes en lugar de una de Asistencia por día.
+
+    registros  bit d-1: hay asistencia el día d
+    presentes  bit d-1: presente el día d
+    tipos      byte d-1: tipo_retraso del día d (0 sin tipo, ver TIPOS)
+
+Se mantiene por las mismas llaves mensuales que ResumenMensualTrabajador
+(resumenes.actualizar_resumenes y reconstruir_resumenes), así que cualquier
+ruta que ajusta resúmenes la ajusta también; los conteos mensuales salen
+de las mismas filas empaquetadas. Los datos previos a esta tabla los carga
+la migración 0015; para rehacer un rango, `manage.py reconstruir_resumenes`.
+
+Lectura:
+- rejilla(proyecto, desde, hasta): matriz trabajador × día con un código
+  por celda (CODIGOS), para exportaciones y vistas de mes.
+- dias_presentes(proyecto, desde, hasta): días presente por trabajador.
+
+Un año de 2,000 trabajadores son ~24k filas en lugar de ~730k. Con NumPy
+(requirements.txt; main.spec lo incluye en el ejecutable) los meses se
+decodifican en bloque, vectorizado; sin él, p. ej. en una instalación de
+desarrollo que no lo tenga, con operaciones de bits en Python.
+`manage.py bench_compacto` compara ambos contra las consultas por fila.
+"""
+import calendar
+from datetime import timedelta
+
+from django.db.models import Q
+
+from .models import Asistencia, AsistenciaMensual, TIPOS_RETRASO
+
+DIAS_MES = 31
+# Byte de `tipos` por tipo_retraso (0: sin tipo)
+TIPOS = {tipo: i for i, (tipo, _) in enumerate(TIPOS_RETRASO, start=1)}
+# Código de celda de la rejilla -> (presente, tipo_retraso); 0 es sin registro
+CODIGOS = [None, (False, None), (True, None)] + [(True, tipo) for tipo, _ in TIPOS_RETRASO]
+
+
+def _dias_del_mes(mes):
+    return calendar.monthrange(mes.year, mes.month)[1]
+
+
+def _fin_de_mes(mes):
+    return mes.replace(day=_dias_del_mes(mes))
+
+
+def codificar(filas):
+    """
+    Empaqueta filas (trabajador_id, proyecto_id, fecha, presente, tipo_retraso)
+    en {(trabajador_id, proyecto_id, mes): (registros, presentes, tipos)}.
+    """
+    meses = {}
+    for trabajador_id, proyecto_id, fecha, presente, tipo in filas:
+        llave = (trabajador_id, proyecto_id, fecha.replace(day=1))
+        mes = meses.get(llave)
+        if mes is None:
+            mes = meses[llave] = [0, 0, bytearray(DIAS_MES)]
+        bit = 1 << (fecha.day - 1)
+        mes[0] |= bit
+        if presente:
+            mes[1] |= bit
+        mes[2][fecha.day - 1] = TIPOS.get(tipo, 0)
+    return {llave: (r, p, bytes(t)) for llave, (r, p, t) in meses.items()}
+
+
+# =======================================================
+# Mantenimiento (desde resumenes.py)
+# =======================================================
+COLUMNAS = ("trabajador_id", "proyecto_id", "fecha", "presente", "tipo_retraso")
+
+
+def filas_de_meses(meses):
+    """Filas de Asistencia (COLUMNAS) que cubren {(trabajador_id, proyecto_id, mes), …}."""
+    primer_mes = min(m for _, _, m in meses)
+    ultimo_mes = max(m for _, _, m in meses)
+    return (
+        Asistencia.objects
+        .filter(
+            trabajador_id__in={t for t, _, _ in meses},
+            proyecto_id__in={p for _, p, _ in meses},
+            fecha__range=(primer_mes, _fin_de_mes(ultimo_mes)),
+        )
+        .order_by()
+        .values_list(*COLUMNAS)
+    )
+
+
+def conteos(registros, presentes, tipos):
+    """Los conteos de ResumenMensualTrabajador a partir de un mes empaquetado."""
+    por_tipo = [0] * (len(TIPOS) + 1)
+    bits = presentes
+    while bits:
+        bit = bits & -bits
+        por_tipo[tipos[bit.bit_length() - 1]] += 1
+        bits ^= bit
+    return {
+        "presentes":      presentes.bit_count(),
+        "puntuales":      por_tipo[TIPOS["puntual"]],
+        "retardos_leves": por_tipo[TIPOS["retardo_leve"]],
+        "retardos_altos": por_tipo[TIPOS["retardo_alto"]],
+        "ausentes":       (registros & ~presentes).bit_count(),
+    }
+
+
+def guardar_meses(meses, codificados):
+    """Upsert de las llaves `meses` con datos en `codificados`; las demás se borran."""
+    vivas = [
+        AsistenciaMensual(trabajador_id=t, proyecto_id=p, mes=m, registros=r, presentes=pr, tipos=ti)
+        for (t, p, m), (r, pr, ti) in codificados.items() if (t, p, m) in meses
+    ]
+    if vivas:
+        AsistenciaMensual.objects.bulk_create(
+            vivas,
+            update_conflicts=True,
+            unique_fields=["proyecto", "mes", "trabajador"],
+            update_fields=["registros", "presentes", "tipos"],
+        )
+    vacias = meses - codificados.keys()
+    if vacias:
+        condicion = Q()
+        for t, p, m in vacias:
+            condicion |= Q(trabajador_id=t, proyecto_id=p, mes=m)
+        AsistenciaMensual.objects.filter(condicion).delete()
+
+
+def reconstruir_mes(asistencias, mes):
+    """Crea las filas compactas de `mes` desde el queryset de Asistencia de ese mes (ya borradas)."""
+    return AsistenciaMensual.objects.bulk_create(
+        (
+            AsistenciaMensual(trabajador_id=t, proyecto_id=p, mes=m, registros=r, presentes=pr, tipos=ti)
+            for (t, p, m), (r, pr, ti) in codificar(
+                asistencias.values_list(*COLUMNAS).iterator(chunk_size=5000)
+            ).items()
+        ),
+        batch_size=2000,
+    )
+
+
+# =======================================================
+# Lectura
+# =======================================================
+_np = None
+
+
+def _numpy():
+    """NumPy si está instalado (se importa al primer uso: no pesa en el arranque)."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+def _meses(proyecto_id, desde, hasta, trabajadores):
+    qs = AsistenciaMensual.objects.filter(proyecto_id=proyecto_id, mes__range=(desde.replace(day=1), hasta))
+    if trabajadores is not None:
+        qs = qs.filter(trabajador_id__in=trabajadores)
+    return list(qs.order_by().values_list("trabajador_id", "mes", "registros", "presentes", "tipos"))
+
+
+def _mascara(mes, desde, hasta):
+    """Bits de los días de `mes` dentro de [desde, hasta]."""
+    primero = max(desde, mes)
+    ultimo = min(hasta, _fin_de_mes(mes))
+    if primero > ultimo:
+        return 0
+    return ((1 << ultimo.day) - 1) & ~((1 << (primero.day - 1)) - 1)
+
+
+class Rejilla:
+    """
+    Asistencia de un proyecto en un rango: `codigos` tiene una fila por
+    trabajador (en el orden de `trabajadores`) y una columna por fecha;
+    cada celda es un índice de CODIGOS. Con NumPy es un ndarray uint8.
+    """
+
+    def __init__(self, trabajadores, fechas, codigos):
+        self.trabajadores = trabajadores
+        self.fechas = fechas
+        self.codigos = codigos
+        self._fila = {t: i for i, t in enumerate(trabajadores)}
+
+    def fila(self, trabajador_id):
+        """Códigos del trabajador por fecha (ceros si no tiene registros)."""
+        i = self._fila.get(trabajador_id)
+        if i is None:
+            return [0] * len(self.fechas)
+        fila = self.codigos[i]
+        return fila.tolist() if hasattr(fila, "tolist") else fila
+
+
+def rejilla(proyecto_id, desde, hasta, trabajadores=None):
+    """Rejilla trabajador × día de [desde, hasta]; solo trabajadores con algún registro."""
+    filas = _meses(proyecto_id, desde, hasta, trabajadores)
+    fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    ids = sorted({f[0] for f in filas})
+    np = _numpy()
+    if np is not None and filas:
+        codigos = _rejilla_numpy(np, filas, ids, desde, len(fechas))
+    else:
+        codigos = _rejilla_python(filas, ids, desde, hasta, len(fechas))
+    return Rejilla(ids, fechas, codigos)
+
+
+def _rejilla_python(filas, ids, desde, hasta, dias):
+    posicion = {t: i for i, t in enumerate(ids)}
+    codigos = [[0] * dias for _ in ids]
+    for trabajador_id, mes, registros, presentes, tipos in filas:
+        fila = codigos[posicion[trabajador_id]]
+        desplazamiento = (mes - desde).days
+        registros &= _mascara(mes, desde, hasta)
+        while registros:
+            bit = registros & -registros
+            d = bit.bit_length() - 1
+            fila[desplazamiento + d] = 2 + tipos[d] if presentes & bit else 1
+            registros ^= bit
+    return codigos
+
+
+def _rejilla_numpy(np, filas, ids, desde, dias):
+    trabajador, mes, registros, presentes, tipos = zip(*filas)
+    posicion = {t: i for i, t in enumerate(ids)}
+    fila = np.fromiter((posicion[t] for t in trabajador), dtype=np.int64, count=len(filas))
+    desplazamiento = np.fromiter(((m - desde).days for m in mes), dtype=np.int64, count=len(filas))
+    largo = np.fromiter((_dias_del_mes(m) for m in mes), dtype=np.int64, count=len(filas))
+
+    d = np.arange(DIAS_MES)
+    registro = (np.array(registros, dtype=np.int64)[:, None] >> d) & 1
+    presente = (np.array(presentes, dtype=np.int64)[:, None] >> d) & 1
+    tipo = np.frombuffer(b"".join(bytes(t).ljust(DIAS_MES, b"\0") for t in tipos), dtype=np.uint8)
+    codigo = (registro * (1 + presente * (1 + tipo.reshape(-1, DIAS_MES)))).astype(np.uint8)
+
+    # Solo los días que existen en el mes y caen dentro del rango
+    columna = desplazamiento[:, None] + d
+    validas = (d < largo[:, None]) & (columna >= 0) & (columna < dias)
+    i, j = np.nonzero(validas)
+    codigos = np.zeros((len(ids), dias), dtype=np.uint8)
+    codigos[fila[i], columna[i, j]] = codigo[i, j]
+    return codigos
+
+
+def dias_presentes(proyecto_id, desde, hasta, trabajadores=None):
+    """{trabajador_id: días presente en [desde, hasta]} (solo los que tienen registros)."""
+    filas = _meses(proyecto_id, desde, hasta, trabajadores)
+    mascaras = {}
+    np = _numpy()
+    if np is not None and filas:
+        trabajador = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+        bits = np.fromiter(
+            (f[3] & mascaras.setdefault(f[1], _mascara(f[1], desde, hasta)) for f in filas),
+            dtype=np.uint32, count=len(filas),
+        )
+        conteo = np.unpackbits(bits.view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+        ids, posicion = np.unique(trabajador, return_inverse=True)
+        totales = np.bincount(posicion, weights=conteo)
+        return dict(zip(ids.tolist(), totales.astype(np.int64).tolist()))
+
+    totales = {}
+    for trabajador_id, mes, _, presentes, _ in filas:
+        mascara = mascaras.setdefault(mes, _mascara(mes, desde, hasta))
+        totales[trabajador_id] = totales.get(trabajador_id, 0) + (presentes & mascara).bit_count()
+    return totales
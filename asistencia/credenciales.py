@@ -0,0 +1,201 @@
+"""
+Generación de credenciales QR de trabajadores.
+
+El QR lleva un token firmado (tokens_qr.py) con el trabajador, su proyecto
+principal (el de menor id, como en el escaneo) y la fecha de emisión, que
+se guardan en Trabajador.qr_proyecto y qr_emitido. El archivo se nombra
+con un hash del contenido: si el contenido no cambia, el nombre tampoco, y
+no hay nada que regenerar. El render del PNG se hace fuera del hilo de la
+petición, en un pool de hilos, una vez confirmada la transacción.
+
+Si cambia el proyecto principal la credencial se reemite y la anterior se
+revoca (reemitir); `manage.py generar_credenciales` reemite en masa.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from . import tokens_qr
+
+logger = logging.getLogger(__name__)
+
+CARPETA = "codigos_qr"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def contenido_qr(trabajador_id, proyecto_id, emitido):
+    """Texto codificado en la credencial: el token firmado (tokens_qr.emitir)."""
+    return tokens_qr.emitir(trabajador_id, proyecto_id, emitido)
+
+
+def ahora():
+    """Momento de emisión: los tokens guardan segundos."""
+    return timezone.now().replace(microsecond=0)
+
+
+def proyectos_principales(trabajador_ids):
+    """{trabajador_id: proyecto de menor id}; los que no tienen proyecto no aparecen."""
+    from .models import Trabajador
+
+    return dict(
+        Trabajador.proyectos.through.objects
+        .filter(trabajador_id__in=trabajador_ids)
+        .values("trabajador_id")
+        .annotate(proyecto_id=Min("proyecto_id"))
+        .values_list("trabajador_id", "proyecto_id")
+    )
+
+
+def actualizar_credencial(trabajador):
+    """
+    Tras guardar un trabajador: le emite su primera credencial si no tiene
+    y, si el contenido cambió (p. ej. al rotar la clave), actualiza el
+    nombre del archivo y encola el render.
+    """
+    from .models import Trabajador
+
+    campos = {}
+    if trabajador.qr_emitido is None:
+        trabajador.qr_emitido = campos["qr_emitido"] = ahora()
+        trabajador.qr_proyecto = campos["qr_proyecto"] = proyectos_principales([trabajador.pk]).get(trabajador.pk)
+    contenido = contenido_qr(trabajador.pk, trabajador.qr_proyecto, trabajador.qr_emitido)
+    archivo   = nombre_archivo(trabajador.pk, contenido)
+    if trabajador.codigo_qr.name != archivo:
+        anterior = trabajador.codigo_qr.name
+        trabajador.codigo_qr.name = campos["codigo_qr"] = archivo
+        Trabajador.objects.filter(pk=trabajador.pk).update(**campos)
+        encolar_credencial(trabajador.pk, anterior)
+    elif campos:
+        Trabajador.objects.filter(pk=trabajador.pk).update(**campos)
+
+
+def reemitir(filas, principales, motivo):
+    """
+    Nuevas credenciales para `filas` [(pk, qr_proyecto, qr_emitido, codigo_qr), …]
+    con el proyecto de `principales` ({pk: proyecto_id}). Revoca las
+    anteriores que servían para escanear y devuelve
+    [(Trabajador con los campos nuevos, contenido, archivo anterior), …]
+    sin guardar: el llamador hace el bulk_update y el render.
+    """
+    from .models import Trabajador
+
+    momento = ahora()
+    nuevas, revocadas = [], []
+    for pk, proyecto, emitido, actual in filas:
+        if emitido is not None and proyecto is not None:
+            revocadas.append((pk, emitido))
+        # La nueva debe quedar fuera de la revocación aunque sea del mismo segundo
+        nuevo = max(momento, emitido + timedelta(seconds=1)) if emitido else momento
+        contenido = contenido_qr(pk, principales.get(pk), nuevo)
+        trabajador = Trabajador(pk=pk, qr_proyecto=principales.get(pk), qr_emitido=nuevo,
+                                codigo_qr=nombre_archivo(pk, contenido))
+        nuevas.append((trabajador, contenido, actual))
+    tokens_qr.revocar(revocadas, motivo)
+    return nuevas
+
+
+def revisar_proyecto_principal(trabajador_ids):
+    """Reemite las credenciales cuyo proyecto principal ya no es el que llevan (señales)."""
+    from .models import Trabajador
+
+    principales = proyectos_principales(trabajador_ids)
+    filas = [
+        fila for fila in Trabajador.objects.filter(pk__in=trabajador_ids, qr_emitido__isnull=False)
+        .values_list("pk", "qr_proyecto", "qr_emitido", "codigo_qr")
+        if fila[1] != principales.get(fila[0])
+    ]
+    if not filas:
+        return
+    nuevas = reemitir(filas, principales, "cambio de proyecto")
+    Trabajador.objects.bulk_update([t for t, _, _ in nuevas], ["qr_proyecto", "qr_emitido", "codigo_qr"])
+    for trabajador, _, anterior in nuevas:
+        encolar_credencial(trabajador.pk, anterior)
+
+
+def nombre_archivo(trabajador_id, contenido):
+    """Ruta en MEDIA direccionada por contenido."""
+    huella = hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:12]
+    return f"{CARPETA}/trabajador_{trabajador_id}_{huella}.png"
+
+
+def renderizar_png(contenido):
+    """PNG del QR como bytes. Función pura, apta para un pool de procesos."""
+    import qrcode  # trae PIL; se carga con el primer QR, no al arrancar
+
+    buffer = BytesIO()
+    qrcode.make(contenido).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def guardar_png(nombre, png):
+    """Escribe el PNG con el nombre exacto; si ya existe (otro hilo ganó), no hace nada."""
+    if default_storage.exists(nombre):
+        return
+    guardado = default_storage.save(nombre, ContentFile(png))
+    if guardado != nombre:
+        # Carrera con otro hilo: el almacenamiento agregó un sufijo
+        default_storage.delete(guardado)
+
+
+def generar_credencial(trabajador_id, anterior=None):
+    """
+    Renderiza y guarda el QR de un trabajador si su archivo no existe.
+    `anterior` es el archivo previo, que se borra si el contenido cambió.
+    """
+    from .models import Trabajador
+
+    datos = Trabajador.objects.filter(pk=trabajador_id).values_list(
+        "qr_proyecto", "qr_emitido", "codigo_qr"
+    ).first()
+    if datos is None or datos[1] is None:
+        return
+    proyecto_id, emitido, actual = datos
+    contenido = contenido_qr(trabajador_id, proyecto_id, emitido)
+    archivo   = nombre_archivo(trabajador_id, contenido)
+    if actual != archivo:
+        # Los datos cambiaron otra vez; la tarea más reciente se encarga
+        return
+    guardar_png(archivo, renderizar_png(contenido))
+    if anterior and anterior != archivo and default_storage.exists(anterior):
+        default_storage.delete(anterior)
+
+
+def _tarea_credencial(trabajador_id, anterior):
+    try:
+        generar_credencial(trabajador_id, anterior)
+    except Exception:
+        logger.exception("No se pudo generar la credencial del trabajador %s", trabajador_id)
+    finally:
+        # El hilo del pool no pasa por el ciclo de peticiones de Django
+        connections.close_all()
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ASISTENCIA_CREDENCIALES_HILOS", 2),
+                thread_name_prefix="credenciales",
+            )
+        return _pool
+
+
+def encolar_credencial(trabajador_id, anterior=None):
+    """Programa la generación del QR para después del commit de la transacción actual."""
+    if getattr(settings, "ASISTENCIA_CREDENCIALES_ASINCRONAS", True):
+        transaction.on_commit(lambda: _obtener_pool().submit(_tarea_credencial, trabajador_id, anterior))
+    else:
+        transaction.on_commit(lambda: generar_credencial(trabajador_id, anterior))
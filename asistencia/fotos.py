@@ -0,0 +1,95 @@
+"""
+Procesamiento y almacenamiento de fotografías de trabajadores.
+
+Cada foto se guarda en WebP en varias variantes de tamaño, nombradas con el
+hash de sus píxeles: la misma foto subida dos veces ocupa un solo juego de
+archivos y, como el nombre cambia si cambia el contenido, las URL se sirven
+con caché inmutable (ver servir_media en views.py).
+"""
+import hashlib
+import io
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+CARPETA     = "trabajadores"
+TAMANO_FOTO = (300, 400)
+VARIANTES   = {
+    "original":  TAMANO_FOTO,   # credencial impresa
+    "mediana":   (150, 200),    # alta de trabajador
+    "miniatura": (60, 80),      # listas de asistencia
+}
+FORMATO   = "WEBP"
+EXTENSION = "webp"
+CALIDAD   = 80
+
+# trabajadores/<huella>.webp: la variante original, la que guarda Trabajador.fotografia
+RE_FOTO = re.compile(rf"^{CARPETA}/(?P<huella>[0-9a-f]{{16}})\.{EXTENSION}$")
+
+
+def procesar_foto(datos):
+    """
+    Recibe la imagen original (bytes) y devuelve (huella, {variante: bytes}).
+    Función pura, apta para un pool de procesos.
+    """
+    from PIL import Image  # se carga con la primera foto, no al arrancar
+
+    image = Image.open(io.BytesIO(datos))
+    # En JPEG decodifica directo a una escala reducida (≥ destino): evita
+    # descomprimir la foto completa de la cámara solo para achicarla.
+    image.draft('RGB', TAMANO_FOTO)
+    image  = image.convert('RGB').resize(TAMANO_FOTO)
+    huella = hashlib.sha256(image.tobytes()).hexdigest()[:16]
+
+    variantes = {}
+    for variante, tamano in VARIANTES.items():
+        copia = image if tamano == TAMANO_FOTO else image.resize(tamano, Image.LANCZOS)
+        buf   = io.BytesIO()
+        copia.save(buf, format=FORMATO, quality=CALIDAD)
+        variantes[variante] = buf.getvalue()
+    return huella, variantes
+
+
+def nombre_foto(huella, variante="original"):
+    """Ruta en MEDIA de una variante."""
+    if variante == "original":
+        return f"{CARPETA}/{huella}.{EXTENSION}"
+    return f"{CARPETA}/{huella}_{variante}.{EXTENSION}"
+
+
+def guardar_foto(huella, variantes):
+    """
+    Escribe las variantes que aún no existan y devuelve el nombre de la
+    original, el que se asigna a Trabajador.fotografia.
+    """
+    for variante, datos in variantes.items():
+        nombre = nombre_foto(huella, variante)
+        if default_storage.exists(nombre):
+            continue
+        guardado = default_storage.save(nombre, ContentFile(datos))
+        if guardado != nombre:
+            # Carrera con otra petición: el almacenamiento agregó un sufijo
+            default_storage.delete(guardado)
+    return nombre_foto(huella)
+
+
+def archivos_de(nombre):
+    """Todos los archivos (variantes) de una foto guardada."""
+    m = RE_FOTO.match(nombre or "")
+    if not m:
+        return [nombre] if nombre else []
+    return [nombre_foto(m["huella"], v) for v in VARIANTES]
+
+
+def url_foto(nombre, variante="original"):
+    """
+    URL de una variante. Las fotos anteriores al formato WebP (sin migrar
+    con `manage.py migrar_media`) solo tienen el archivo original.
+    """
+    if not nombre:
+        return ""
+    m = RE_FOTO.match(nombre)
+    if m:
+        nombre = nombre_foto(m["huella"], variante)
+    return default_storage.url(nombre)
@@ -0,0 +1,222 @@
+"""
+Clasificación del retraso de los escaneos.
+
+Los Horario activos se compilan en una tabla en memoria
+{(proyecto_id, dia_semana): (Turno, …)} que se arma una vez por proceso y se
+recompila cuando cambia un Horario (signals.py) o cuando vence
+ASISTENCIA_HORARIOS_TTL (cambios hechos desde otro proceso). Clasificar un
+escaneo no cuesta consultas.
+
+Con horario, el retraso se mide contra la hora de entrada del turno más
+cercano al escaneo; sin horario, contra la hora_base de la sesión del día
+(el primer escaneo del dispositivo) con las tolerancias por defecto.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Asistencia, Horario, Proyecto, SesionAsistencia
+from .resumenes import reconstruir_resumenes
+from .sincronizacion import registrar_dias
+
+# Tolerancias por defecto (minutos) para proyectos sin horario
+MINUTOS_PUNTUAL      = 10
+MINUTOS_RETARDO_LEVE = 40
+MINUTOS_MAXIMOS      = 60
+
+MINUTOS_DIA = 24 * 60
+
+# entrada: minutos desde las 00:00 (None en la política por defecto)
+Turno = namedtuple("Turno", "nombre entrada puntual retardo_leve maximos")
+# tipo es None si el escaneo excede `maximos` y debe rechazarse
+Clasificacion = namedtuple("Clasificacion", "tipo minutos maximos turno")
+
+POLITICA_DEFECTO = Turno(None, None, MINUTOS_PUNTUAL, MINUTOS_RETARDO_LEVE, MINUTOS_MAXIMOS)
+
+
+def clasificar_retraso(minutos, turno=POLITICA_DEFECTO):
+    """
+    ≤puntual: puntual; ≤retardo_leve: retardo_leve; ≤maximos: retardo_alto.
+    Devuelve None si se excede el máximo y el escaneo debe rechazarse.
+    """
+    if minutos > turno.maximos:
+        return None
+    if minutos <= turno.puntual:
+        return 'puntual'
+    if minutos <= turno.retardo_leve:
+        return 'retardo_leve'
+    return 'retardo_alto'
+
+
+def _minutos_del_dia(momento):
+    local = timezone.localtime(momento)
+    return local.hour * 60 + local.minute + local.second / 60
+
+
+def _retraso(minuto, entrada):
+    """
+    Minutos de retraso respecto a `entrada`, sobre un reloj circular para
+    que un turno de 23:00 reciba bien un escaneo a las 00:10. Las llegadas
+    anticipadas cuentan como 0.
+    """
+    diferencia = (minuto - entrada) % MINUTOS_DIA
+    return diferencia if diferencia <= MINUTOS_DIA / 2 else 0
+
+
+def _distancia(minuto, entrada):
+    diferencia = abs(minuto - entrada) % MINUTOS_DIA
+    return min(diferencia, MINUTOS_DIA - diferencia)
+
+
+def elegir_turno(turnos, minuto):
+    """El turno cuya hora de entrada queda más cerca de `minuto`."""
+    return min(turnos, key=lambda t: _distancia(minuto, t.entrada))
+
+
+class TablaHorarios:
+    """Tabla compilada de turnos por (proyecto, día de la semana)."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._tabla = None
+        self._compilada = 0.0
+        self._lock = threading.Lock()
+
+    def tabla(self):
+        ttl = self.ttl if self.ttl is not None else getattr(settings, "ASISTENCIA_HORARIOS_TTL", 60)
+        tabla = self._tabla
+        if tabla is None or time.monotonic() - self._compilada > ttl:
+            with self._lock:
+                if self._tabla is tabla:
+                    self._tabla = self.compilar()
+                    self._compilada = time.monotonic()
+                tabla = self._tabla
+        return tabla
+
+    @staticmethod
+    def compilar():
+        """Una consulta: todos los horarios activos a {(proyecto_id, dia): tupla de Turno}."""
+        generales, por_dia = {}, {}
+        for proyecto_id, dia, nombre, entrada, puntual, leve, maximos in (
+            Horario.objects.filter(activo=True).order_by("pk").values_list(
+                "proyecto_id", "dia_semana", "turno", "hora_entrada",
+                "minutos_puntual", "minutos_retardo_leve", "minutos_maximos",
+            )
+        ):
+            turno = Turno(nombre, entrada.hour * 60 + entrada.minute, puntual, leve, maximos)
+            destino = generales.setdefault(proyecto_id, {}) if dia is None else por_dia.setdefault((proyecto_id, dia), {})
+            destino[nombre] = turno
+
+        tabla = {}
+        for proyecto_id in set(generales) | {p for p, _ in por_dia}:
+            for dia in range(7):
+                turnos = por_dia.get((proyecto_id, dia)) or generales.get(proyecto_id)
+                if turnos:
+                    tabla[(proyecto_id, dia)] = tuple(sorted(turnos.values(), key=lambda t: t.entrada))
+        return tabla
+
+    def invalidar(self):
+        with self._lock:
+            self._tabla = None
+
+    def turnos(self, proyecto_id, fecha):
+        return self.tabla().get((proyecto_id, fecha.weekday()), ())
+
+    def clasificar(self, proyecto_id, momento, hora_base=None):
+        """
+        Clasifica un escaneo del proyecto en `momento`. `hora_base` (la de la
+        sesión del día) solo se usa si el proyecto no tiene horario ese día.
+        """
+        return clasificar_con(self.tabla(), proyecto_id, momento, hora_base)
+
+
+def clasificar_con(tabla, proyecto_id, momento, hora_base=None):
+    """Clasificación contra una tabla ya compilada (ver TablaHorarios.clasificar)."""
+    turnos = tabla.get((proyecto_id, timezone.localdate(momento).weekday()), ())
+    if turnos:
+        minuto  = _minutos_del_dia(momento)
+        turno   = elegir_turno(turnos, minuto)
+        minutos = _retraso(minuto, turno.entrada)
+    else:
+        turno   = POLITICA_DEFECTO
+        minutos = max(0, (momento - hora_base).total_seconds() / 60) if hora_base else 0
+    return Clasificacion(clasificar_retraso(minutos, turno), minutos, turno.maximos, turno.nombre)
+
+
+tabla_horarios = TablaHorarios()
+
+
+# =======================================================
+# Reclasificación del histórico
+# =======================================================
+def reclasificar(desde, hasta, proyecto_id=None, dias_por_lote=7):
+    """
+    Recalcula tipo_retraso de las asistencias con hora_entrada en
+    [desde, hasta] contra los horarios actuales. Lee por lotes de días (el
+    índice proyecto+fecha), clasifica el lote completo contra la tabla
+    compilada y escribe un UPDATE … WHERE id IN (…) por tipo resultante,
+    solo para las filas que cambian. Las que ahora excederían la tolerancia
+    se cuentan y no se tocan. Los días sin horario se miden contra la
+    hora_base de la sesión (dispositivo, proyecto, fecha) del escaneo; si
+    esa sesión no existe la fila se deja como está. Al final reconstruye
+    los resúmenes del rango.
+    Devuelve {"revisadas", "cambiadas", "excedidas", "sin_hora", "sin_sesion"}.
+    """
+    if dias_por_lote < 1:
+        raise ValueError("dias_por_lote debe ser al menos 1.")
+    tabla = TablaHorarios.compilar()
+    proyectos = Proyecto.objects.order_by("pk").values_list("pk", flat=True)
+    if proyecto_id:
+        proyectos = proyectos.filter(pk=proyecto_id)
+
+    totales = dict.fromkeys(("revisadas", "cambiadas", "excedidas", "sin_hora", "sin_sesion"), 0)
+    for proj_id in proyectos:
+        asistencias = Asistencia.objects.filter(proyecto_id=proj_id, presente=True)
+        totales["sin_hora"] += asistencias.filter(
+            fecha__range=(desde, hasta), hora_entrada__isnull=True
+        ).count()
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(hasta, inicio + timedelta(days=dias_por_lote - 1))
+            filas = (
+                asistencias.filter(fecha__range=(inicio, fin), hora_entrada__isnull=False)
+                .values_list("pk", "fecha", "hora_entrada", "tipo_retraso", "dispositivo_id")
+            )
+            # Días sin horario: la hora_base de la sesión del dispositivo que escaneó
+            horas_base = {
+                (d, f): h for d, f, h in
+                SesionAsistencia.objects.filter(proyecto_id=proj_id, fecha__range=(inicio, fin))
+                .values_list("dispositivo_id", "fecha", "hora_base")
+            }
+            cambios, dias, revisadas = {}, set(), 0
+            for pk, fecha, momento, actual, dispositivo_id in filas:
+                revisadas += 1
+                hora_base = None
+                if not tabla.get((proj_id, timezone.localdate(momento).weekday())):
+                    hora_base = horas_base.get((dispositivo_id, fecha))
+                    if hora_base is None:
+                        totales["sin_sesion"] += 1
+                        continue
+                tipo = clasificar_con(tabla, proj_id, momento, hora_base).tipo
+                if tipo is None:
+                    totales["excedidas"] += 1
+                elif tipo != actual:
+                    cambios.setdefault(tipo, []).append(pk)
+                    dias.add((proj_id, fecha))
+            with transaction.atomic():
+                for tipo, pks in cambios.items():
+                    for i in range(0, len(pks), 5000):
+                        Asistencia.objects.filter(pk__in=pks[i:i + 5000]).update(tipo_retraso=tipo)
+                registrar_dias(dias)
+            totales["revisadas"] += revisadas
+            totales["cambiadas"] += sum(len(p) for p in cambios.values())
+            inicio = fin + timedelta(days=1)
+
+    if totales["cambiadas"]:
+        reconstruir_resumenes(desde, hasta, proyecto_id=proyecto_id)
+    return totales
@@ -0,0 +1,240 @@
+"""
+Importación masiva de trabajadores desde un roster CSV/XLSX.
+
+Flujo por lote: validar filas (CURP/NSS), descartar duplicados contra la
+base y contra el propio archivo, convertir fotos (WebP + variantes) en un pool de procesos,
+insertar trabajadores y sus proyectos con bulk_create y renderizar sus QR.
+"""
+import csv
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import transaction
+
+from . import credenciales
+from .autorizacion import cache_autorizacion
+from .busqueda import indice_trabajadores
+from .fotos import guardar_foto, procesar_foto
+from .models import Proyecto, Trabajador
+from .rosters import tocar_proyectos
+from .sincronizacion import registrar_cambios
+
+COLUMNAS = (
+    "nombre", "apellido_paterno", "apellido_materno", "categoria",
+    "telefono", "curp", "nss", "proyectos", "foto",
+)
+OBLIGATORIAS = ("nombre", "apellido_paterno", "apellido_materno")
+
+RE_CURP = re.compile(r"^[A-Z][AEIOUX][A-Z]{2}\d{6}[HMX][A-Z]{5}[A-Z0-9]\d$")
+RE_NSS  = re.compile(r"^\d{11}$")
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede leer o no tiene las columnas esperadas."""
+
+
+# =======================================================
+# Lectura del roster y de las fotos
+# =======================================================
+def leer_roster(archivo, nombre):
+    """
+    Devuelve las filas del roster como dicts con las COLUMNAS normalizadas.
+    `archivo` es un objeto binario; `nombre` decide el formato (.csv o .xlsx).
+    """
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == ".csv":
+        texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+        filas = csv.reader(texto)
+    elif extension in (".xlsx", ".xlsm"):
+        import openpyxl
+
+        wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+        filas = wb.worksheets[0].iter_rows(values_only=True)
+    else:
+        raise ErrorImportacion("El roster debe ser .csv o .xlsx.")
+
+    try:
+        encabezado = [str(c or "").strip().lower().replace(" ", "_") for c in next(filas)]
+    except StopIteration:
+        raise ErrorImportacion("El roster está vacío.")
+    faltantes = [c for c in OBLIGATORIAS if c not in encabezado]
+    if faltantes:
+        raise ErrorImportacion(f"Faltan columnas: {', '.join(faltantes)}.")
+
+    indices = {c: encabezado.index(c) for c in COLUMNAS if c in encabezado}
+    for fila in filas:
+        if not any(fila):
+            continue
+        yield {
+            c: ("" if i >= len(fila) or fila[i] is None else str(fila[i]).strip())
+            for c, i in indices.items()
+        }
+
+
+class FuenteFotos:
+    """Fotos del roster desde una carpeta o un .zip, buscadas por nombre de archivo."""
+
+    def __init__(self, ruta=None, archivo_zip=None):
+        self.carpeta = None
+        self.zip = None
+        if archivo_zip is not None:
+            self.zip = zipfile.ZipFile(archivo_zip)
+        elif ruta and zipfile.is_zipfile(ruta):
+            self.zip = zipfile.ZipFile(ruta)
+        elif ruta:
+            self.carpeta = ruta
+        # Índice por nombre base: el zip puede traer subcarpetas
+        self._zip_nombres = (
+            {os.path.basename(n): n for n in self.zip.namelist() if not n.endswith("/")}
+            if self.zip else {}
+        )
+
+    def leer(self, nombre):
+        if not nombre:
+            return None
+        nombre = os.path.basename(nombre)
+        if self.zip:
+            interno = self._zip_nombres.get(nombre)
+            return self.zip.read(interno) if interno else None
+        if self.carpeta:
+            ruta = os.path.join(self.carpeta, nombre)
+            if os.path.isfile(ruta):
+                with open(ruta, "rb") as f:
+                    return f.read()
+        return None
+
+
+# =======================================================
+# Validación
+# =======================================================
+def validar_fila(fila, proyectos_validos):
+    """Normaliza la fila en su lugar y devuelve la lista de errores."""
+    errores = [f"{c} es obligatorio." for c in OBLIGATORIAS if not fila.get(c)]
+
+    fila["curp"] = fila.get("curp", "").upper().replace(" ", "")
+    if fila["curp"] and not RE_CURP.match(fila["curp"]):
+        errores.append("CURP inválida.")
+    fila["nss"] = re.sub(r"[\s-]", "", fila.get("nss", ""))
+    if fila["nss"] and not RE_NSS.match(fila["nss"]):
+        errores.append("NSS inválido (11 dígitos).")
+
+    ids = set()
+    for valor in re.split(r"[,;|]", fila.get("proyectos", "")):
+        valor = valor.strip()
+        if not valor:
+            continue
+        if not valor.isdigit() or int(valor) not in proyectos_validos:
+            errores.append(f"Proyecto {valor} no existe.")
+        else:
+            ids.add(int(valor))
+    fila["proyectos"] = ids
+    return errores
+
+
+# =======================================================
+# Importación
+# =======================================================
+def importar_trabajadores(filas, fotos=None, proyecto_default=None, procesos=None, lote=500):
+    """
+    Importa las filas (de leer_roster) y devuelve
+    {"creados", "duplicados", "errores", "detalle": [...]} con una entrada por
+    fila omitida o con error. `proyecto_default` se asigna a las filas sin
+    columna de proyectos.
+    """
+    fotos = fotos or FuenteFotos()
+    proyectos_validos = set(Proyecto.objects.values_list("pk", flat=True))
+    curps = set(Trabajador.objects.exclude(curp__isnull=True).exclude(curp="").values_list("curp", flat=True))
+    nsss  = set(Trabajador.objects.exclude(nss__isnull=True).exclude(nss="").values_list("nss", flat=True))
+
+    resumen = {"creados": 0, "duplicados": 0, "errores": 0, "detalle": []}
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = []
+        for numero, fila in enumerate(filas, start=2):  # la fila 1 es el encabezado
+            errores = validar_fila(fila, proyectos_validos)
+            if errores:
+                resumen["errores"] += 1
+                resumen["detalle"].append({"fila": numero, "estado": "error", "errores": errores})
+                continue
+            if (fila["curp"] and fila["curp"] in curps) or (fila["nss"] and fila["nss"] in nsss):
+                resumen["duplicados"] += 1
+                resumen["detalle"].append({"fila": numero, "estado": "duplicado"})
+                continue
+            if fila["curp"]:
+                curps.add(fila["curp"])
+            if fila["nss"]:
+                nsss.add(fila["nss"])
+            if not fila["proyectos"] and proyecto_default:
+                fila["proyectos"] = {proyecto_default}
+            pendientes.append((numero, fila))
+
+            if len(pendientes) >= lote:
+                _insertar_lote(pendientes, fotos, pool, resumen)
+                pendientes = []
+        if pendientes:
+            _insertar_lote(pendientes, fotos, pool, resumen)
+    return resumen
+
+
+def _insertar_lote(pendientes, fotos, pool, resumen):
+    # 1) fotos: lectura en este proceso, redimensionado en paralelo
+    originales = [(i, fotos.leer(fila.get("foto"))) for i, (_, fila) in enumerate(pendientes)]
+    con_foto   = [(i, datos) for i, datos in originales if datos]
+    for i, datos in originales:
+        if datos is None and pendientes[i][1].get("foto"):
+            resumen["detalle"].append({"fila": pendientes[i][0], "estado": "advertencia",
+                                       "errores": ["Fotografía no encontrada."]})
+    archivos_foto = {}
+    futuros = [(i, pool.submit(procesar_foto, datos)) for i, datos in con_foto]
+    for i, futuro in futuros:
+        try:
+            archivos_foto[i] = guardar_foto(*futuro.result())
+        except Exception:
+            numero = pendientes[i][0]
+            resumen["detalle"].append({"fila": numero, "estado": "advertencia",
+                                       "errores": ["No se pudo procesar la fotografía."]})
+
+    # 2) trabajadores y proyectos
+    emitido = credenciales.ahora()
+    with transaction.atomic():
+        trabajadores = Trabajador.objects.bulk_create([
+            Trabajador(
+                nombre=fila["nombre"],
+                apellido_paterno=fila["apellido_paterno"],
+                apellido_materno=fila["apellido_materno"],
+                categoria=fila.get("categoria", ""),
+                telefono=fila.get("telefono", ""),
+                curp=fila["curp"] or None,
+                nss=fila["nss"] or None,
+                fotografia=archivos_foto.get(i),
+                qr_proyecto=min(fila["proyectos"], default=None),
+                qr_emitido=emitido,
+            )
+            for i, (_, fila) in enumerate(pendientes)
+        ])
+        Trabajador.proyectos.through.objects.bulk_create([
+            Trabajador.proyectos.through(trabajador_id=t.pk, proyecto_id=p)
+            for t, (_, fila) in zip(trabajadores, pendientes)
+            for p in fila["proyectos"]
+        ])
+
+        # 3) credenciales QR: nombre direccionado por contenido y render en el pool
+        contenidos = []
+        for t in trabajadores:
+            contenido = credenciales.contenido_qr(t.pk, t.qr_proyecto, t.qr_emitido)
+            t.codigo_qr.name = credenciales.nombre_archivo(t.pk, contenido)
+            contenidos.append(contenido)
+        Trabajador.objects.bulk_update(trabajadores, ["codigo_qr"])
+        registrar_cambios("trabajador", [t.pk for t in trabajadores])
+
+    # bulk_create no emite señales
+    cache_autorizacion.invalidar_trabajadores([t.pk for t in trabajadores])
+    indice_trabajadores.recargar([t.pk for t in trabajadores])
+    tocar_proyectos({p for _, fila in pendientes for p in fila["proyectos"]})
+
+    for t, png in zip(trabajadores, pool.map(credenciales.renderizar_png, contenidos, chunksize=32)):
+        credenciales.guardar_png(t.codigo_qr.name, png)
+
+    resumen["creados"] += len(trabajadores)
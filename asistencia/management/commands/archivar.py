@@ -0,0 +1,98 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from asistencia.archivo import MESES_ABIERTOS, archivar_mes, corte, pendientes, restaurar_mes
+from asistencia.models import AsistenciaArchivada
+
+
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Mes inválido: {valor!r} (formato YYYY-MM).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a AsistenciaArchivada (JSON comprimido) las asistencias y "
+        "sesiones de los meses anteriores a los últimos "
+        "ASISTENCIA_ARCHIVO_MESES, un proyecto-mes por transacción. Con "
+        "--restaurar las devuelve a las tablas vivas. Se puede interrumpir "
+        "y volver a correr: cada lote queda confirmado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=None,
+                            help="Meses que quedan vivos. Default: ASISTENCIA_ARCHIVO_MESES.")
+        parser.add_argument("--proyecto", type=int, help="Limita a un proyecto.")
+        parser.add_argument("--limite", type=int, default=None,
+                            help="Máximo de proyecto-mes a procesar en esta corrida.")
+        parser.add_argument("--pausa", type=float, default=0.0,
+                            help="Segundos entre lotes para dejar pasar a otros escritores (default: 0).")
+        parser.add_argument("--simular", action="store_true",
+                            help="Solo lista los proyecto-mes que se procesarían.")
+        parser.add_argument("--restaurar", action="store_true",
+                            help="Restaura en lugar de archivar (usar con --desde/--hasta).")
+        parser.add_argument("--desde", type=_mes, help="Primer mes a restaurar (YYYY-MM).")
+        parser.add_argument("--hasta", type=_mes, help="Último mes a restaurar (YYYY-MM).")
+
+    def handle(self, *args, **options):
+        if options["restaurar"]:
+            lotes = self._archivados(options)
+        else:
+            meses = options["meses"]
+            if meses is None:
+                meses = getattr(settings, "ASISTENCIA_ARCHIVO_MESES", 13)
+            if meses < MESES_ABIERTOS:
+                raise CommandError(f"--meses debe ser al menos {MESES_ABIERTOS}.")
+            self.stdout.write(f"Se archiva lo anterior a {corte(meses):%Y-%m}.")
+            lotes = pendientes(meses, options["proyecto"])
+        if options["limite"] is not None:
+            lotes = lotes[:options["limite"]]
+        if not lotes:
+            self.stdout.write("Nada que procesar.")
+            return
+
+        accion = "restaurar" if options["restaurar"] else "archivar"
+        total_filas = 0
+        inicio = time.perf_counter()
+        for n, (proyecto_id, mes) in enumerate(lotes):
+            if options["simular"]:
+                self.stdout.write(f"{accion}: proyecto {proyecto_id} {mes:%Y-%m}")
+                continue
+            if n and options["pausa"]:
+                time.sleep(options["pausa"])
+            t = time.perf_counter()
+            if options["restaurar"]:
+                asistencias, sesiones = restaurar_mes(proyecto_id, mes)
+                detalle = ""
+            else:
+                archivo = archivar_mes(proyecto_id, mes)
+                if archivo is None:
+                    continue
+                asistencias, sesiones = archivo.asistencias, archivo.sesiones
+                detalle = f", {len(archivo.datos) / 1024:.1f} KiB"
+            total_filas += asistencias + sesiones
+            self.stdout.write(
+                f"proyecto {proyecto_id} {mes:%Y-%m}: {asistencias} asistencias, {sesiones} sesiones"
+                f"{detalle} ({(time.perf_counter() - t) * 1000:.0f} ms)"
+            )
+
+        if not options["simular"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(lotes)} proyecto-mes, {total_filas} filas ({accion}) "
+                f"en {time.perf_counter() - inicio:.1f} s"
+            ))
+
+    def _archivados(self, options):
+        qs = AsistenciaArchivada.objects.order_by("mes", "proyecto_id")
+        if options["proyecto"]:
+            qs = qs.filter(proyecto_id=options["proyecto"])
+        if options["desde"]:
+            qs = qs.filter(mes__gte=options["desde"])
+        if options["hasta"]:
+            qs = qs.filter(mes__lte=options["hasta"])
+        return list(qs.values_list("proyecto_id", "mes"))
@@ -0,0 +1,87 @@
+import base64
+import math
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from asistencia.benchmark import base_de_datos_temporal, crear_cuadrilla, crear_proyecto
+from asistencia.models import Asistencia
+
+
+def cursor_en(pk):
+    """Cursor de CursorPaginacion posicionado justo después de `pk` (orden -id)."""
+    return base64.b64encode(urlencode({"p": pk}).encode()).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga N asistencias en una base temporal y mide el tiempo de "
+        "GET /api/asistencias/ en distintas posiciones del cursor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=1_000_000,
+                            help="Asistencias a generar (default: 1,000,000).")
+        parser.add_argument("--trabajadores", type=int, default=2000)
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            self._poblar(options["filas"], options["trabajadores"])
+            ids = list(Asistencia.objects.order_by("pk").values_list("pk", flat=True)[:: max(1, options["filas"] // 100)])
+            ultimo = ids[-1]
+
+            client = Client()
+            escenarios = [("primera página", None)] + [
+                (f"posición {pct}%", ids[min(len(ids) - 1, len(ids) * (100 - pct) // 100)])
+                for pct in (10, 50, 90, 99)
+            ]
+            self.stdout.write(f"{'escenario':<28} {'consultas':>9} {'ms (mediana)':>13}")
+            for filtro, extra in (("sin filtro", {}), ("proyecto", {"proyecto": self.proyecto.pk}),
+                                  ("?fields=", {"fields": "id,fecha,presente"})):
+                for nombre, pk in escenarios:
+                    params = dict(extra)
+                    if pk is not None:
+                        params["cursor"] = cursor_en(pk if pk != ultimo else pk + 1)
+                    tiempos, consultas = [], 0
+                    for _ in range(options["repeticiones"]):
+                        with CaptureQueriesContext(connection) as ctx:
+                            inicio = time.perf_counter()
+                            resp = client.get("/api/asistencias/", params)
+                            tiempos.append((time.perf_counter() - inicio) * 1000)
+                        consultas = len(ctx.captured_queries)
+                        assert resp.status_code == 200, resp.content
+                    tiempos.sort()
+                    self.stdout.write(
+                        f"{filtro + ' / ' + nombre:<28} {consultas:>9} {tiempos[len(tiempos) // 2]:>13.1f}"
+                    )
+
+    def _poblar(self, filas, n_trabajadores):
+        inicio = time.perf_counter()
+        self.proyecto = crear_proyecto()
+        otro = crear_proyecto("Otro proyecto")
+        mitad = n_trabajadores // 2
+        trabajadores = (
+            [(t, self.proyecto.pk) for t in crear_cuadrilla(self.proyecto, mitad, prefijo="A")]
+            + [(t, otro.pk) for t in crear_cuadrilla(otro, n_trabajadores - mitad, prefijo="B")]
+        )
+        dias = math.ceil(filas / len(trabajadores))
+        primer_dia = date.today() - timedelta(days=dias)
+        lote, creadas = [], 0
+        for d in range(dias):
+            fecha = primer_dia + timedelta(days=d)
+            for trab_id, proj_id in trabajadores:
+                if creadas >= filas:
+                    break
+                lote.append(Asistencia(trabajador_id=trab_id, proyecto_id=proj_id, fecha=fecha,
+                                       presente=True, tipo_retraso="puntual"))
+                creadas += 1
+            if len(lote) >= 50_000 or creadas >= filas:
+                Asistencia.objects.bulk_create(lote, batch_size=5000)
+                lote = []
+        self.stdout.write(f"{creadas} asistencias generadas en {time.perf_counter() - inicio:.1f} s")
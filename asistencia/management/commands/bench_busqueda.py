@@ -0,0 +1,104 @@
+import random
+import string
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from asistencia.benchmark import base_de_datos_temporal, medir
+from asistencia.busqueda import IndiceTrabajadores, normalizar
+from asistencia.models import Proyecto, Trabajador
+
+NOMBRES = (
+    "José", "Juan", "María", "Guadalupe", "Luis", "Jesús", "Miguel Ángel", "Francisco", "Martín",
+    "Rosa", "Verónica", "Héctor", "Raúl", "Ramón", "Sofía", "Andrés", "Rubén", "Iñaki", "Noé", "Efraín",
+)
+APELLIDOS = (
+    "Hernández", "García", "Martínez", "López", "González", "Pérez", "Rodríguez", "Sánchez", "Ramírez",
+    "Cruz", "Flores", "Gómez", "Díaz", "Reyes", "Morales", "Jiménez", "Ruiz", "Ibáñez", "Peña", "Núñez",
+    "Muñoz", "Ortíz", "Gutiérrez", "Chávez", "Vázquez", "Castañeda", "Álvarez", "Mendoza", "Aguilar", "Olvera",
+)
+
+
+def _curp(rnd):
+    letras = "".join(rnd.choices(string.ascii_uppercase, k=4))
+    return f"{letras}{rnd.randrange(10**6):06d}{rnd.choice('HM')}{''.join(rnd.choices(string.ascii_uppercase, k=5))}{rnd.randrange(100):02d}"
+
+
+def _icontains(consulta):
+    qs = Trabajador.objects.all()
+    for termino in consulta.split():
+        qs = qs.filter(
+            Q(nombre__icontains=termino) | Q(apellido_paterno__icontains=termino)
+            | Q(apellido_materno__icontains=termino) | Q(curp__icontains=termino) | Q(nss__icontains=termino)
+        )
+    return list(qs.order_by("apellido_paterno", "apellido_materno", "nombre")[:10])
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera trabajadores sintéticos en una base temporal y mide el índice "
+        "de búsqueda en memoria (armado, memoria y latencia por consulta) "
+        "contra la búsqueda con icontains."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabajadores", type=int, default=50000)
+        parser.add_argument("--consultas", type=int, default=2000)
+        parser.add_argument("--semilla", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["semilla"])
+        with base_de_datos_temporal():
+            proyecto = Proyecto.objects.create(nombre="Bench búsqueda")
+            trabajadores = Trabajador.objects.bulk_create([
+                Trabajador(
+                    nombre=rnd.choice(NOMBRES), apellido_paterno=rnd.choice(APELLIDOS),
+                    apellido_materno=rnd.choice(APELLIDOS), categoria="Ayudante", telefono="0",
+                    curp=_curp(rnd), nss=f"{rnd.randrange(10**11):011d}",
+                )
+                for _ in range(options["trabajadores"])
+            ], batch_size=5000)
+            Trabajador.proyectos.through.objects.bulk_create([
+                Trabajador.proyectos.through(trabajador_id=t.pk, proyecto_id=proyecto.pk)
+                for t in trabajadores[::2]
+            ], batch_size=5000)
+
+            indice = IndiceTrabajadores(ttl=None)
+            tracemalloc.start()
+            indice.precargar(en_segundo_plano=False)
+            memoria = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            indice.limpiar()
+            inicio = time.perf_counter()
+            indice.precargar(en_segundo_plano=False)
+            armado = time.perf_counter() - inicio
+            self.stdout.write(
+                f"{len(trabajadores)} trabajadores: índice armado en {armado:.2f} s, "
+                f"{memoria / 2**20:.0f} MiB, {len(indice._vocabulario)} tokens\n"
+            )
+
+            muestra = rnd.sample(trabajadores, 50)
+            tipos = {
+                "prefijo 2-4":  lambda t: normalizar(t.apellido_paterno)[:rnd.randint(2, 4)],
+                "nombre+apellido": lambda t: f"{t.nombre.split()[0]} {t.apellido_paterno[:4]}",
+                "sin acentos":  lambda t: normalizar(f"{t.apellido_paterno} {t.apellido_materno}"),
+                "curp prefijo": lambda t: t.curp[:8],
+                "nss en medio": lambda t: t.nss[3:8],
+            }
+            self.stdout.write(f"{'consulta':<16} {'p50 ms':>8} {'p95 ms':>8} {'máx ms':>8} {'icontains ms':>13}")
+            por_tipo = max(1, options["consultas"] // len(tipos))
+            for nombre, generar in tipos.items():
+                consultas = [generar(rnd.choice(muestra)) for _ in range(por_tipo)]
+                tiempos = []
+                for i, consulta in enumerate(consultas):
+                    inicio = time.perf_counter()
+                    indice.buscar(consulta, 10, proyecto.pk if i % 2 else None)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                tiempos.sort()
+                base = sorted(medir(_icontains, c)[1] * 1000 for c in consultas[:5])[2]
+                self.stdout.write(
+                    f"{nombre:<16} {tiempos[len(tiempos) // 2]:>8.2f} {tiempos[int(len(tiempos) * 0.95)]:>8.2f} "
+                    f"{tiempos[-1]:>8.2f} {base:>13.1f}"
+                )
@@ -0,0 +1,78 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from asistencia import compacto
+from asistencia.benchmark import ESCALAS, base_de_datos_temporal, medir, poblar
+from asistencia.models import Asistencia, AsistenciaMensual
+
+
+def _rejilla_filas(proyecto_id, desde, hasta):
+    """La lectura por filas que hacía la exportación: índice (trabajador, fecha)."""
+    return {
+        (t, f): (p, tipo) for t, f, p, tipo in
+        Asistencia.objects.filter(proyecto_id=proyecto_id, fecha__range=(desde, hasta))
+        .order_by().values_list("trabajador_id", "fecha", "presente", "tipo_retraso")
+        .iterator(chunk_size=2000)
+    }
+
+
+def _presentes_filas(proyecto_id, desde, hasta):
+    return dict(
+        Asistencia.objects.filter(proyecto_id=proyecto_id, fecha__range=(desde, hasta))
+        .order_by().values("trabajador_id")
+        .annotate(n=Count("pk", filter=Q(presente=True)))
+        .values_list("trabajador_id", "n")
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la lectura de rejillas (trabajador × día) y de días presentes "
+        "por trabajador desde Asistencia (una fila por día) contra la "
+        "asistencia compacta (una fila por mes), con y sin NumPy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escala", choices=sorted(ESCALAS), default="media",
+                            help="Tamaño de los datos (default: media).")
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        modos = [("filas", None), ("compacto", False)]
+        if compacto._numpy() is not None:
+            modos.append(("compacto+numpy", None))
+        else:
+            self.stdout.write("NumPy no está instalado: solo se mide la decodificación en Python.")
+
+        with base_de_datos_temporal():
+            inicio = time.perf_counter()
+            datos = poblar(**ESCALAS[options["escala"]])
+            self.stdout.write(
+                f"{Asistencia.objects.count()} filas de Asistencia, "
+                f"{AsistenciaMensual.objects.count()} de AsistenciaMensual "
+                f"({time.perf_counter() - inicio:.1f} s)\n"
+            )
+            proyecto = datos.proyectos[0]
+            hasta = datos.ultimo_dia
+            consultas = [
+                ("rejilla 1 mes", hasta - timedelta(days=29), _rejilla_filas, compacto.rejilla),
+                ("rejilla 1 año", hasta - timedelta(days=364), _rejilla_filas, compacto.rejilla),
+                ("presentes 1 año", hasta - timedelta(days=364), _presentes_filas, compacto.dias_presentes),
+            ]
+
+            self.stdout.write(f"{'consulta':<18} {'modo':<16} {'ms (mediana)':>13} {'consultas':>10}")
+            for nombre, desde, por_filas, por_compacto in consultas:
+                desde = max(desde, datos.primer_dia)
+                for modo, numpy in modos:
+                    funcion = por_filas if modo == "filas" else por_compacto
+                    tiempos = []
+                    with mock.patch.object(compacto, "_np", numpy):
+                        for _ in range(options["repeticiones"]):
+                            _, segundos, n = medir(funcion, proyecto, desde, hasta)
+                            tiempos.append(segundos * 1000)
+                    tiempos.sort()
+                    self.stdout.write(f"{nombre:<18} {modo:<16} {tiempos[len(tiempos) // 2]:>13.1f} {n:>10}")
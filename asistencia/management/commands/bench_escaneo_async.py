@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from asistencia import agrupador as modulo_agrupador
+from asistencia.autorizacion import cache_autorizacion
+from asistencia.benchmark import base_de_datos_temporal, crear_cuadrilla, crear_proyecto
+from asistencia.models import Asistencia, Dispositivo
+
+
+def _percentil(tiempos, q):
+    return tiempos[min(len(tiempos) - 1, int(len(tiempos) * q))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del escaneo QR en ráfaga (inicio de turno): la vista "
+        "síncrona por WSGI con un pool de hilos contra la vista async por ASGI, "
+        "con y sin agrupar escrituras. Cada modo escanea su propia cuadrilla; "
+        "reporta escaneos por segundo sostenidos y latencias p50/p99."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escaneos", type=int, default=1000, help="Escaneos por modo (default: 1000).")
+        parser.add_argument("--dispositivos", type=int, default=10)
+        parser.add_argument("--hilos", type=int, default=32,
+                            help="Hilos del pool WSGI (default: 32, como TASAL_SERVIDOR_HILOS alto).")
+        parser.add_argument("--concurrencia", type=int, default=200,
+                            help="Peticiones simultáneas en ASGI (default: 200).")
+
+    def handle(self, *args, **options):
+        n = options["escaneos"]
+        modos = [
+            ("wsgi", self._wsgi, {}),
+            ("asgi", self._asgi, {}),
+            ("asgi sin agrupar", self._asgi, {"ASISTENCIA_ESCANEO_LOTE": 1}),
+        ]
+        with base_de_datos_temporal():
+            proyecto = crear_proyecto("Bench escaneo")
+            dispositivos = []
+            for i in range(options["dispositivos"]):
+                disp = Dispositivo.objects.create(device_id=f"bench-async-{i}")
+                disp.proyectos.add(proyecto)
+                dispositivos.append(disp.device_id)
+            cuadrillas = [crear_cuadrilla(proyecto, n, prefijo=f"M{i}") for i in range(len(modos))]
+            cache_autorizacion.limpiar()
+
+            self.stdout.write(
+                f"{'modo':<18} {'escaneos/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} {'por lote':>9}"
+            )
+            for (nombre, correr, ajustes), trabajadores in zip(modos, cuadrillas):
+                peticiones = [
+                    (trab_id, dispositivos[i % len(dispositivos)]) for i, trab_id in enumerate(trabajadores)
+                ]
+                lotes_antes = self._lotes()
+                with override_settings(**ajustes):
+                    inicio = time.perf_counter()
+                    resultados = correr(peticiones, options)
+                    total = time.perf_counter() - inicio
+                tiempos = sorted(t for _, t in resultados)
+                errores = sum(1 for codigo, _ in resultados if codigo != 200)
+                lotes = self._lotes() - lotes_antes
+                self.stdout.write(
+                    f"{nombre:<18} {len(resultados) / total:>10.0f} {_percentil(tiempos, 0.5):>8.1f} "
+                    f"{_percentil(tiempos, 0.99):>8.1f} {errores:>8} "
+                    f"{(n / lotes if lotes else 1):>9.1f}"
+                )
+
+            esperados = n * len(modos)
+            if Asistencia.objects.count() != esperados:
+                raise CommandError(f"Se esperaban {esperados} asistencias y hay {Asistencia.objects.count()}.")
+
+    @staticmethod
+    def _lotes():
+        return sum(a.lotes for a in list(modulo_agrupador._agrupadores.values()))
+
+    @staticmethod
+    def _wsgi(peticiones, options):
+        def escanear(peticion):
+            trab_id, device_id = peticion
+            try:
+                inicio = time.perf_counter()
+                resp = Client().get(f"/asistencia/registrar-qr/{trab_id}/", {"device_id": device_id})
+                return resp.status_code, (time.perf_counter() - inicio) * 1000
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=options["hilos"]) as pool:
+            return list(pool.map(escanear, peticiones))
+
+    @staticmethod
+    def _asgi(peticiones, options):
+        async def correr():
+            cliente = AsyncClient()
+            limite = asyncio.Semaphore(options["concurrencia"])
+
+            async def escanear(trab_id, device_id):
+                async with limite:
+                    inicio = time.perf_counter()
+                    resp = await cliente.get(f"/asistencia/registrar-qr-async/{trab_id}/", {"device_id": device_id})
+                    return resp.status_code, (time.perf_counter() - inicio) * 1000
+
+            return await asyncio.gather(*(escanear(t, d) for t, d in peticiones))
+
+        return asyncio.run(correr())
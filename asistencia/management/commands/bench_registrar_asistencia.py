@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from asistencia.benchmark import base_de_datos_temporal, crear_cuadrilla, crear_proyecto, medir
+from asistencia.registro import registrar_asistencias_bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide consultas y tiempo del registro masivo de asistencia "
+        "(RegistrarAsistenciaView) para distintos tamaños de payload."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanos", type=int, nargs="+", default=[50, 500, 5000],
+            help="Tamaños de payload a medir (default: 50 500 5000).",
+        )
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            self.stdout.write(f"{'filas':>8} {'escritura':>10} {'consultas':>10} {'segundos':>10}")
+            for n, tamano in enumerate(options["tamanos"]):
+                proyecto = crear_proyecto(f"Benchmark {tamano}")
+                ids = crear_cuadrilla(proyecto, tamano, prefijo=f"B{n}")
+                fecha = date.today() - timedelta(days=n)
+                payload = [{"trabajador": pk, "presente": True} for pk in ids]
+
+                # Primera pasada inserta; la segunda actualiza los mismos registros.
+                for etiqueta in ("insert", "update"):
+                    _, segundos, consultas = medir(registrar_asistencias_bulk, proyecto, fecha, payload)
+                    self.stdout.write(f"{tamano:>8} {etiqueta:>10} {consultas:>10} {segundos:>10.4f}")
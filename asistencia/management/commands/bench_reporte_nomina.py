@@ -0,0 +1,88 @@
+import math
+import resource
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+
+from asistencia.benchmark import base_de_datos_temporal, crear_cuadrilla, crear_proyecto
+from asistencia.models import Asistencia
+
+
+def _rss_mb():
+    """Pico de memoria residente del proceso (ru_maxrss está en KiB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga N asistencias en varios proyectos sobre una base temporal y mide "
+        "GET /asistencia/reporte-nomina/ (CSV y NDJSON): tiempo, bytes y memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=10_000_000,
+                            help="Asistencias a generar (default: 10,000,000).")
+        parser.add_argument("--trabajadores", type=int, default=20_000)
+        parser.add_argument("--proyectos", type=int, default=4)
+        parser.add_argument("--dias-periodo", type=int, default=15,
+                            help="Largo de cada periodo de nómina medido (default: 15).")
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            primer_dia, dias = self._poblar(options["filas"], options["trabajadores"], options["proyectos"])
+            ultimo_dia = primer_dia + timedelta(days=dias - 1)
+            periodo = timedelta(days=options["dias_periodo"] - 1)
+
+            client = Client()
+            self.stdout.write(f"{'periodo':<26} {'formato':>7} {'registros':>10} {'MB':>9} "
+                              f"{'segundos':>9} {'RSS pico MB':>12}")
+            for desde, hasta in ((ultimo_dia - periodo, ultimo_dia), (primer_dia, ultimo_dia)):
+                for formato in ("csv", "ndjson"):
+                    inicio = time.perf_counter()
+                    resp = client.get("/asistencia/reporte-nomina/", {
+                        "start_date": desde.isoformat(), "end_date": hasta.isoformat(), "formato": formato,
+                    })
+                    assert resp.status_code == 200, resp.content
+                    tamano = lineas = 0
+                    for bloque in resp.streaming_content:
+                        tamano += len(bloque)
+                        lineas += bloque.count(b"\n")
+                    segundos = time.perf_counter() - inicio
+                    registros = lineas - (formato == "csv")
+                    self.stdout.write(
+                        f"{desde} a {hasta}  {formato:>7} {registros:>10} {tamano / 2**20:>9.1f} "
+                        f"{segundos:>9.1f} {_rss_mb():>12.0f}"
+                    )
+
+    def _poblar(self, filas, n_trabajadores, n_proyectos):
+        """Inserta con executemany directo: 10M filas por el ORM tardarían demasiado."""
+        inicio = time.perf_counter()
+        trabajadores = []
+        por_proyecto = math.ceil(n_trabajadores / n_proyectos)
+        for p in range(n_proyectos):
+            proyecto = crear_proyecto(f"Obra {p}")
+            trabajadores += [(t, proyecto.pk) for t in crear_cuadrilla(proyecto, por_proyecto, prefijo=f"P{p}")]
+        dias = math.ceil(filas / len(trabajadores))
+        primer_dia = date.today() - timedelta(days=dias)
+        tipos = ("puntual", "puntual", "puntual", "retardo_leve", "retardo_alto", None)
+
+        sql = (f"INSERT INTO {Asistencia._meta.db_table} "
+               "(trabajador_id, proyecto_id, fecha, presente, tipo_retraso) VALUES (%s, %s, %s, %s, %s)")
+        creadas = 0
+        with connection.cursor() as cursor:
+            for d in range(dias):
+                fecha = (primer_dia + timedelta(days=d)).isoformat()
+                lote = [
+                    (t, p, fecha, (t + d) % 9 != 0, tipos[(t * 7 + d) % len(tipos)])
+                    for t, p in trabajadores[:filas - creadas]
+                ]
+                with transaction.atomic():
+                    cursor.executemany(sql, lote)
+                creadas += len(lote)
+            cursor.execute("ANALYZE")
+        self.stdout.write(f"{creadas} asistencias en {len(trabajadores)} trabajadores / {dias} días "
+                          f"generadas en {time.perf_counter() - inicio:.1f} s")
+        return primer_dia, dias
@@ -0,0 +1,91 @@
+import json
+import platform
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from asistencia.benchmark import (
+    ESCALAS, ESCENARIOS, base_de_datos_temporal, comparar, correr_escenario, poblar,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos en una base temporal y mide los endpoints de "
+        "registro (QR y masivo), exportación y la API REST: p50/p95, "
+        "peticiones por segundo y consultas por petición. Compara contra la "
+        "línea base de ASISTENCIA_BENCH_LINEA_BASE y falla si hay regresión."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escala", choices=sorted(ESCALAS), default="chica",
+                            help="Tamaño de los datos (default: chica).")
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--escenarios", nargs="+", choices=sorted(ESCENARIOS),
+                            help="Default: todos.")
+        parser.add_argument("--peticiones", type=int, default=50,
+                            help="Peticiones medidas por escenario (default: 50).")
+        parser.add_argument("--hilos", type=int, default=1,
+                            help="Clientes concurrentes (prueba de carga). Default: 1.")
+        parser.add_argument("--umbral", type=float, default=0.25,
+                            help="Aumento tolerado del p95 sobre la línea base (default: 0.25 = 25 %%).")
+        parser.add_argument("--minimo-ms", type=float, default=2.0,
+                            help="Aumento del p95 que siempre se tolera, en ms (default: 2).")
+        parser.add_argument("--guardar", action="store_true",
+                            help="Guarda los resultados como nueva línea base en lugar de comparar.")
+
+    def handle(self, *args, **options):
+        ruta = settings.ASISTENCIA_BENCH_LINEA_BASE
+        clave = f"{options['escala']}/{options['hilos']}h"
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                lineas_base = json.load(f)
+        except FileNotFoundError:
+            lineas_base = {}
+        linea_base = lineas_base.get(clave, {}).get("escenarios", {})
+
+        resultados = {}
+        with base_de_datos_temporal():
+            inicio = time.perf_counter()
+            datos = poblar(**ESCALAS[options["escala"]], semilla=options["semilla"])
+            self.stdout.write(
+                f"Datos '{options['escala']}': {len(datos.proyectos)} proyectos, "
+                f"{sum(map(len, datos.trabajadores.values()))} trabajadores, "
+                f"{datos.asistencias} asistencias ({time.perf_counter() - inicio:.1f} s)\n"
+            )
+            self.stdout.write(
+                f"{'escenario':<18} {'p50 ms':>8} {'p95 ms':>8} {'pet/s':>8} {'consultas':>9} "
+                f"{'base p95':>9} {'base cons.':>10}"
+            )
+            for nombre in options["escenarios"] or ESCENARIOS:
+                r = resultados[nombre] = correr_escenario(
+                    ESCENARIOS[nombre], datos, options["peticiones"], hilos=options["hilos"],
+                )
+                base = linea_base.get(nombre, {})
+                self.stdout.write(
+                    f"{nombre:<18} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['rps']:>8.1f} {r['consultas']:>9} "
+                    f"{base.get('p95_ms', '-'):>9} {base.get('consultas', '-'):>10}"
+                )
+
+        if options["guardar"]:
+            lineas_base[clave] = {
+                "fecha": timezone.now().isoformat(timespec="seconds"),
+                "maquina": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+                "peticiones": options["peticiones"],
+                "escenarios": resultados,
+            }
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump(lineas_base, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"\nLínea base '{clave}' guardada en {ruta}"))
+            return
+
+        if not linea_base:
+            self.stdout.write(self.style.WARNING(f"\nSin línea base para '{clave}'; use --guardar para crearla."))
+            return
+        regresiones = comparar(resultados, linea_base, options["umbral"], options["minimo_ms"])
+        if regresiones:
+            raise CommandError("Regresiones contra la línea base:\n  " + "\n  ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS(f"\nSin regresiones contra '{clave}' (umbral {options['umbral']:.0%})."))
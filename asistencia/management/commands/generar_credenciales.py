@@ -0,0 +1,106 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from asistencia import credenciales
+from asistencia.models import Trabajador
+
+
+class Command(BaseCommand):
+    help = (
+        "(Re)genera en paralelo los QR de credencial. Omite a los trabajadores "
+        "cuyo archivo direccionado por contenido ya existe. Los que aún no "
+        "tienen token firmado (credenciales del formato anterior) reciben uno; "
+        "tras rotar ASISTENCIA_QR_CLAVES se vuelven a firmar con la clave "
+        "activa. Con --reemitir se emiten credenciales nuevas y se revocan las "
+        "anteriores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--forzar", action="store_true",
+            help="Vuelve a renderizar aunque el archivo ya exista.",
+        )
+        parser.add_argument(
+            "--procesos", type=int, default=os.cpu_count() or 1,
+            help="Procesos para renderizar los PNG (default: núcleos disponibles).",
+        )
+        parser.add_argument(
+            "--lote", type=int, default=1000,
+            help="Trabajadores por lote de lectura/actualización (default: 1000).",
+        )
+        parser.add_argument(
+            "--reemitir", action="store_true",
+            help="Credencial nueva y revocación de la anterior (extravío, clave comprometida).",
+        )
+        parser.add_argument(
+            "--trabajador", type=int, action="append", dest="trabajadores",
+            help="Solo estos trabajadores (se puede repetir).",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        generados = omitidos = 0
+
+        filas = Trabajador.objects.order_by("pk").values_list(
+            "pk", "qr_proyecto", "qr_emitido", "codigo_qr"
+        )
+        if options["trabajadores"]:
+            filas = filas.filter(pk__in=options["trabajadores"])
+        with ProcessPoolExecutor(max_workers=options["procesos"]) as pool:
+            lote = []
+            for fila in filas.iterator(chunk_size=options["lote"]):
+                lote.append(fila)
+                if len(lote) >= options["lote"]:
+                    g, o = self._procesar_lote(lote, pool, options["forzar"], options["reemitir"])
+                    generados, omitidos = generados + g, omitidos + o
+                    lote = []
+            if lote:
+                g, o = self._procesar_lote(lote, pool, options["forzar"], options["reemitir"])
+                generados, omitidos = generados + g, omitidos + o
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Credenciales generadas: {generados}, sin cambios: {omitidos} "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        ))
+
+    def _procesar_lote(self, lote, pool, forzar, reemitir):
+        # Sin token (formato anterior) o a reemitir: emisión nueva con el
+        # proyecto principal actual; reemitir revoca la credencial vigente
+        nuevas = [fila for fila in lote if reemitir or fila[2] is None]
+        pendientes, cambios, anteriores = [], [], []
+        with transaction.atomic():
+            emitidas = credenciales.reemitir(
+                nuevas, credenciales.proyectos_principales([f[0] for f in nuevas]), "reemisión"
+            ) if nuevas else []
+            por_pk = {t.pk: (t, contenido) for t, contenido, _ in emitidas}
+            for pk, proyecto_id, emitido, actual in lote:
+                if pk in por_pk:
+                    trabajador, contenido = por_pk[pk]
+                else:
+                    contenido = credenciales.contenido_qr(pk, proyecto_id, emitido)
+                    trabajador = Trabajador(pk=pk, qr_proyecto=proyecto_id, qr_emitido=emitido,
+                                            codigo_qr=credenciales.nombre_archivo(pk, contenido))
+                archivo = trabajador.codigo_qr.name
+                if actual != archivo or pk in por_pk:
+                    cambios.append(trabajador)
+                    if actual and actual != archivo:
+                        anteriores.append(actual)
+                if forzar or actual != archivo or not default_storage.exists(archivo):
+                    pendientes.append((archivo, contenido))
+            Trabajador.objects.bulk_update(cambios, ["codigo_qr", "qr_proyecto", "qr_emitido"])
+
+        pngs = pool.map(credenciales.renderizar_png, [c for _, c in pendientes], chunksize=32)
+        for (archivo, _), png in zip(pendientes, pngs):
+            if forzar and default_storage.exists(archivo):
+                default_storage.delete(archivo)
+            credenciales.guardar_png(archivo, png)
+
+        for anterior in anteriores:
+            if default_storage.exists(anterior):
+                default_storage.delete(anterior)
+        return len(pendientes), len(lote) - len(pendientes)
@@ -0,0 +1,54 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asistencia.importacion import ErrorImportacion, FuenteFotos, importar_trabajadores, leer_roster
+from asistencia.models import Proyecto
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa trabajadores desde un roster CSV/XLSX con fotos opcionales "
+        "(carpeta o .zip, columna 'foto' con el nombre del archivo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("roster", help="Ruta del archivo .csv o .xlsx.")
+        parser.add_argument("--fotos", help="Carpeta o .zip con las fotografías.")
+        parser.add_argument(
+            "--proyecto", type=int,
+            help="Proyecto asignado a las filas sin columna 'proyectos'.",
+        )
+        parser.add_argument(
+            "--procesos", type=int, default=os.cpu_count() or 1,
+            help="Procesos para redimensionar fotos y renderizar QR (default: núcleos disponibles).",
+        )
+        parser.add_argument(
+            "--lote", type=int, default=500,
+            help="Trabajadores por bulk_create (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        if options["proyecto"] and not Proyecto.objects.filter(pk=options["proyecto"]).exists():
+            raise CommandError(f"El proyecto {options['proyecto']} no existe.")
+
+        inicio = time.perf_counter()
+        try:
+            with open(options["roster"], "rb") as archivo:
+                resumen = importar_trabajadores(
+                    leer_roster(archivo, options["roster"]),
+                    fotos=FuenteFotos(options["fotos"]),
+                    proyecto_default=options["proyecto"],
+                    procesos=options["procesos"],
+                    lote=options["lote"],
+                )
+        except (OSError, ErrorImportacion) as e:
+            raise CommandError(str(e))
+
+        for d in resumen["detalle"]:
+            self.stdout.write(f"Fila {d['fila']}: {d['estado']} {'; '.join(d.get('errores', []))}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Creados: {resumen['creados']}, duplicados: {resumen['duplicados']}, "
+            f"con error: {resumen['errores']} ({time.perf_counter() - inicio:.1f} s)"
+        ))
@@ -0,0 +1,77 @@
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_obra.metricas import leer_prometheus
+
+ORDENES = {
+    "tiempo":    lambda d: d.get("tasal_peticion_segundos_sum", 0),
+    "p95":       lambda d: _percentil(d["cubetas"], 0.95),
+    "consultas": lambda d: _por_peticion(d, "tasal_consultas_total"),
+    "repetidas": lambda d: d.get("tasal_consultas_repetidas_total", 0),
+}
+
+
+def _percentil(cubetas, q):
+    """Límite de la primera cubeta que acumula la fracción q (como histogram_quantile, sin interpolar)."""
+    if not cubetas or not cubetas[-1][1]:
+        return 0.0
+    objetivo = cubetas[-1][1] * q
+    for limite, acumulado in cubetas:
+        if acumulado >= objetivo:
+            return limite
+    return cubetas[-1][0]
+
+
+def _por_peticion(datos, metrica):
+    peticiones = datos.get("tasal_peticion_segundos_count", 0)
+    return datos.get(metrica, 0) / peticiones if peticiones else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Lee /metrics de un servidor en marcha (o un volcado guardado) y "
+        "lista las N vistas más caras: latencia, consultas por petición, "
+        "consultas repetidas (N+1) y lentas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000/metrics",
+                            help="Endpoint de métricas (default: http://127.0.0.1:8000/metrics).")
+        parser.add_argument("--archivo", help="Lee las métricas de este archivo en lugar de --url.")
+        parser.add_argument("--top", type=int, default=15, help="Vistas a listar (default: 15).")
+        parser.add_argument("--orden", choices=sorted(ORDENES), default="tiempo",
+                            help="Criterio de orden (default: tiempo total).")
+
+    def handle(self, *args, **options):
+        if options["archivo"]:
+            with open(options["archivo"], encoding="utf-8") as f:
+                texto = f.read()
+        else:
+            try:
+                with urlopen(options["url"], timeout=10) as resp:
+                    texto = resp.read().decode()
+            except (URLError, OSError) as e:
+                raise CommandError(f"No se pudo leer {options['url']}: {e}")
+
+        vistas = leer_prometheus(texto)
+        if not vistas:
+            self.stdout.write("Sin peticiones registradas.")
+            return
+
+        self.stdout.write(
+            f"{'vista':<36} {'peticiones':>10} {'total s':>8} {'media ms':>9} {'p95 ms':>7} "
+            f"{'consultas':>9} {'máx':>5} {'repetidas':>9} {'lentas':>6}"
+        )
+        for nombre, d in sorted(vistas.items(), key=lambda v: -ORDENES[options["orden"]](v[1]))[:options["top"]]:
+            self.stdout.write(
+                f"{nombre[:36]:<36} {d.get('tasal_peticion_segundos_count', 0):>10.0f} "
+                f"{d.get('tasal_peticion_segundos_sum', 0):>8.2f} "
+                f"{_por_peticion(d, 'tasal_peticion_segundos_sum') * 1000:>9.1f} "
+                f"{_percentil(d['cubetas'], 0.95) * 1000:>7.0f} "
+                f"{_por_peticion(d, 'tasal_consultas_total'):>9.1f} "
+                f"{d.get('tasal_consultas_max', 0):>5.0f} "
+                f"{_por_peticion(d, 'tasal_consultas_repetidas_total'):>9.1f} "
+                f"{d.get('tasal_consultas_lentas_total', 0):>6.0f}"
+            )
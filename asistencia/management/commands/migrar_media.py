@@ -0,0 +1,189 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from PIL import Image
+
+from asistencia import credenciales, fotos
+from asistencia.models import Proyecto, Trabajador
+from asistencia.rosters import tocar_proyectos_de
+
+RE_MEDIA_SRC = re.compile(r'(?:src|srcset)="([^"]+)"')
+
+
+def _peso_carpeta(carpeta):
+    if not default_storage.exists(carpeta):
+        return 0
+    return sum(default_storage.size(f"{carpeta}/{f}") for f in default_storage.listdir(carpeta)[1])
+
+
+def _leer(nombre):
+    with default_storage.open(nombre) as f:
+        return f.read()
+
+
+def _optimizar_qr(datos):
+    """PNG del QR re-comprimido (mismos píxeles, mismo nombre) o None si no mejora."""
+    buffer = BytesIO()
+    Image.open(BytesIO(datos)).save(buffer, format="PNG", optimize=True)
+    nuevo = buffer.getvalue()
+    return nuevo if len(nuevo) < len(datos) else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Convierte las fotos heredadas (PNG 300×400) a WebP con variantes "
+        "direccionadas por contenido, re-comprime los QR y reporta los bytes "
+        "ahorrados y el peso de la página de asistencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos", type=int, default=os.cpu_count() or 1,
+            help="Procesos para convertir las fotos (default: núcleos disponibles).",
+        )
+        parser.add_argument(
+            "--conservar", action="store_true",
+            help="No borra los archivos originales ya convertidos.",
+        )
+        parser.add_argument(
+            "--purgar", action="store_true",
+            help="Borra además los archivos de trabajadores/ y codigos_qr/ que ningún trabajador usa.",
+        )
+        parser.add_argument(
+            "--proyecto", type=int,
+            help="Proyecto para medir la página de asistencia (default: el de más trabajadores).",
+        )
+
+    def handle(self, *args, **options):
+        inicio   = time.perf_counter()
+        carpetas = (fotos.CARPETA, credenciales.CARPETA)
+        antes    = {c: _peso_carpeta(c) for c in carpetas}
+        proyecto = self._proyecto(options["proyecto"])
+        pagina_antes = self._peso_pagina(proyecto) if proyecto else None
+
+        convertidas, reemplazados = self._migrar_fotos(options["procesos"])
+        qr_optimizados = self._optimizar_qrs()
+        if not options["conservar"]:
+            self._borrar_sin_uso(reemplazados)
+        if options["purgar"]:
+            self._purgar_huerfanos()
+
+        despues = {c: _peso_carpeta(c) for c in carpetas}
+        self.stdout.write(f"Fotos convertidas: {convertidas}, QR re-comprimidos: {qr_optimizados}")
+        for carpeta in carpetas:
+            self.stdout.write(
+                f"  {carpeta + '/':<14} {antes[carpeta]:>12,} B -> {despues[carpeta]:>12,} B "
+                f"(ahorro {antes[carpeta] - despues[carpeta]:,} B)"
+            )
+        if proyecto:
+            pagina_despues = self._peso_pagina(proyecto)
+            self.stdout.write(f"asistencia.html (proyecto {proyecto.pk}, {proyecto.n} trabajadores):")
+            for etiqueta, (html, media) in (("antes", pagina_antes), ("después", pagina_despues)):
+                self.stdout.write(
+                    f"  {etiqueta:<8} HTML {html:>9,} B + media {media:>11,} B = {html + media:>11,} B"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Listo en {time.perf_counter() - inicio:.1f} s"))
+
+    # ----------------------------------------------------------------
+    def _migrar_fotos(self, procesos):
+        heredadas = {}
+        for pk, nombre in (
+            Trabajador.objects.exclude(fotografia="").exclude(fotografia__isnull=True)
+            .values_list("pk", "fotografia")
+        ):
+            if not fotos.RE_FOTO.match(nombre):
+                heredadas.setdefault(nombre, []).append(pk)
+
+        cambios, reemplazados = [], set()
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            nombres = [n for n in heredadas if default_storage.exists(n)]
+            for n in set(heredadas) - set(nombres):
+                self.stderr.write(f"No existe {n}; se deja como está.")
+            futuros = [(n, pool.submit(fotos.procesar_foto, _leer(n))) for n in nombres]
+            for nombre, futuro in futuros:
+                # Una foto que no se puede decodificar no detiene a las demás
+                try:
+                    nuevo = fotos.guardar_foto(*futuro.result())
+                except Exception as e:
+                    self.stderr.write(f"No se pudo convertir {nombre} ({e}); se deja como está.")
+                    continue
+                cambios += [Trabajador(pk=pk, fotografia=nuevo) for pk in heredadas[nombre]]
+                reemplazados.add(nombre)
+        Trabajador.objects.bulk_update(cambios, ["fotografia"], batch_size=500)
+        # bulk_update no emite señales: las listas muestran la miniatura
+        tocar_proyectos_de([t.pk for t in cambios])
+        return len(cambios), reemplazados
+
+    def _optimizar_qrs(self):
+        optimizados = 0
+        for nombre in (
+            Trabajador.objects.exclude(codigo_qr="").exclude(codigo_qr__isnull=True)
+            .values_list("codigo_qr", flat=True).distinct()
+        ):
+            if not default_storage.exists(nombre):
+                continue
+            nuevo = _optimizar_qr(_leer(nombre))
+            if nuevo:
+                default_storage.delete(nombre)
+                default_storage.save(nombre, ContentFile(nuevo))
+                optimizados += 1
+        return optimizados
+
+    def _en_uso(self):
+        en_uso = set()
+        for foto, qr in Trabajador.objects.values_list("fotografia", "codigo_qr"):
+            en_uso.update(fotos.archivos_de(foto))
+            if qr:
+                en_uso.add(qr)
+        return en_uso
+
+    def _borrar_sin_uso(self, nombres):
+        en_uso = self._en_uso()
+        for nombre in nombres - en_uso:
+            default_storage.delete(nombre)
+
+    def _purgar_huerfanos(self):
+        en_uso = self._en_uso()
+        for carpeta in (fotos.CARPETA, credenciales.CARPETA):
+            if not default_storage.exists(carpeta):
+                continue
+            for archivo in default_storage.listdir(carpeta)[1]:
+                if f"{carpeta}/{archivo}" not in en_uso:
+                    default_storage.delete(f"{carpeta}/{archivo}")
+
+    # ----------------------------------------------------------------
+    def _proyecto(self, pk):
+        proyectos = Proyecto.objects.annotate(n=Count("trabajadores"))
+        if pk:
+            return proyectos.filter(pk=pk).first()
+        return proyectos.order_by("-n").first()
+
+    def _peso_pagina(self, proyecto):
+        """(bytes de HTML, bytes de MEDIA referenciados) de la vista de asistencia."""
+        request = RequestFactory().get(f"/asistencia/vista/{proyecto.pk}/")
+        request.user = AnonymousUser()
+        html = render_to_string("asistencia/asistencia.html", request=request, context={
+            "proyecto": proyecto,
+            "selected_project": proyecto,
+            "proyectos": Proyecto.objects.order_by("nombre"),
+            "trabajadores": proyecto.trabajadores.order_by("apellido_paterno", "apellido_materno"),
+        })
+        referenciados = set()
+        for valor in RE_MEDIA_SRC.findall(html):
+            # src="url" o srcset="url 1x, url 2x": el navegador baja solo una por imagen
+            url = valor.split(",")[0].split()[0]
+            if url.startswith(settings.MEDIA_URL):
+                referenciados.add(url[len(settings.MEDIA_URL):])
+        media = sum(default_storage.size(n) for n in referenciados if default_storage.exists(n))
+        return len(html.encode()), media
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Lo que importa el servidor al arrancar (main.py: django.setup + wsgi + urls)
+ARRANQUE = (
+    "import django; django.setup(); "
+    "import gestion_obra.wsgi, gestion_obra.urls"
+)
+# Se cargan solo en exportar/importar, fotos, QR y rejillas compactas; no deben aparecer aquí
+DIFERIDOS = ("openpyxl", "PIL", "qrcode", "numpy")
+
+
+def _perfil(salida_cruda):
+    """Filas (módulo, propio µs, acumulado µs) del informe de `python -X importtime`."""
+    filas = []
+    for linea in salida_cruda.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, modulo = linea[len("import time:"):].split("|")
+        filas.append((modulo.strip(), int(propio), int(acumulado)))
+    return filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide en un intérprete nuevo (`python -X importtime`) lo que cuesta "
+        "importar el servidor y lista los módulos más caros. Falla si se "
+        "carga al arrancar alguna dependencia que debería ser diferida."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=25, help="Módulos a listar (default: 25).")
+        parser.add_argument("--salida", help="Guarda aquí el informe crudo de -X importtime.")
+
+    def handle(self, *args, **options):
+        entorno = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "gestion_obra.settings")}
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", ARRANQUE],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        if proceso.returncode:
+            raise CommandError(proceso.stderr)
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as f:
+                f.write(proceso.stderr)
+
+        filas = _perfil(proceso.stderr)
+        total = sum(propio for _, propio, _ in filas)
+        self.stdout.write(f"{len(filas)} módulos, {total / 1000:.0f} ms de importación\n")
+
+        self.stdout.write(f"{'acumulado ms':>12} {'propio ms':>10}  módulo")
+        for modulo, propio, acumulado in sorted(filas, key=lambda f: -f[2])[:options["top"]]:
+            self.stdout.write(f"{acumulado / 1000:>12.1f} {propio / 1000:>10.1f}  {modulo}")
+
+        por_paquete = {}
+        for modulo, propio, _ in filas:
+            paquete = modulo.split(".")[0]
+            por_paquete[paquete] = por_paquete.get(paquete, 0) + propio
+        self.stdout.write(f"\n{'ms':>8}  paquete")
+        for paquete, propio in sorted(por_paquete.items(), key=lambda p: -p[1])[:10]:
+            self.stdout.write(f"{propio / 1000:>8.1f}  {paquete}")
+
+        cargados = sorted({m.split(".")[0] for m, _, _ in filas} & set(DIFERIDOS))
+        if cargados:
+            raise CommandError(f"Se importan al arrancar: {', '.join(cargados)}")
+        self.stdout.write(self.style.SUCCESS(f"\nSin importar al arrancar: {', '.join(DIFERIDOS)}"))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from asistencia.sincronizacion import podar
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra de la bitácora de sincronización los cambios más antiguos que "
+        "ASISTENCIA_SYNC_RETENCION_DIAS. Los clientes con un token anterior "
+        "reciben un paquete completo en su siguiente sincronización."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None,
+                            help="Días a conservar. Default: ASISTENCIA_SYNC_RETENCION_DIAS.")
+
+    def handle(self, *args, **options):
+        dias = options["dias"]
+        if dias is None:
+            dias = getattr(settings, "ASISTENCIA_SYNC_RETENCION_DIAS", 30)
+        if dias < 0:
+            raise CommandError("--dias no puede ser negativo.")
+        borrados = podar(dias)
+        self.stdout.write(self.style.SUCCESS(f"{borrados} cambios borrados (se conservan {dias} días)."))
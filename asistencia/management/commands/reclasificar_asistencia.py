@@ -0,0 +1,64 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asistencia.horarios import reclasificar
+from asistencia.resumenes import rango_asistencias
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor!r} (formato YYYY-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula tipo_retraso de las asistencias de un rango contra los "
+        "horarios actuales (tras crear o cambiar un Horario) y reconstruye "
+        "sus resúmenes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=_fecha,
+                            help="Primer día (YYYY-MM-DD). Default: la asistencia más antigua.")
+        parser.add_argument("--hasta", type=_fecha,
+                            help="Último día (YYYY-MM-DD). Default: la asistencia más reciente.")
+        parser.add_argument("--proyecto", type=int, help="Limita la reclasificación a un proyecto.")
+        parser.add_argument("--dias-por-lote", type=int, default=7,
+                            help="Días que se leen y actualizan por lote (default: 7).")
+
+    def handle(self, *args, **options):
+        primera, ultima = rango_asistencias()
+        desde = options["desde"] or primera
+        hasta = options["hasta"] or ultima
+        if desde is None:
+            self.stdout.write("No hay asistencias registradas.")
+            return
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+        if options["dias_por_lote"] < 1:
+            raise CommandError("--dias-por-lote debe ser al menos 1.")
+
+        inicio = time.perf_counter()
+        totales = reclasificar(desde, hasta, proyecto_id=options["proyecto"],
+                               dias_por_lote=options["dias_por_lote"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclasificadas de {desde} a {hasta}: {totales['revisadas']} revisadas, "
+            f"{totales['cambiadas']} cambiadas ({time.perf_counter() - inicio:.1f} s)"
+        ))
+        if totales["excedidas"]:
+            self.stdout.write(self.style.WARNING(
+                f"{totales['excedidas']} asistencias exceden ahora la tolerancia de su turno; no se modificaron."
+            ))
+        if totales["sin_hora"]:
+            self.stdout.write(
+                f"{totales['sin_hora']} asistencias sin hora de escaneo (registro manual) no se reclasifican."
+            )
+        if totales["sin_sesion"]:
+            self.stdout.write(
+                f"{totales['sin_sesion']} asistencias de días sin horario no tienen la sesión de su "
+                f"dispositivo; se dejaron como estaban."
+            )
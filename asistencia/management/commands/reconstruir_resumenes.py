@@ -0,0 +1,45 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asistencia.resumenes import rango_asistencias, reconstruir_resumenes
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor!r} (formato YYYY-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde Asistencia los resúmenes diarios por proyecto y "
+        "mensuales por trabajador, y la asistencia compacta por mes "
+        "(backfill). Procesa un mes por transacción."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=_fecha,
+                            help="Primer día (YYYY-MM-DD). Default: la asistencia más antigua.")
+        parser.add_argument("--hasta", type=_fecha,
+                            help="Último día (YYYY-MM-DD). Default: la asistencia más reciente.")
+        parser.add_argument("--proyecto", type=int, help="Limita la reconstrucción a un proyecto.")
+
+    def handle(self, *args, **options):
+        primera, ultima = rango_asistencias()
+        desde = options["desde"] or primera
+        hasta = options["hasta"] or ultima
+        if desde is None:
+            self.stdout.write("No hay asistencias registradas.")
+            return
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        inicio = time.perf_counter()
+        dias, meses = reconstruir_resumenes(desde, hasta, proyecto_id=options["proyecto"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos de {desde} a {hasta}: {dias} diarios, {meses} mensuales "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        ))
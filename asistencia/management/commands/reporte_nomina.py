@@ -0,0 +1,38 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from asistencia.reportes import FORMATOS, en_bloques, lineas_reporte
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor!r} (formato YYYY-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe el reporte de asistencia para nómina (CSV o NDJSON) de un "
+        "periodo, para todos los proyectos o los indicados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("desde", type=_fecha, help="Primer día del periodo (YYYY-MM-DD).")
+        parser.add_argument("hasta", type=_fecha, help="Último día del periodo (YYYY-MM-DD).")
+        parser.add_argument("--proyecto", type=int, action="append",
+                            help="Limita el reporte a este proyecto (se puede repetir).")
+        parser.add_argument("--formato", choices=FORMATOS, default="csv")
+        parser.add_argument("--salida", help="Archivo de salida (default: stdout).")
+
+    def handle(self, *args, **options):
+        if options["desde"] > options["hasta"]:
+            raise CommandError("desde no puede ser posterior a hasta.")
+        lineas = lineas_reporte(options["formato"], options["desde"], options["hasta"], options["proyecto"])
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8", newline="") as salida:
+                salida.writelines(en_bloques(lineas))
+        else:
+            sys.stdout.writelines(en_bloques(lineas))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0004_asistencia_tipo_retraso_dispositivo_sesionasistencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscaneoQR',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('momento', models.DateTimeField()),
+                ('recibido', models.DateTimeField(auto_now_add=True)),
+                ('estado', models.CharField(choices=[('registrado', 'Registrado'), ('rechazado', 'Rechazado')], max_length=20)),
+                ('tipo_retraso', models.CharField(blank=True, choices=[('puntual', 'Puntual'), ('retardo_leve', 'Retardo leve'), ('retardo_alto', 'Retardo alto')], max_length=20, null=True)),
+                ('mensaje', models.CharField(blank=True, max_length=200)),
+                ('dispositivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='escaneos', to='asistencia.dispositivo')),
+                ('proyecto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='escaneos', to='asistencia.proyecto')),
+                ('trabajador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='escaneos', to='asistencia.trabajador')),
+            ],
+            options={
+                'ordering': ['momento'],
+            },
+        ),
+    ]
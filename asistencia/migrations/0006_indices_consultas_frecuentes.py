@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0005_escaneoqr'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['proyecto', 'fecha', 'trabajador', 'presente', 'tipo_retraso'], name='asist_proy_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajador',
+            index=models.Index(fields=['apellido_paterno', 'apellido_materno'], name='trab_apellidos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajador',
+            index=models.Index(fields=['curp'], name='trab_curp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajador',
+            index=models.Index(fields=['nss'], name='trab_nss_idx'),
+        ),
+    ]
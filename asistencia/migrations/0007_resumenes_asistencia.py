@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0006_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioProyecto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('presentes', models.PositiveIntegerField(default=0)),
+                ('puntuales', models.PositiveIntegerField(default=0)),
+                ('retardos_leves', models.PositiveIntegerField(default=0)),
+                ('retardos_altos', models.PositiveIntegerField(default=0)),
+                ('ausentes', models.PositiveIntegerField(default=0)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='asistencia.proyecto')),
+            ],
+            options={
+                'ordering': ['fecha'],
+                'unique_together': {('proyecto', 'fecha')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualTrabajador',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('presentes', models.PositiveIntegerField(default=0)),
+                ('puntuales', models.PositiveIntegerField(default=0)),
+                ('retardos_leves', models.PositiveIntegerField(default=0)),
+                ('retardos_altos', models.PositiveIntegerField(default=0)),
+                ('ausentes', models.PositiveIntegerField(default=0)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='asistencia.proyecto')),
+                ('trabajador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='asistencia.trabajador')),
+            ],
+            options={
+                'ordering': ['mes'],
+                'indexes': [models.Index(fields=['proyecto', 'mes'], name='resumen_mes_proy_idx')],
+                'unique_together': {('trabajador', 'proyecto', 'mes')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0007_resumenes_asistencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='roster_modificado',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='proyecto',
+            name='version_roster',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
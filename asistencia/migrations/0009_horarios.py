@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0008_version_roster_proyecto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='hora_entrada',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Horario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('turno', models.CharField(default='general', max_length=50)),
+                ('dia_semana', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], null=True)),
+                ('hora_entrada', models.TimeField()),
+                ('minutos_puntual', models.PositiveSmallIntegerField(default=10)),
+                ('minutos_retardo_leve', models.PositiveSmallIntegerField(default=40)),
+                ('minutos_maximos', models.PositiveSmallIntegerField(default=60)),
+                ('activo', models.BooleanField(default=True)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='asistencia.proyecto')),
+            ],
+            options={
+                'ordering': ['proyecto', 'dia_semana', 'hora_entrada'],
+                'unique_together': {('proyecto', 'turno', 'dia_semana')},
+            },
+        ),
+    ]
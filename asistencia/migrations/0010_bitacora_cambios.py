@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0009_horarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('proyecto', 'Proyecto'), ('trabajador', 'Trabajador'), ('dispositivo', 'Dispositivo'), ('asistencia', 'Asistencia')], max_length=12)),
+                ('objeto_id', models.BigIntegerField()),
+                ('fecha', models.DateField(blank=True, null=True)),
+                ('baja', models.BooleanField(default=False)),
+                ('momento', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
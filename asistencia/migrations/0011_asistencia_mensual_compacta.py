@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0010_bitacora_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('registros', models.IntegerField(default=0)),
+                ('presentes', models.IntegerField(default=0)),
+                ('tipos', models.BinaryField(max_length=31)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meses_compactos', to='asistencia.proyecto')),
+                ('trabajador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meses_compactos', to='asistencia.trabajador')),
+            ],
+            options={
+                'unique_together': {('proyecto', 'mes', 'trabajador')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0011_asistencia_mensual_compacta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('asistencias', models.PositiveIntegerField(default=0)),
+                ('sesiones', models.PositiveIntegerField(default=0)),
+                ('datos', models.BinaryField()),
+                ('archivado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='asistencia.proyecto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mes'], name='archivo_mes_idx')],
+                'unique_together': {('proyecto', 'mes')},
+            },
+        ),
+    ]
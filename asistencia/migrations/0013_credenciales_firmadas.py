@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0012_archivo_asistencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevocacionQR',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trabajador_id', models.PositiveIntegerField(db_index=True)),
+                ('emitidos_hasta', models.DateTimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=100)),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trabajador',
+            name='qr_emitido',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trabajador',
+            name='qr_proyecto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+"""
+Llena ResumenDiarioProyecto y ResumenMensualTrabajador con las asistencias
+que ya existían al crear las tablas (0007), un mes por consulta. Solo
+agrega llaves que faltan: las que ya mantiene resumenes.py, o las de meses
+archivados, se dejan como están.
+"""
+from datetime import timedelta
+
+from django.db import migrations
+
+from asistencia.resumenes import _conteos, fin_de_mes, inicio_de_mes
+
+
+def rellenar_resumenes(apps, schema_editor):
+    Asistencia = apps.get_model('asistencia', 'Asistencia')
+    ResumenDiarioProyecto = apps.get_model('asistencia', 'ResumenDiarioProyecto')
+    ResumenMensualTrabajador = apps.get_model('asistencia', 'ResumenMensualTrabajador')
+    alias = schema_editor.connection.alias
+
+    fechas = Asistencia.objects.using(alias).order_by('fecha').values_list('fecha', flat=True)
+    primera, ultima = fechas.first(), fechas.last()
+    if primera is None:
+        return
+    mes = inicio_de_mes(primera)
+    while mes <= ultima:
+        fin = fin_de_mes(mes)
+        asistencias = Asistencia.objects.using(alias).filter(fecha__range=(mes, fin)).order_by()
+        ResumenDiarioProyecto.objects.using(alias).bulk_create(
+            [
+                ResumenDiarioProyecto(proyecto_id=r.pop('proyecto_id'), **r)
+                for r in asistencias.values('proyecto_id', 'fecha').annotate(**_conteos())
+            ],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        ResumenMensualTrabajador.objects.using(alias).bulk_create(
+            [
+                ResumenMensualTrabajador(
+                    trabajador_id=r.pop('trabajador_id'), proyecto_id=r.pop('proyecto_id'), mes=mes, **r
+                )
+                for r in asistencias.values('trabajador_id', 'proyecto_id').annotate(**_conteos())
+            ],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        mes = fin + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0013_credenciales_firmadas'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_resumenes, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,49 @@
+"""
+Llena AsistenciaMensual (creada vacía en 0011) con las asistencias que ya
+existían, un mes a la vez; la exportación a Excel solo lee esta tabla.
+Solo agrega llaves que faltan: las que ya mantiene resumenes.py, o las de
+meses archivados, se dejan como están.
+"""
+from datetime import timedelta
+
+from django.db import migrations
+
+from asistencia.compacto import COLUMNAS, codificar
+from asistencia.resumenes import fin_de_mes, inicio_de_mes
+
+
+def rellenar_asistencia_mensual(apps, schema_editor):
+    Asistencia = apps.get_model('asistencia', 'Asistencia')
+    AsistenciaMensual = apps.get_model('asistencia', 'AsistenciaMensual')
+    alias = schema_editor.connection.alias
+
+    fechas = Asistencia.objects.using(alias).order_by('fecha').values_list('fecha', flat=True)
+    primera, ultima = fechas.first(), fechas.last()
+    if primera is None:
+        return
+    mes = inicio_de_mes(primera)
+    while mes <= ultima:
+        fin = fin_de_mes(mes)
+        filas = (
+            Asistencia.objects.using(alias).filter(fecha__range=(mes, fin)).order_by()
+            .values_list(*COLUMNAS).iterator(chunk_size=5000)
+        )
+        AsistenciaMensual.objects.using(alias).bulk_create(
+            [
+                AsistenciaMensual(trabajador_id=t, proyecto_id=p, mes=m, registros=r, presentes=pr, tipos=ti)
+                for (t, p, m), (r, pr, ti) in codificar(filas).items()
+            ],
+            batch_size=2000, ignore_conflicts=True,
+        )
+        mes = fin + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0014_rellenar_resumenes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_asistencia_mensual, migrations.RunPython.noop, elidable=True),
+    ]
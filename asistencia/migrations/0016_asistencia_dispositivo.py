@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def asignar_dispositivos(apps, schema_editor):
+    """
+    Dispositivo de los escaneos ya registrados, cuando se puede saber: el
+    del EscaneoQR sincronizado que los grabó o, si el proyecto tuvo una sola
+    sesión ese día, el de esa sesión. Los demás quedan vacíos y reclasificar
+    no los toca en días sin horario.
+    """
+    Asistencia = apps.get_model('asistencia', 'Asistencia')
+    EscaneoQR = apps.get_model('asistencia', 'EscaneoQR')
+    SesionAsistencia = apps.get_model('asistencia', 'SesionAsistencia')
+    alias = schema_editor.connection.alias
+
+    escaneadas = Asistencia.objects.using(alias).filter(hora_entrada__isnull=False, dispositivo__isnull=True)
+    escaneadas.update(dispositivo_id=Subquery(
+        EscaneoQR.objects.using(alias).filter(
+            estado='registrado', trabajador_id=OuterRef('trabajador_id'),
+            proyecto_id=OuterRef('proyecto_id'), momento=OuterRef('hora_entrada'),
+        ).values('dispositivo_id')[:1]
+    ))
+    unica = (
+        SesionAsistencia.objects.using(alias)
+        .filter(proyecto_id=OuterRef('proyecto_id'), fecha=OuterRef('fecha'))
+        .order_by().values('proyecto_id', 'fecha')
+        .annotate(n=Count('pk'), d=models.Min('dispositivo_id')).filter(n=1).values('d')
+    )
+    escaneadas.filter(dispositivo__isnull=True).update(dispositivo_id=Subquery(unica))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asistencia', '0015_rellenar_asistencia_mensual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='dispositivo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='asistencias', to='asistencia.dispositivo'),
+        ),
+        migrations.RunPython(asignar_dispositivos, migrations.RunPython.noop, elidable=True),
+    ]
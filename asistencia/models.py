@@ -1,13 +1,16 @@
-import os
-import qrcode
-from io import BytesIO
-from django.core.files import File
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
+
+from . import credenciales
 
 
 class Proyecto(models.Model):
     nombre = models.CharField(max_length=200)
     descripcion = models.TextField(blank=True, null=True)
+    # Cambian cada vez que cambia la plantilla del proyecto (ver rosters.py)
+    version_roster    = models.PositiveIntegerField(default=0, editable=False)
+    roster_modificado = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return self.nombre
@@ -55,20 +58,74 @@ class Trabajador(models.Model):
     curp = models.CharField(max_length=18, null=True, blank=True)
     nss  = models.CharField(max_length=15, null=True, blank=True)
 
+    # Datos firmados en el token de la credencial (credenciales.py)
+    qr_proyecto = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    qr_emitido  = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Listas de asistencia y exportaciones ordenan por apellidos
+            models.Index(fields=['apellido_paterno', 'apellido_materno'], name='trab_apellidos_idx'),
+            # Búsqueda y deduplicación por CURP/NSS
+            models.Index(fields=['curp'], name='trab_curp_idx'),
+            models.Index(fields=['nss'],  name='trab_nss_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} {self.apellido_paterno} {self.apellido_materno}"
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        if not self.codigo_qr:
-            qr_data = f"http://127.0.0.1:8000/api/registrar-qr/{self.id}/?device_id={device_id}"
-            qr_img  = qrcode.make(qr_data)
-            buffer  = BytesIO()
-            qr_img.save(buffer, format="PNG")
-            filename = f"trabajador_{self.id}_qr.png"
-            self.codigo_qr.save(filename, File(buffer), save=False)
-            buffer.close()
-            super().save(*args, **kwargs)
+        # El nombre del QR depende de su contenido: solo si cambia se
+        # actualiza la columna y se encola el render en segundo plano.
+        credenciales.actualizar_credencial(self)
+
+
+TIPOS_RETRASO = [
+    ('puntual',      'Puntual'),
+    ('retardo_leve', 'Retardo leve'),
+    ('retardo_alto', 'Retardo alto'),
+]
+
+
+class Horario(models.Model):
+    """
+    Turno de un proyecto: hora de entrada y tolerancias (en minutos) contra
+    las que se clasifica el retraso de los escaneos. Con dia_semana vacío
+    aplica a todos los días; un horario para un día concreto reemplaza a
+    los generales de ese día. Ver asistencia/horarios.py.
+    """
+    DIAS_SEMANA = [
+        (0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'),
+        (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo'),
+    ]
+
+    proyecto             = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='horarios')
+    turno                = models.CharField(max_length=50, default='general')
+    dia_semana           = models.PositiveSmallIntegerField(choices=DIAS_SEMANA, null=True, blank=True)
+    hora_entrada         = models.TimeField()
+    minutos_puntual      = models.PositiveSmallIntegerField(default=10)
+    minutos_retardo_leve = models.PositiveSmallIntegerField(default=40)
+    minutos_maximos      = models.PositiveSmallIntegerField(default=60)
+    activo               = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('proyecto', 'turno', 'dia_semana')
+        ordering = ['proyecto', 'dia_semana', 'hora_entrada']
+
+    def clean(self):
+        if not self.minutos_puntual <= self.minutos_retardo_leve <= self.minutos_maximos:
+            raise ValidationError("Las tolerancias deben ir de menor a mayor: puntual ≤ retardo leve ≤ máximo.")
+        # SQLite no aplica unique_together cuando dia_semana es NULL
+        duplicado = Horario.objects.filter(
+            proyecto_id=self.proyecto_id, turno=self.turno, dia_semana=self.dia_semana
+        ).exclude(pk=self.pk)
+        if duplicado.exists():
+            raise ValidationError("Ya existe ese turno para el proyecto y día.")
+
+    def __str__(self):
+        dia = self.get_dia_semana_display() if self.dia_semana is not None else "Todos los días"
+        return f"{self.proyecto} - {self.turno} ({dia} {self.hora_entrada:%H:%M})"
 
 
 class Asistencia(models.Model):
@@ -78,19 +135,191 @@ class Asistencia(models.Model):
     presente     = models.BooleanField(default=False)
     tipo_retraso = models.CharField(
         max_length=20,
-        choices=[
-            ('puntual',      'Puntual'),
-            ('retardo_leve', 'Retardo leve'),
-            ('retardo_alto', 'Retardo alto'),
-        ],
+        choices=TIPOS_RETRASO,
         null=True,
         blank=True
     )
+    # Momento del escaneo que dio el tipo_retraso; permite reclasificar
+    # el histórico si cambia el horario (vacío en registros manuales)
+    hora_entrada = models.DateTimeField(null=True, blank=True)
+    # Dispositivo del escaneo: con proyecto y fecha ubica la SesionAsistencia
+    # cuya hora_base lo clasificó (vacío en registros manuales)
+    dispositivo  = models.ForeignKey(
+        Dispositivo, on_delete=models.SET_NULL, null=True, blank=True, related_name='asistencias'
+    )
 
     class Meta:
         unique_together = ('trabajador', 'proyecto', 'fecha')
         ordering = ['fecha']
+        indexes = [
+            # Rango de fechas por proyecto (exportación, reportes). Incluye las
+            # columnas que se leen para que SQLite no tenga que ir a la tabla.
+            models.Index(
+                fields=['proyecto', 'fecha', 'trabajador', 'presente', 'tipo_retraso'],
+                name='asist_proy_fecha_idx',
+            ),
+        ]
 
     def __str__(self):
         estado = "Presente" if self.presente else "Ausente"
         return f"{self.trabajador} - {self.fecha}: {estado}"
+
+
+class EscaneoQR(models.Model):
+    """
+    Escaneo recibido por sincronización en lote. La clave de idempotencia
+    generada por el dispositivo permite reenviar un lote sin duplicar nada:
+    si la clave ya existe se devuelve el resultado guardado.
+    """
+    ESTADOS = [
+        ('registrado', 'Registrado'),
+        ('rechazado',  'Rechazado'),
+    ]
+
+    clave        = models.CharField(max_length=64, unique=True)
+    dispositivo  = models.ForeignKey(Dispositivo, on_delete=models.CASCADE, related_name='escaneos')
+    trabajador   = models.ForeignKey(Trabajador,  on_delete=models.CASCADE, related_name='escaneos', null=True, blank=True)
+    proyecto     = models.ForeignKey(Proyecto,    on_delete=models.CASCADE, related_name='escaneos', null=True, blank=True)
+    momento      = models.DateTimeField()
+    recibido     = models.DateTimeField(auto_now_add=True)
+    estado       = models.CharField(max_length=20, choices=ESTADOS)
+    tipo_retraso = models.CharField(max_length=20, choices=TIPOS_RETRASO, null=True, blank=True)
+    mensaje      = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['momento']
+
+    def __str__(self):
+        return f"{self.clave} ({self.estado})"
+
+
+class ResumenDiarioProyecto(models.Model):
+    """
+    Conteos de asistencia por proyecto y día. Se mantiene al escribir
+    asistencias (ver asistencia/resumenes.py); `reconstruir_resumenes` la
+    recalcula desde cero para un rango.
+    """
+    proyecto       = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    fecha          = models.DateField()
+    presentes      = models.PositiveIntegerField(default=0)
+    puntuales      = models.PositiveIntegerField(default=0)
+    retardos_leves = models.PositiveIntegerField(default=0)
+    retardos_altos = models.PositiveIntegerField(default=0)
+    ausentes       = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('proyecto', 'fecha')
+        ordering = ['fecha']
+
+    def __str__(self):
+        return f"{self.proyecto} - {self.fecha}: {self.presentes} presentes"
+
+
+class ResumenMensualTrabajador(models.Model):
+    """
+    Totales de asistencia por trabajador, proyecto y mes (`mes` es el día 1).
+    """
+    trabajador     = models.ForeignKey(Trabajador, on_delete=models.CASCADE, related_name='resumenes_mensuales')
+    proyecto       = models.ForeignKey(Proyecto,   on_delete=models.CASCADE, related_name='resumenes_mensuales')
+    mes            = models.DateField()
+    presentes      = models.PositiveIntegerField(default=0)
+    puntuales      = models.PositiveIntegerField(default=0)
+    retardos_leves = models.PositiveIntegerField(default=0)
+    retardos_altos = models.PositiveIntegerField(default=0)
+    ausentes       = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('trabajador', 'proyecto', 'mes')
+        ordering = ['mes']
+        indexes = [
+            models.Index(fields=['proyecto', 'mes'], name='resumen_mes_proy_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trabajador} - {self.mes:%Y-%m}: {self.presentes} presentes"
+
+
+class AsistenciaMensual(models.Model):
+    """
+    Asistencia de un trabajador en un proyecto durante un mes (`mes` es el
+    día 1), empaquetada en una fila en lugar de una por día. El bit d-1 de
+    `registros` indica que hay asistencia el día d y el de `presentes` que
+    estuvo presente; `tipos` tiene un byte por día con el tipo_retraso
+    (ver asistencia/compacto.py). Se mantiene junto con los resúmenes.
+    """
+    trabajador = models.ForeignKey(Trabajador, on_delete=models.CASCADE, related_name='meses_compactos')
+    proyecto   = models.ForeignKey(Proyecto,   on_delete=models.CASCADE, related_name='meses_compactos')
+    mes        = models.DateField()
+    registros  = models.IntegerField(default=0)
+    presentes  = models.IntegerField(default=0)
+    tipos      = models.BinaryField(max_length=31)
+
+    class Meta:
+        # Proyecto y rango de meses primero: así lee el lector de rejillas
+        unique_together = ('proyecto', 'mes', 'trabajador')
+
+    def __str__(self):
+        return f"{self.trabajador} - {self.mes:%Y-%m}: {self.presentes.bit_count()} días presente"
+
+
+class AsistenciaArchivada(models.Model):
+    """
+    Asistencias y sesiones de un proyecto en un mes cerrado (`mes` es el
+    día 1), sacadas de las tablas vivas y guardadas comprimidas en `datos`
+    (ver asistencia/archivo.py). Los resúmenes y la asistencia compacta de
+    ese mes se conservan.
+    """
+    proyecto     = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='archivos')
+    mes          = models.DateField()
+    asistencias  = models.PositiveIntegerField(default=0)
+    sesiones     = models.PositiveIntegerField(default=0)
+    datos        = models.BinaryField()
+    archivado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('proyecto', 'mes')
+        # Lecturas por rango de meses de todos los proyectos (reporte de nómina)
+        indexes = [models.Index(fields=['mes'], name='archivo_mes_idx')]
+
+    def __str__(self):
+        return f"{self.proyecto} - {self.mes:%Y-%m}: {self.asistencias} asistencias archivadas"
+
+
+class RevocacionQR(models.Model):
+    """
+    Invalida los tokens QR de un trabajador emitidos hasta `emitidos_hasta`
+    (vacío: todos, p. ej. por baja). Sin llave foránea para que sobreviva al
+    borrado del trabajador. Ver asistencia/tokens_qr.py.
+    """
+    trabajador_id  = models.PositiveIntegerField(db_index=True)
+    emitidos_hasta = models.DateTimeField(null=True, blank=True)
+    motivo         = models.CharField(max_length=100, blank=True)
+    creada         = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        hasta = f"emitidos hasta {self.emitidos_hasta:%Y-%m-%d %H:%M:%S}" if self.emitidos_hasta else "todos"
+        return f"Trabajador {self.trabajador_id}: {hasta}"
+
+
+class Cambio(models.Model):
+    """
+    Bitácora de cambios para la sincronización delta de las apps móviles
+    (ver asistencia/sincronizacion.py). El id es el token de sincronización.
+    Las asistencias se anotan por proyecto y día: objeto_id es el proyecto
+    y fecha el día.
+    """
+    MODELOS = [
+        ('proyecto',    'Proyecto'),
+        ('trabajador',  'Trabajador'),
+        ('dispositivo', 'Dispositivo'),
+        ('asistencia',  'Asistencia'),
+    ]
+
+    modelo    = models.CharField(max_length=12, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    fecha     = models.DateField(null=True, blank=True)
+    baja      = models.BooleanField(default=False)
+    momento   = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.pk} {self.modelo} {self.objeto_id}{' (baja)' if self.baja else ''}"
@@ -0,0 +1,39 @@
+"""
+Paginación y selección de campos para los ModelViewSets de la API REST.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPaginacion(CursorPagination):
+    """
+    Paginación por cursor sobre la llave primaria: cada página es un
+    `WHERE id < cursor ORDER BY id DESC LIMIT n`, así que el costo no crece
+    con el número de página como en LIMIT/OFFSET.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = '-id'
+
+
+def campos_solicitados(request):
+    """Conjunto de campos pedidos con ?fields=a,b,c o None si no se pidió ninguno."""
+    if request is None:
+        return None
+    valor = request.query_params.get('fields')
+    if not valor:
+        return None
+    return {c.strip() for c in valor.split(',') if c.strip()}
+
+
+def limitar_columnas(queryset, campos):
+    """
+    Aplica .only() con las columnas concretas de `campos` (más la llave
+    primaria, que usa el cursor). Los campos M2M se ignoran.
+    """
+    if not campos:
+        return queryset
+    concretos = {
+        f.name for f in queryset.model._meta.concrete_fields if f.name in campos
+    }
+    return queryset.only('pk', *concretos)
@@ -0,0 +1,357 @@
+"""
+Rutas de escritura de asistencia.
+
+Concentra la lógica set-based para registrar la asistencia de toda una
+cuadrilla o un lote de escaneos QR (resuelve trabajadores en una sola
+consulta y escribe todo en una transacción con upserts masivos) y el
+escaneo individual, pensado para muchos escáneres en paralelo.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archivo import verificar_abierto
+from .horarios import tabla_horarios
+from .models import Asistencia, EscaneoQR, SesionAsistencia, Trabajador
+from .resumenes import actualizar_resumenes, claves_de
+from .sincronizacion import registrar_dias
+from .tablero import publicar_asistencias
+from .tokens_qr import TokenInvalido, verificar as verificar_token
+
+def guardar_asistencias(asistencias, update_fields):
+    """
+    Upsert masivo (INSERT … ON CONFLICT DO UPDATE) sobre la llave
+    (trabajador, proyecto, fecha) y actualización de los resúmenes de los
+    días y meses tocados. Toda escritura de asistencias pasa por aquí: anota
+    los días en la bitácora de sincronización y, al confirmarse, los
+    tableros en vivo reciben las filas (tablero.py). Un mes archivado
+    lanza PeriodoArchivado (archivo.py).
+    """
+    verificar_abierto({(a.proyecto_id, a.fecha) for a in asistencias})
+    with transaction.atomic():
+        Asistencia.objects.bulk_create(
+            asistencias,
+            update_conflicts=True,
+            unique_fields=["trabajador", "proyecto", "fecha"],
+            update_fields=update_fields,
+        )
+        claves = [claves_de(a.trabajador_id, a.proyecto_id, a.fecha) for a in asistencias]
+        actualizar_resumenes(dias={d for d, _ in claves}, meses={m for _, m in claves})
+        registrar_dias({(a.proyecto_id, a.fecha) for a in asistencias})
+        # El tablero no muestra el dispositivo
+        publicar_asistencias(asistencias, [c for c in update_fields if c != "dispositivo"])
+
+
+def _normalizar_id(valor):
+    """Convierte el id recibido en el payload a entero, o None si no es válido."""
+    # int(True) == 1 e int(2.5) == 2: ni booleanos ni decimales son ids
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def registrar_asistencias_bulk(proyecto, fecha, asistencias_data):
+    """
+    Registra la asistencia de un proyecto en una fecha para varios trabajadores.
+
+    `asistencias_data` es la lista del payload: [{trabajador, presente}, …].
+    Devuelve la misma lista de resultados por elemento que el registro
+    individual: {"trabajador", "created", "presente"} o {"trabajador", "error"}.
+
+    Costo fijo en consultas sin importar el tamaño de la cuadrilla:
+    una para resolver trabajadores y membresía al proyecto, una para saber
+    qué registros ya existían y el INSERT … ON CONFLICT DO UPDATE.
+    """
+    ids = {_normalizar_id(item.get("trabajador")) for item in asistencias_data}
+    ids.discard(None)
+
+    membresia = Trabajador.proyectos.through.objects.filter(
+        trabajador_id=OuterRef("pk"), proyecto_id=proyecto.pk
+    )
+    trabajadores = dict(
+        Trabajador.objects.filter(pk__in=ids)
+        .annotate(en_proyecto=Exists(membresia))
+        .values_list("pk", "en_proyecto")
+    ) if ids else {}
+
+    results = []
+    pendientes = {}  # trabajador_id -> presente (el último del payload gana)
+    with transaction.atomic():
+        existentes = set(
+            Asistencia.objects.filter(
+                proyecto=proyecto, fecha=fecha, trabajador_id__in=list(trabajadores)
+            ).values_list("trabajador_id", flat=True)
+        ) if trabajadores else set()
+
+        for item in asistencias_data:
+            trab_id  = item.get("trabajador")
+            presente = item.get("presente", False)
+            pk = _normalizar_id(trab_id)
+            if pk not in trabajadores:
+                results.append({"trabajador": trab_id, "error": "Trabajador not found."})
+                continue
+            if not trabajadores[pk]:
+                results.append({"trabajador": trab_id, "error": "Trabajador no asignado al proyecto."})
+                continue
+
+            created = pk not in existentes and pk not in pendientes
+            pendientes[pk] = presente
+            results.append({"trabajador": trab_id, "created": created, "presente": presente})
+
+        if pendientes:
+            guardar_asistencias(
+                [
+                    Asistencia(trabajador_id=pk, proyecto_id=proyecto.pk, fecha=fecha, presente=presente)
+                    for pk, presente in pendientes.items()
+                ],
+                update_fields=["presente"],
+            )
+
+    return results
+
+
+def _resultado_guardado(escaneo):
+    resultado = {
+        "clave": escaneo.clave,
+        "trabajador": escaneo.trabajador_id,
+        "estado": escaneo.estado,
+        "duplicado": True,
+    }
+    if escaneo.estado == "registrado":
+        resultado["tipo_retraso"] = escaneo.tipo_retraso
+    else:
+        resultado["error"] = escaneo.mensaje
+    return resultado
+
+
+def sincronizar_escaneos(dispositivo, escaneos_data):
+    """
+    Registra un lote de escaneos QR encolados por un dispositivo.
+
+    `escaneos_data` es la lista del payload: [{trabajador, timestamp, clave}, …]
+    con el timestamp ISO 8601 tomado en el dispositivo; en lugar de
+    `trabajador` puede venir `token`, el QR firmado de la credencial, que
+    ya trae trabajador y proyecto (tokens_qr.py). Cada escaneo se
+    clasifica contra la hora_base de la sesión (dispositivo, proyecto, fecha);
+    si la sesión no existe, la fija el escaneo más temprano del lote.
+
+    Todo se confirma en una sola transacción. Las claves ya procesadas
+    devuelven el resultado guardado, por lo que reenviar un lote es idempotente.
+    Devuelve un resultado por escaneo, en el orden recibido.
+    """
+    resultados = [None] * len(escaneos_data)
+    validos = []  # (posición, clave, trabajador_id, momento, proyecto del token)
+
+    for pos, item in enumerate(escaneos_data):
+        clave    = str(item.get("clave") or "").strip()
+        trab_id  = _normalizar_id(item.get("trabajador"))
+        momento  = parse_datetime(str(item.get("timestamp") or ""))
+        if not clave or len(clave) > EscaneoQR._meta.get_field("clave").max_length:
+            resultados[pos] = {"clave": clave, "trabajador": item.get("trabajador"),
+                               "estado": "rechazado", "error": "Clave de idempotencia inválida."}
+            continue
+        if (trab_id is None and not item.get("token")) or momento is None:
+            resultados[pos] = {"clave": clave, "trabajador": item.get("trabajador"),
+                               "estado": "rechazado", "error": "Trabajador o timestamp inválido."}
+            continue
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        proj_token = None
+        if item.get("token"):
+            try:
+                credencial = verificar_token(str(item["token"]), momento)
+            except TokenInvalido as e:
+                resultados[pos] = {"clave": clave, "trabajador": item.get("trabajador"),
+                                   "estado": "rechazado", "error": str(e)}
+                continue
+            trab_id, proj_token = credencial.trabajador_id, credencial.proyecto_id
+        validos.append((pos, clave, trab_id, momento, proj_token))
+
+    with transaction.atomic():
+        # 1) claves ya sincronizadas en lotes anteriores
+        guardados = {
+            e.clave: e for e in EscaneoQR.objects.filter(clave__in=[v[1] for v in validos])
+        }
+        nuevos, vistos = [], set()
+        for pos, clave, trab_id, momento, proj_token in validos:
+            if clave in guardados:
+                resultados[pos] = _resultado_guardado(guardados[clave])
+            elif clave in vistos:
+                resultados[pos] = {"clave": clave, "trabajador": trab_id,
+                                   "estado": "rechazado", "duplicado": True,
+                                   "error": "Clave repetida en el lote."}
+            else:
+                vistos.add(clave)
+                nuevos.append((pos, clave, trab_id, momento, proj_token))
+
+        # 2) proyectos de cada trabajador y proyectos autorizados del dispositivo.
+        #    Sin token se usa el primero, como en el escaneo en línea; con token,
+        #    el suyo, si el trabajador sigue asignado a él.
+        ids = {n[2] for n in nuevos}
+        asignados = {}
+        for t, p in (
+            Trabajador.proyectos.through.objects.filter(trabajador_id__in=ids)
+            .values_list("trabajador_id", "proyecto_id") if ids else ()
+        ):
+            asignados.setdefault(t, set()).add(p)
+        autorizados = set(dispositivo.proyectos.values_list("pk", flat=True)) if nuevos else set()
+
+        def proyecto_de(trab_id, proj_token):
+            proyectos = asignados.get(trab_id, ())
+            if proj_token is None:
+                return min(proyectos, default=None)
+            return proj_token if proj_token in proyectos else None
+
+        # 3) sesiones del día: existentes o fijadas por el escaneo más temprano del lote
+        nuevos.sort(key=lambda n: n[3])
+        claves_sesion = {}
+        for _, _, trab_id, momento, proj_token in nuevos:
+            proj_id = proyecto_de(trab_id, proj_token)
+            if proj_id in autorizados:
+                claves_sesion.setdefault((proj_id, timezone.localdate(momento)), momento)
+
+        # INSERT OR IGNORE y luego lectura: si otro lote creó la sesión en
+        # paralelo se respeta su hora_base.
+        sesiones = {}
+        if claves_sesion:
+            SesionAsistencia.objects.bulk_create(
+                [
+                    SesionAsistencia(dispositivo=dispositivo, proyecto_id=p, fecha=f, hora_base=h)
+                    for (p, f), h in claves_sesion.items()
+                ],
+                ignore_conflicts=True,
+            )
+            existentes = SesionAsistencia.objects.filter(
+                dispositivo=dispositivo,
+                proyecto_id__in={p for p, _ in claves_sesion},
+                fecha__in={f for _, f in claves_sesion},
+            ).values_list("proyecto_id", "fecha", "hora_base")
+            sesiones = {(p, f): h for p, f, h in existentes}
+
+        # 4) clasificar cada escaneo; el último escaneo del día gana, igual que en línea
+        registros, asistencias = [], {}
+        for pos, clave, trab_id, momento, proj_token in nuevos:
+            proj_id = proyecto_de(trab_id, proj_token)
+            conocido = trab_id in asignados
+            escaneo = EscaneoQR(clave=clave, dispositivo=dispositivo, momento=momento,
+                                trabajador_id=trab_id if conocido else None,
+                                proyecto_id=proj_id)
+            if not conocido:
+                escaneo.estado, escaneo.mensaje = "rechazado", "Trabajador sin proyecto o inexistente."
+            elif proj_id is None:
+                escaneo.estado, escaneo.mensaje = "rechazado", "Trabajador no asignado al proyecto de la credencial."
+            elif proj_id not in autorizados:
+                escaneo.estado, escaneo.mensaje = "rechazado", "Device no autorizado para este proyecto."
+            else:
+                fecha     = timezone.localdate(momento)
+                resultado = tabla_horarios.clasificar(proj_id, momento, sesiones[(proj_id, fecha)])
+                if resultado.tipo is None:
+                    escaneo.estado  = "rechazado"
+                    escaneo.mensaje = f"Tiempo excedido (>{resultado.maximos} min)."
+                else:
+                    escaneo.estado, escaneo.tipo_retraso = "registrado", resultado.tipo
+                    asistencias[(trab_id, proj_id, fecha)] = (resultado.tipo, momento)
+            registros.append(escaneo)
+            resultado = _resultado_guardado(escaneo)
+            resultado["duplicado"] = False
+            resultados[pos] = resultado
+
+        if asistencias:
+            guardar_asistencias(
+                [
+                    Asistencia(trabajador_id=t, proyecto_id=p, fecha=f, presente=True,
+                               tipo_retraso=tipo, hora_entrada=momento, dispositivo=dispositivo)
+                    for (t, p, f), (tipo, momento) in asistencias.items()
+                ],
+                update_fields=["presente", "tipo_retraso", "hora_entrada", "dispositivo"],
+            )
+        EscaneoQR.objects.bulk_create(registros, ignore_conflicts=True)
+
+    return resultados
+
+
+# =======================================================
+# Escaneo QR individual bajo alta concurrencia
+# =======================================================
+# hora_base no cambia una vez creada la sesión, así que se recuerda en memoria
+# del proceso: solo el primer escaneo de cada (dispositivo, proyecto, fecha)
+# toca la tabla de sesiones.
+_horas_base = {}
+_horas_base_lock = threading.Lock()
+
+
+def hora_base_sesion(dispositivo_id, proyecto_id, fecha, ahora):
+    """
+    Devuelve la hora_base de la sesión del día, creándola con `ahora` si no existe.
+    INSERT OR IGNORE seguido de lectura: varios escáneres en paralelo no
+    compiten por crearla ni provocan IntegrityError.
+    """
+    clave = (dispositivo_id, proyecto_id, fecha)
+    hora_base = _horas_base.get(clave)
+    if hora_base is not None:
+        return hora_base
+
+    SesionAsistencia.objects.bulk_create(
+        [SesionAsistencia(dispositivo_id=dispositivo_id, proyecto_id=proyecto_id,
+                          fecha=fecha, hora_base=ahora)],
+        ignore_conflicts=True,
+    )
+    hora_base = SesionAsistencia.objects.filter(
+        dispositivo_id=dispositivo_id, proyecto_id=proyecto_id, fecha=fecha
+    ).values_list("hora_base", flat=True).get()
+
+    with _horas_base_lock:
+        # Las sesiones de días anteriores ya no se consultan
+        for vieja in [c for c in _horas_base if c[2] != fecha]:
+            del _horas_base[vieja]
+        _horas_base[clave] = hora_base
+    return hora_base
+
+
+def olvidar_sesiones():
+    """Descarta las hora_base recordadas (al modificar o borrar sesiones)."""
+    with _horas_base_lock:
+        _horas_base.clear()
+
+
+def registrar_escaneo(trabajador_id, dispositivo_id, proyecto_id, ahora):
+    """
+    Clasifica y graba un escaneo QR. Devuelve la Clasificacion (horarios.py);
+    su tipo es None si se excedió la tolerancia y no se grabó nada. La
+    asistencia se escribe con un único INSERT … ON CONFLICT DO UPDATE (más
+    el ajuste de sus resúmenes).
+    """
+    return registrar_escaneos([(trabajador_id, dispositivo_id, proyecto_id, ahora)])[0]
+
+
+def registrar_escaneos(escaneos):
+    """
+    registrar_escaneo para varios escaneos (trabajador_id, dispositivo_id,
+    proyecto_id, ahora) en una sola transacción; devuelve sus Clasificacion
+    en el mismo orden. Lo usa la agrupación de la ruta ASGI (agrupador.py).
+    Si un trabajador escaneó dos veces en el lote gana el último escaneo,
+    igual que si hubieran llegado por separado.
+    """
+    resultados, asistencias = [], {}
+    for trabajador_id, dispositivo_id, proyecto_id, ahora in escaneos:
+        fecha     = timezone.localdate(ahora)
+        hora_base = hora_base_sesion(dispositivo_id, proyecto_id, fecha, ahora)
+        resultado = tabla_horarios.clasificar(proyecto_id, ahora, hora_base)
+        resultados.append(resultado)
+        if resultado.tipo is not None:
+            asistencias[(trabajador_id, proyecto_id, fecha)] = Asistencia(
+                trabajador_id=trabajador_id, proyecto_id=proyecto_id, fecha=fecha,
+                presente=True, tipo_retraso=resultado.tipo, hora_entrada=ahora,
+                dispositivo_id=dispositivo_id,
+            )
+
+    if asistencias:
+        guardar_asistencias(list(asistencias.values()),
+                            update_fields=["presente", "tipo_retraso", "hora_entrada", "dispositivo"])
+    return resultados
@@ -0,0 +1,171 @@
+"""
+Reporte de asistencia para nómina, en streaming.
+
+Una fila por trabajador y proyecto con su identidad (CURP, NSS, categoría),
+el estado de cada día del periodo y los totales. Las asistencias se leen
+por lotes de trabajadores en el orden de la llave única
+(trabajador, proyecto, fecha) y se agrupan al vuelo, así que la memoria
+depende del tamaño del lote, no del rango de fechas ni del número de filas.
+Los meses archivados (archivo.py) se leen de AsistenciaArchivada y se
+intercalan por fecha con las filas vivas.
+"""
+import csv
+import heapq
+import json
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from .archivo import archivadas, proyectos_archivados
+from .models import Asistencia, Proyecto, Trabajador
+
+FORMATOS = ("csv", "ndjson")
+CAMPOS_IDENTIDAD = (
+    "proyecto", "proyecto_nombre", "trabajador", "nombre", "apellido_paterno",
+    "apellido_materno", "curp", "nss", "categoria",
+)
+CAMPOS_TOTALES = ("presentes", "puntuales", "retardos_leves", "retardos_altos", "ausentes")
+
+# Estado de un día sin tipo_retraso (registro manual o antes de los escaneos)
+PRESENTE = "presente"
+AUSENTE  = "ausente"
+
+CHUNK = 2000
+
+
+def _estado(presente, tipo_retraso):
+    if not presente:
+        return AUSENTE
+    return tipo_retraso or PRESENTE
+
+
+def _totales(dias):
+    totales = dict.fromkeys(CAMPOS_TOTALES, 0)
+    for estado in dias.values():
+        if estado == AUSENTE:
+            totales["ausentes"] += 1
+            continue
+        totales["presentes"] += 1
+        if estado == "puntual":
+            totales["puntuales"] += 1
+        elif estado == "retardo_leve":
+            totales["retardos_leves"] += 1
+        elif estado == "retardo_alto":
+            totales["retardos_altos"] += 1
+    return totales
+
+
+def registros_nomina(desde, hasta, proyectos=None, lote=500):
+    """
+    Genera un dict por (proyecto, trabajador) con asistencia en [desde, hasta]:
+    identidad, "dias" {fecha: estado} y "totales".
+    `proyectos` limita a esos ids; None incluye todos.
+    """
+    qs_proyectos = Proyecto.objects.order_by("pk")
+    if proyectos:
+        qs_proyectos = qs_proyectos.filter(pk__in=proyectos)
+    con_archivo = proyectos_archivados(desde, hasta, proyectos)
+
+    for proyecto_id, proyecto_nombre in qs_proyectos.values_list("pk", "nombre"):
+        asistencias = Asistencia.objects.filter(proyecto_id=proyecto_id, fecha__range=(desde, hasta))
+        trabajadores = list(
+            asistencias.order_by("trabajador_id").values_list("trabajador_id", flat=True).distinct()
+        )
+        frias = archivadas(proyecto_id, desde, hasta) if proyecto_id in con_archivo else {}
+        if frias:
+            trabajadores = sorted(set(trabajadores) | frias.keys())
+        for i in range(0, len(trabajadores), lote):
+            ids = trabajadores[i:i + lote]
+            identidades = {
+                t["pk"]: t for t in Trabajador.objects.filter(pk__in=ids).values(
+                    "pk", "nombre", "apellido_paterno", "apellido_materno", "curp", "nss", "categoria"
+                )
+            }
+            filas = (
+                asistencias.filter(trabajador_id__in=ids)
+                .order_by("trabajador_id", "fecha")
+                .values_list("trabajador_id", "fecha", "presente", "tipo_retraso")
+                .iterator(chunk_size=CHUNK)
+            )
+            if not frias:
+                for trabajador_id, grupo in groupby(filas, key=itemgetter(0)):
+                    dias = {fecha: _estado(presente, tipo) for _, fecha, presente, tipo in grupo}
+                    yield _registro(proyecto_id, proyecto_nombre, identidades[trabajador_id], dias)
+                continue
+            vivas = dict.fromkeys(ids, ())
+            vivas.update(
+                (t, [fila[1:] for fila in grupo]) for t, grupo in groupby(filas, key=itemgetter(0))
+            )
+            for trabajador_id, propias in vivas.items():
+                if trabajador_id not in identidades:
+                    continue
+                dias = {
+                    fecha: _estado(presente, tipo) for fecha, presente, tipo in
+                    heapq.merge(frias.get(trabajador_id, ()), propias, key=itemgetter(0))
+                }
+                yield _registro(proyecto_id, proyecto_nombre, identidades[trabajador_id], dias)
+
+
+def _registro(proyecto_id, proyecto_nombre, identidad, dias):
+    return {
+        "proyecto": proyecto_id,
+        "proyecto_nombre": proyecto_nombre,
+        "trabajador": identidad["pk"],
+        "nombre": identidad["nombre"],
+        "apellido_paterno": identidad["apellido_paterno"],
+        "apellido_materno": identidad["apellido_materno"],
+        "curp": identidad["curp"] or "",
+        "nss": identidad["nss"] or "",
+        "categoria": identidad["categoria"],
+        "dias": dias,
+        "totales": _totales(dias),
+    }
+
+
+# =======================================================
+# Serialización línea por línea
+# =======================================================
+class _Eco:
+    """Archivo falso para csv.writer: devuelve la línea en vez de escribirla."""
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(registros, desde, hasta):
+    """CSV ancho: identidad, una columna por día del periodo y totales."""
+    fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(CAMPOS_IDENTIDAD + tuple(f.isoformat() for f in fechas) + CAMPOS_TOTALES)
+    for r in registros:
+        yield escritor.writerow(
+            [r[c] for c in CAMPOS_IDENTIDAD]
+            + [r["dias"].get(f, "") for f in fechas]
+            + [r["totales"][c] for c in CAMPOS_TOTALES]
+        )
+
+
+def lineas_ndjson(registros):
+    """Un objeto JSON por línea; "dias" solo lleva los días con registro."""
+    for r in registros:
+        r["dias"] = {f.isoformat(): estado for f, estado in r["dias"].items()}
+        yield json.dumps(r, ensure_ascii=False) + "\n"
+
+
+def lineas_reporte(formato, desde, hasta, proyectos=None):
+    registros = registros_nomina(desde, hasta, proyectos)
+    if formato == "csv":
+        return lineas_csv(registros, desde, hasta)
+    return lineas_ndjson(registros)
+
+
+def en_bloques(lineas, tamano=64 * 1024):
+    """Junta las líneas en bloques de ~`tamano` caracteres para no escribir al socket línea por línea."""
+    bloque, largo = [], 0
+    for linea in lineas:
+        bloque.append(linea)
+        largo += len(linea)
+        if largo >= tamano:
+            yield "".join(bloque)
+            bloque, largo = [], 0
+    if bloque:
+        yield "".join(bloque)
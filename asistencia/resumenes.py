@@ -0,0 +1,184 @@
+"""
+Resúmenes precalculados de asistencia.
+
+ResumenDiarioProyecto (proyecto × día) y ResumenMensualTrabajador
+(trabajador × proyecto × mes) se actualizan por llave: cada ruta de
+escritura informa qué días y meses tocó y aquí se recalculan solo esas
+llaves con un GROUP BY acotado y un upsert masivo. Los tableros leen
+únicamente estas tablas, nunca el histórico de Asistencia. Las llaves
+mensuales también rehacen la asistencia compacta (compacto.py).
+"""
+from datetime import date, timedelta
+
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .compacto import codificar, conteos, filas_de_meses, guardar_meses, reconstruir_mes
+from .models import (
+    Asistencia, AsistenciaArchivada, AsistenciaMensual, ResumenDiarioProyecto, ResumenMensualTrabajador,
+)
+
+CAMPOS_CONTEO = ("presentes", "puntuales", "retardos_leves", "retardos_altos", "ausentes")
+
+
+def _conteos():
+    return {
+        "presentes":      Count("pk", filter=Q(presente=True)),
+        "puntuales":      Count("pk", filter=Q(presente=True, tipo_retraso="puntual")),
+        "retardos_leves": Count("pk", filter=Q(presente=True, tipo_retraso="retardo_leve")),
+        "retardos_altos": Count("pk", filter=Q(presente=True, tipo_retraso="retardo_alto")),
+        "ausentes":       Count("pk", filter=Q(presente=False)),
+    }
+
+
+def inicio_de_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def fin_de_mes(fecha):
+    siguiente = (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return siguiente - timedelta(days=1)
+
+
+def _guardar(modelo, filas, unique_fields):
+    """Upsert de las filas con conteos; las que quedaron en cero se borran."""
+    vivas  = [f for f in filas if any(getattr(f, c) for c in CAMPOS_CONTEO)]
+    vacias = [f for f in filas if not any(getattr(f, c) for c in CAMPOS_CONTEO)]
+    if vivas:
+        modelo.objects.bulk_create(
+            vivas,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=list(CAMPOS_CONTEO),
+        )
+    if vacias:
+        columnas = [modelo._meta.get_field(c).attname for c in unique_fields]
+        modelo.objects.filter(reduce(or_, (
+            Q(**{col: getattr(f, col) for col in columnas}) for f in vacias
+        ))).delete()
+
+
+def claves_de(trabajador_id, proyecto_id, fecha):
+    """Llaves de resumen (diaria, mensual) afectadas por una asistencia."""
+    return (proyecto_id, fecha), (trabajador_id, proyecto_id, inicio_de_mes(fecha))
+
+
+# =======================================================
+# Mantenimiento incremental
+# =======================================================
+def actualizar_resumenes(dias=(), meses=()):
+    """
+    Recalcula los resúmenes de las llaves dadas.
+      dias:  {(proyecto_id, fecha), …}
+      meses: {(trabajador_id, proyecto_id, mes), …} con mes = día 1 del mes.
+    Unas pocas consultas sin importar cuántas llaves lleguen; las llaves que
+    quedan sin asistencias se borran para coincidir con la reconstrucción.
+    """
+    dias, meses = set(dias), set(meses)
+    with transaction.atomic():
+        if dias:
+            _actualizar_diarios(dias)
+        if meses:
+            _actualizar_mensuales(meses)
+
+
+def _actualizar_diarios(dias):
+    filas = (
+        Asistencia.objects
+        .filter(proyecto_id__in={p for p, _ in dias}, fecha__in={f for _, f in dias})
+        .order_by()
+        .values("proyecto_id", "fecha")
+        .annotate(**_conteos())
+    )
+    conteos = {(r["proyecto_id"], r["fecha"]): r for r in filas}
+    _guardar(
+        ResumenDiarioProyecto,
+        [
+            ResumenDiarioProyecto(
+                proyecto_id=p, fecha=f,
+                **{c: conteos.get((p, f), {}).get(c, 0) for c in CAMPOS_CONTEO},
+            )
+            for p, f in dias
+        ],
+        unique_fields=["proyecto", "fecha"],
+    )
+
+
+def _actualizar_mensuales(meses):
+    # Una lectura por fila alimenta la asistencia compacta y los conteos
+    codificados = codificar(filas_de_meses(meses))
+    _guardar(
+        ResumenMensualTrabajador,
+        [
+            ResumenMensualTrabajador(
+                trabajador_id=t, proyecto_id=p, mes=m,
+                **(conteos(*codificados[(t, p, m)]) if (t, p, m) in codificados
+                   else dict.fromkeys(CAMPOS_CONTEO, 0)),
+            )
+            for t, p, m in meses
+        ],
+        unique_fields=["trabajador", "proyecto", "mes"],
+    )
+    guardar_meses(meses, codificados)
+
+
+# =======================================================
+# Reconstrucción completa (backfill)
+# =======================================================
+def reconstruir_resumenes(desde, hasta, proyecto_id=None):
+    """
+    Borra y recalcula los resúmenes y la asistencia compacta de [desde,
+    hasta], un mes por transacción. Los meses se toman completos; los
+    proyecto-mes archivados (archivo.py) se dejan como están, porque sus
+    filas ya no están en Asistencia. Devuelve (filas diarias, filas mensuales).
+    """
+    total_dias = total_meses = 0
+    mes = inicio_de_mes(desde)
+    while mes <= hasta:
+        fin = fin_de_mes(mes)
+        asistencias = Asistencia.objects.filter(fecha__range=(mes, fin)).order_by()
+        diarios   = ResumenDiarioProyecto.objects.filter(fecha__range=(mes, fin))
+        mensuales = ResumenMensualTrabajador.objects.filter(mes=mes)
+        compactos = AsistenciaMensual.objects.filter(mes=mes)
+        if proyecto_id:
+            asistencias = asistencias.filter(proyecto_id=proyecto_id)
+            diarios     = diarios.filter(proyecto_id=proyecto_id)
+            mensuales   = mensuales.filter(proyecto_id=proyecto_id)
+            compactos   = compactos.filter(proyecto_id=proyecto_id)
+        archivados = list(AsistenciaArchivada.objects.filter(mes=mes).values_list("proyecto_id", flat=True))
+        if archivados:
+            diarios   = diarios.exclude(proyecto_id__in=archivados)
+            mensuales = mensuales.exclude(proyecto_id__in=archivados)
+            compactos = compactos.exclude(proyecto_id__in=archivados)
+
+        with transaction.atomic():
+            diarios.delete()
+            mensuales.delete()
+            compactos.delete()
+            reconstruir_mes(asistencias, mes)
+            nuevos_dias = ResumenDiarioProyecto.objects.bulk_create(
+                ResumenDiarioProyecto(proyecto_id=r.pop("proyecto_id"), **r)
+                for r in asistencias.values("proyecto_id", "fecha").annotate(**_conteos())
+            )
+            nuevos_meses = ResumenMensualTrabajador.objects.bulk_create(
+                ResumenMensualTrabajador(
+                    trabajador_id=r.pop("trabajador_id"), proyecto_id=r.pop("proyecto_id"), mes=mes, **r
+                )
+                for r in asistencias.values("trabajador_id", "proyecto_id").annotate(**_conteos())
+            )
+        total_dias  += len(nuevos_dias)
+        total_meses += len(nuevos_meses)
+        mes = fin + timedelta(days=1)
+    return total_dias, total_meses
+
+
+def rango_asistencias():
+    """(primera, última) fecha con asistencias, o (None, None) si no hay."""
+    fechas = Asistencia.objects.order_by("fecha").values_list("fecha", flat=True)
+    primera = fechas.first()
+    if primera is None:
+        return None, None
+    return primera, fechas.last() or date.today()
@@ -0,0 +1,119 @@
+"""
+Caché de la plantilla (roster) de cada proyecto para las páginas de asistencia.
+
+Proyecto.version_roster y Proyecto.roster_modificado se actualizan en la base
+cada vez que cambia algo que esas páginas muestran: altas, cambios y bajas
+de trabajadores o de sus proyectos (asistencia/signals.py, y explícitamente
+tras las escrituras masivas). De ahí salen:
+  - la huella con la que se nombran los fragmentos de plantilla en caché
+    ({% cache %} en asistencia.html y asistencia_elegir.html), y
+  - el ETag / Last-Modified de las páginas para los GET condicionales.
+Como la versión vive en la base, varios procesos con cachés locales nunca
+sirven una plantilla vieja: solo dejan de encontrar la entrada.
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, F, Max, Sum
+from django.middleware.csrf import get_token
+from django.utils import timezone
+
+from .models import Proyecto
+
+
+def tocar_proyectos(proyecto_ids=None):
+    """Marca como cambiada la plantilla de esos proyectos (None: de todos)."""
+    qs = Proyecto.objects.all()
+    if proyecto_ids is not None:
+        qs = qs.filter(pk__in=list(proyecto_ids))
+    qs.update(version_roster=F("version_roster") + 1, roster_modificado=timezone.now())
+
+
+def tocar_proyectos_de(trabajador_ids):
+    """Marca los proyectos a los que están asignados esos trabajadores."""
+    Proyecto.objects.filter(trabajadores__in=list(trabajador_ids)).update(
+        version_roster=F("version_roster") + 1, roster_modificado=timezone.now()
+    )
+
+
+# =======================================================
+# Huellas
+# =======================================================
+def estado_roster(proyecto_id):
+    """(huella, modificado) de la plantilla de un proyecto, o (None, None) si no existe."""
+    fila = (
+        Proyecto.objects.filter(pk=proyecto_id)
+        .values_list("version_roster", "roster_modificado").first()
+    )
+    if fila is None:
+        return None, None
+    version, modificado = fila
+    # El instante distingue proyectos que reusan un pk con la versión en 0
+    return f"{proyecto_id}.{version}.{modificado.timestamp():.6f}", modificado
+
+
+def estado_catalogo():
+    """(huella, modificado) de la lista de proyectos del selector."""
+    agregado = Proyecto.objects.aggregate(
+        n=Count("pk"), ultimo=Max("pk"), versiones=Sum("version_roster"), modificado=Max("roster_modificado"),
+    )
+    huella = f"{agregado['n']}.{agregado['ultimo']}.{agregado['versiones']}"
+    return huella, agregado["modificado"]
+
+
+# =======================================================
+# GET condicional (django.views.decorators.http.condition)
+# =======================================================
+def _proyecto_de(request, kwargs):
+    valor = kwargs.get("project_id") or request.GET.get("project_id")
+    try:
+        return int(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def estados_pagina(request, proyecto_id=None):
+    """
+    {"catalogo": (huella, modificado), "roster": (huella, modificado)} de la
+    petición; se calcula una vez y lo reutilizan ETag, Last-Modified y la vista.
+    """
+    estados = getattr(request, "_estados_roster", None)
+    if estados is None:
+        estados = request._estados_roster = {
+            "catalogo": estado_catalogo(),
+            "roster": estado_roster(proyecto_id) if proyecto_id is not None else (None, None),
+        }
+    return estados
+
+
+def etag_pagina(request, *args, **kwargs):
+    """
+    ETag de una página de asistencia: catálogo, plantilla del proyecto y lo
+    que varía por petición (usuario, secreto CSRF del formulario y la fecha
+    que llevan los formularios). Con mensajes pendientes no hay ETag: la
+    página tiene que mostrarse completa.
+    """
+    if len(get_messages(request)):
+        return None
+    estados = estados_pagina(request, _proyecto_de(request, kwargs))
+    get_token(request)  # deja el secreto en META["CSRF_COOKIE"]
+    partes = (
+        estados["catalogo"][0],
+        estados["roster"][0] or "",
+        str(request.user.pk or 0),
+        request.META.get("CSRF_COOKIE", ""),
+        timezone.localdate().isoformat(),
+    )
+    return hashlib.sha1("|".join(partes).encode()).hexdigest()
+
+
+def ultima_modificacion(request, *args, **kwargs):
+    """Last-Modified: el cambio más reciente de catálogo o plantilla, no antes de hoy a las 00:00."""
+    estados = estados_pagina(request, _proyecto_de(request, kwargs))
+    fechas = [
+        estados["catalogo"][1],
+        estados["roster"][1],
+        timezone.make_aware(datetime.combine(timezone.localdate(), time.min)),
+    ]
+    return max(f for f in fechas if f is not None)
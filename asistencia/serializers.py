@@ -1,19 +1,45 @@
 # asistencia/serializers.py
 
 from rest_framework import serializers
+from .archivo import PeriodoArchivado, verificar_abierto
 from .models import Proyecto, Trabajador, Asistencia
+from .paginacion import campos_solicitados
 
-class ProyectoSerializer(serializers.ModelSerializer):
+
+class CamposDinamicosMixin:
+    """
+    Permite pedir un subconjunto de campos con ?fields=a,b,c.
+    Los nombres desconocidos se ignoran.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get('request'))
+        if campos:
+            for nombre in set(self.fields) - campos:
+                self.fields.pop(nombre)
+
+
+class ProyectoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Proyecto
         fields = '__all__'
 
-class TrabajadorSerializer(serializers.ModelSerializer):
+class TrabajadorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Trabajador
         fields = '__all__'
 
-class AsistenciaSerializer(serializers.ModelSerializer):
+class AsistenciaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Asistencia
         fields = '__all__'
+
+    def validate(self, attrs):
+        proyecto = attrs.get('proyecto', getattr(self.instance, 'proyecto', None))
+        fecha = attrs.get('fecha', getattr(self.instance, 'fecha', None))
+        if proyecto is not None and fecha is not None:
+            try:
+                verificar_abierto({(proyecto.pk, fecha)})
+            except PeriodoArchivado as e:
+                raise serializers.ValidationError({'fecha': str(e)})
+        return attrs
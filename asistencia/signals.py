@@ -0,0 +1,292 @@
+"""
+Receptores de señales de la app asistencia. Se conectan en AsistenciaConfig.ready().
+"""
+from django.db.models import Exists, Value
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import credenciales, tokens_qr
+from .archivo import meses_archivados, periodo_archivado
+from .autorizacion import cache_autorizacion
+from .busqueda import indice_trabajadores
+from .horarios import tabla_horarios
+from .models import Asistencia, Dispositivo, Horario, Proyecto, RevocacionQR, SesionAsistencia, Trabajador
+from .registro import olvidar_sesiones
+from .resumenes import actualizar_resumenes, claves_de, inicio_de_mes
+from .rosters import tocar_proyectos, tocar_proyectos_de
+from .sincronizacion import registrar_cambios, registrar_dias
+from .tablero import publicar_asistencias
+
+
+# =======================================================
+# Caché de autorización del escaneo QR
+# =======================================================
+@receiver(pre_save, sender=Dispositivo)
+def recordar_device_id_anterior(sender, instance, **kwargs):
+    if instance.pk:
+        instance._device_id_anterior = (
+            Dispositivo.objects.filter(pk=instance.pk).values_list("device_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Dispositivo)
+@receiver(post_delete, sender=Dispositivo)
+def invalidar_dispositivo(sender, instance, **kwargs):
+    device_ids = {instance.device_id, getattr(instance, "_device_id_anterior", None)} - {None}
+    cache_autorizacion.invalidar_dispositivos(device_ids=device_ids)
+
+
+@receiver(post_save, sender=Trabajador)
+@receiver(post_delete, sender=Trabajador)
+def invalidar_trabajador(sender, instance, **kwargs):
+    cache_autorizacion.invalidar_trabajadores([instance.pk])
+
+
+@receiver(pre_delete, sender=Proyecto)
+def invalidar_por_proyecto(sender, instance, **kwargs):
+    # El borrado en cascada de las tablas intermedias no emite m2m_changed
+    cache_autorizacion.invalidar_dispositivos(
+        device_ids=instance.dispositivos.values_list("device_id", flat=True)
+    )
+    cache_autorizacion.invalidar_trabajadores(instance.trabajadores.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Dispositivo.proyectos.through)
+def proyectos_dispositivo_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    if not reverse:
+        if action != "pre_clear":
+            cache_autorizacion.invalidar_dispositivos(device_ids=[instance.device_id])
+    elif action == "pre_clear":
+        cache_autorizacion.invalidar_dispositivos(
+            device_ids=instance.dispositivos.values_list("device_id", flat=True)
+        )
+    elif action != "post_clear":
+        cache_autorizacion.invalidar_dispositivos(pks=pk_set)
+
+
+@receiver(m2m_changed, sender=Trabajador.proyectos.through)
+def proyectos_trabajador_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear", "post_clear"):
+        return
+    if not reverse:
+        if action != "pre_clear":
+            cache_autorizacion.invalidar_trabajadores([instance.pk])
+    elif action == "pre_clear":
+        cache_autorizacion.invalidar_trabajadores(instance.trabajadores.values_list("pk", flat=True))
+    elif action != "post_clear":
+        cache_autorizacion.invalidar_trabajadores(pk_set)
+
+
+# =======================================================
+# Índice de búsqueda de trabajadores (busqueda.py), sin consultas
+# =======================================================
+@receiver(post_save, sender=Trabajador)
+def trabajador_guardado_busqueda(sender, instance, **kwargs):
+    indice_trabajadores.guardar(instance)
+
+
+@receiver(post_delete, sender=Trabajador)
+def trabajador_borrado_busqueda(sender, instance, **kwargs):
+    indice_trabajadores.quitar(instance.pk)
+
+
+@receiver(pre_delete, sender=Proyecto)
+def proyecto_borrado_busqueda(sender, instance, **kwargs):
+    indice_trabajadores.quitar_proyecto(instance.pk)
+
+
+@receiver(m2m_changed, sender=Trabajador.proyectos.through)
+def proyectos_trabajador_busqueda(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        trabajadores, proyectos = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        indice_trabajadores.asignar(trabajadores, proyectos, action == "post_add")
+    elif action == "pre_clear":
+        if reverse:
+            indice_trabajadores.quitar_proyecto(instance.pk)
+        else:
+            indice_trabajadores.desasignar(instance.pk)
+
+
+# =======================================================
+# Versión de la plantilla de cada proyecto (rosters.py)
+# =======================================================
+@receiver(post_save, sender=Trabajador)
+@receiver(pre_delete, sender=Trabajador)
+def trabajador_cambiado_roster(sender, instance, **kwargs):
+    # En pre_delete todavía existen sus filas en la tabla intermedia
+    tocar_proyectos_de([instance.pk])
+
+
+@receiver(post_save, sender=Proyecto)
+def proyecto_cambiado_roster(sender, instance, created, **kwargs):
+    if not created:
+        tocar_proyectos([instance.pk])
+
+
+@receiver(m2m_changed, sender=Trabajador.proyectos.through)
+def plantilla_cambiada(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # proyecto.trabajadores.add/remove/clear: cambia la plantilla de `instance`
+        tocar_proyectos([instance.pk])
+    elif action == "pre_clear":
+        tocar_proyectos_de([instance.pk])
+    else:
+        tocar_proyectos(pk_set)
+
+
+# =======================================================
+# Credenciales QR firmadas (credenciales.py, tokens_qr.py)
+# =======================================================
+@receiver(post_delete, sender=Trabajador)
+def revocar_credencial_de_baja(sender, instance, **kwargs):
+    if instance.qr_emitido is not None:
+        tokens_qr.revocar([(instance.pk, None)], "baja")
+
+
+@receiver(m2m_changed, sender=Trabajador.proyectos.through)
+def proyecto_principal_cambiado(sender, instance, action, reverse, pk_set, **kwargs):
+    # El token lleva el proyecto principal: si cambia, se reemite
+    if action == "pre_clear" and reverse:
+        instance._trabajadores_vaciados = list(instance.trabajadores.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            trabajadores = [instance.pk]
+        elif action == "post_clear":
+            trabajadores = getattr(instance, "_trabajadores_vaciados", [])
+        else:
+            trabajadores = pk_set
+        if trabajadores:
+            credenciales.revisar_proyecto_principal(list(trabajadores))
+
+
+@receiver(post_save, sender=RevocacionQR)
+@receiver(post_delete, sender=RevocacionQR)
+def revocacion_cambiada(sender, **kwargs):
+    tokens_qr.revocaciones.invalidar()
+
+
+# =======================================================
+# Tabla compilada de horarios
+# =======================================================
+@receiver(post_save, sender=Horario)
+@receiver(post_delete, sender=Horario)
+def horario_cambiado(sender, **kwargs):
+    tabla_horarios.invalidar()
+
+
+# =======================================================
+# hora_base recordada de las sesiones diarias
+# =======================================================
+@receiver(post_save, sender=SesionAsistencia)
+@receiver(post_delete, sender=SesionAsistencia)
+def sesion_cambiada(sender, **kwargs):
+    olvidar_sesiones()
+
+
+# =======================================================
+# Resúmenes de asistencia (escrituras por ORM: API REST, admin)
+# Las rutas masivas de registro.py los actualizan por su cuenta.
+# =======================================================
+@receiver(pre_save, sender=Asistencia)
+def recordar_llave_anterior(sender, instance, **kwargs):
+    # Al editar, la llave anterior y si el mes destino está archivado salen
+    # de la misma consulta; en un mes abierto no hay nada que verificar.
+    archivados = meses_archivados({(instance.proyecto_id, instance.fecha)})
+    if instance.pk:
+        fila = (
+            Asistencia.objects.filter(pk=instance.pk)
+            .annotate(archivado=Exists(archivados) if archivados is not None else Value(False))
+            .values_list("trabajador_id", "proyecto_id", "fecha", "archivado").first()
+        )
+        if fila is not None:
+            instance._llave_anterior, archivado = fila[:3], fila[3]
+            if archivado:
+                raise periodo_archivado(instance.proyecto_id, inicio_de_mes(instance.fecha))
+            return
+    if archivados is not None and archivados.exists():
+        raise periodo_archivado(instance.proyecto_id, inicio_de_mes(instance.fecha))
+
+
+@receiver(post_save, sender=Asistencia)
+@receiver(post_delete, sender=Asistencia)
+def asistencia_cambiada(sender, instance, origin=None, **kwargs):
+    # En un borrado en cascada los resúmenes del proyecto/trabajador que se
+    # borra caen con él; solo quedan por ajustar los del otro lado.
+    origen = getattr(origin, "model", type(origin))
+    if origen is Proyecto:
+        return
+    llaves = {(instance.trabajador_id, instance.proyecto_id, instance.fecha)}
+    llaves.add(getattr(instance, "_llave_anterior", None))
+    claves = [claves_de(*llave) for llave in llaves - {None}]
+    actualizar_resumenes(
+        dias={d for d, _ in claves},
+        meses={m for _, m in claves} if origen is not Trabajador else (),
+    )
+
+
+# =======================================================
+# Tablero en vivo (las rutas de registro.py publican por su cuenta)
+# =======================================================
+@receiver(post_save, sender=Asistencia)
+def publicar_asistencia(sender, instance, **kwargs):
+    publicar_asistencias([instance], ["presente", "tipo_retraso", "hora_entrada"])
+
+
+# =======================================================
+# Bitácora de la sincronización delta (sincronizacion.py)
+# Las rutas masivas registran sus cambios por su cuenta.
+# =======================================================
+MODELOS_SYNC = {Proyecto: "proyecto", Trabajador: "trabajador", Dispositivo: "dispositivo"}
+
+
+@receiver(post_save, sender=Proyecto)
+@receiver(post_save, sender=Trabajador)
+@receiver(post_save, sender=Dispositivo)
+def objeto_sincronizable_guardado(sender, instance, **kwargs):
+    registrar_cambios(MODELOS_SYNC[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Proyecto)
+@receiver(post_delete, sender=Trabajador)
+@receiver(post_delete, sender=Dispositivo)
+def objeto_sincronizable_borrado(sender, instance, **kwargs):
+    registrar_cambios(MODELOS_SYNC[sender], [instance.pk], baja=True)
+
+
+@receiver(pre_delete, sender=Proyecto)
+def asignaciones_de_proyecto_borrado(sender, instance, **kwargs):
+    # Las tablas intermedias se borran en cascada sin m2m_changed
+    registrar_cambios("trabajador", instance.trabajadores.values_list("pk", flat=True))
+    registrar_cambios("dispositivo", instance.dispositivos.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Trabajador.proyectos.through)
+@receiver(m2m_changed, sender=Dispositivo.proyectos.through)
+def asignaciones_cambiadas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    modelo = "trabajador" if sender is Trabajador.proyectos.through else "dispositivo"
+    if not reverse:
+        registrar_cambios(modelo, [instance.pk])
+    elif action == "pre_clear":
+        relacion = instance.trabajadores if modelo == "trabajador" else instance.dispositivos
+        registrar_cambios(modelo, relacion.values_list("pk", flat=True))
+    else:
+        registrar_cambios(modelo, pk_set)
+
+
+@receiver(post_save, sender=Asistencia)
+@receiver(post_delete, sender=Asistencia)
+def asistencia_sincronizable(sender, instance, origin=None, **kwargs):
+    # La baja de un proyecto o trabajador ya implica la de sus asistencias
+    if getattr(origin, "model", type(origin)) in (Proyecto, Trabajador):
+        return
+    dias = {(instance.proyecto_id, instance.fecha)}
+    anterior = getattr(instance, "_llave_anterior", None)
+    if anterior:
+        dias.add(anterior[1:])
+    registrar_dias(dias)
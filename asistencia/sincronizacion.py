@@ -0,0 +1,184 @@
+"""
+Sincronización delta para las apps móviles.
+
+Cada alta, cambio o baja de Proyecto, Trabajador (con sus proyectos),
+asignación de proyectos de un Dispositivo y asistencia deja una fila en
+Cambio: signals.py para las escrituras por ORM y registrar_cambios /
+registrar_dias en la misma transacción de las rutas masivas. El id de la
+fila es el token: el cliente manda el último que recibió y obtiene solo lo
+que cambió después, con las bajas como tombstones.
+
+Las asistencias se anotan por (proyecto, día): el cliente recibe el día
+completo de ese proyecto y reemplaza el suyo, así los borrados dentro de un
+día no necesitan tombstone y la bitácora crece un renglón por escritura, no
+por trabajador. Una baja de proyecto o trabajador implica las de sus
+asistencias y asignaciones.
+
+SQLite serializa las transacciones de escritura (BEGIN IMMEDIATE), así que
+los ids se asignan en el orden de los commits y un token nunca deja atrás
+un cambio que todavía no era visible.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Asistencia, Cambio, Dispositivo, Proyecto, Trabajador
+
+CAMPOS_PROYECTO   = ("id", "nombre", "descripcion")
+CAMPOS_TRABAJADOR = ("id", "nombre", "apellido_paterno", "apellido_materno", "categoria")
+CAMPOS_DISPOSITIVO = ("id", "device_id", "nombre")
+
+
+def _dias_asistencia():
+    return getattr(settings, "ASISTENCIA_SYNC_DIAS", 7)
+
+
+# =======================================================
+# Registro de cambios
+# =======================================================
+def registrar_cambios(modelo, ids, baja=False):
+    """Anota altas/cambios (o bajas) de objetos de `modelo` ('proyecto', 'trabajador', 'dispositivo')."""
+    Cambio.objects.bulk_create([Cambio(modelo=modelo, objeto_id=pk, baja=baja) for pk in set(ids)])
+
+
+def registrar_dias(dias):
+    """Anota que cambió la asistencia de esos (proyecto_id, fecha)."""
+    Cambio.objects.bulk_create([
+        Cambio(modelo="asistencia", objeto_id=proyecto_id, fecha=fecha) for proyecto_id, fecha in set(dias)
+    ])
+
+
+def podar(dias):
+    """
+    Borra los cambios de más de `dias` días (siempre conserva el último, que
+    marca el token vigente). Un cliente con un token anterior a lo podado
+    recibe un paquete completo. Devuelve cuántos borró.
+    """
+    ultimo = Cambio.objects.aggregate(m=Max("pk"))["m"]
+    if ultimo is None:
+        return 0
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = Cambio.objects.filter(pk__lt=ultimo, momento__lt=limite).delete()
+    return borrados
+
+
+# =======================================================
+# Paquete para el cliente
+# =======================================================
+def paquete(desde=None):
+    """
+    Cambios posteriores al token `desde`, o un paquete completo si no hay
+    token o si es anterior a lo que conserva la bitácora:
+    {"token", "completo", "proyectos", "proyectos_baja", "trabajadores",
+     "trabajadores_baja", "dispositivos", "dispositivos_baja", "asistencias"}.
+    "asistencias" es una lista de días {"proyecto", "fecha", "filas"} que
+    reemplazan a los del cliente; el paquete completo trae los últimos
+    ASISTENCIA_SYNC_DIAS días.
+    """
+    limites = Cambio.objects.aggregate(primero=Min("pk"), ultimo=Max("pk"))
+    token = limites["ultimo"] or 0
+    # Los ids nunca se reusan: todo lo anterior al primero conservado se podó
+    horizonte = (limites["primero"] or token + 1) - 1
+    completo = desde is None or desde < horizonte or desde > token
+    if completo:
+        return {"token": token, "completo": True, **_completo()}
+    return {"token": token, "completo": False, **_delta(desde, token)}
+
+
+def _completo():
+    desde = timezone.localdate() - timedelta(days=_dias_asistencia() - 1)
+    # El IN sobre proyectos deja a SQLite buscar por (proyecto, fecha) en el
+    # índice en una sola consulta, en vez de recorrerlo completo
+    dias = set(
+        Asistencia.objects.filter(proyecto_id__in=Proyecto.objects.values("pk"), fecha__gte=desde)
+        .order_by().values_list("proyecto_id", "fecha").distinct()
+    )
+    return {
+        "proyectos": list(Proyecto.objects.order_by("pk").values(*CAMPOS_PROYECTO)),
+        "proyectos_baja": [],
+        "trabajadores": _trabajadores(Trabajador.objects.order_by("pk")),
+        "trabajadores_baja": [],
+        "dispositivos": _dispositivos(Dispositivo.objects.order_by("pk")),
+        "dispositivos_baja": [],
+        "asistencias": _asistencias(dias),
+    }
+
+
+def _delta(desde, hasta):
+    vigentes = {"proyecto": {}, "trabajador": {}, "dispositivo": {}}
+    dias = set()
+    for modelo, objeto_id, fecha, baja in (
+        Cambio.objects.filter(pk__gt=desde, pk__lte=hasta).order_by("pk")
+        .values_list("modelo", "objeto_id", "fecha", "baja").iterator(chunk_size=2000)
+    ):
+        if modelo == "asistencia":
+            dias.add((objeto_id, fecha))
+        else:
+            vigentes[modelo][objeto_id] = baja  # el último cambio de cada objeto gana
+
+    resultado = {}
+    for modelo, clave, consulta, serializar in (
+        ("proyecto", "proyectos", Proyecto.objects.order_by("pk"), lambda qs: list(qs.values(*CAMPOS_PROYECTO))),
+        ("trabajador", "trabajadores", Trabajador.objects.order_by("pk"), _trabajadores),
+        ("dispositivo", "dispositivos", Dispositivo.objects.order_by("pk"), _dispositivos),
+    ):
+        altas = [pk for pk, baja in vigentes[modelo].items() if not baja]
+        filas = serializar(consulta.filter(pk__in=altas)) if altas else []
+        # Lo que se borró después de leer el token también es baja
+        bajas = {pk for pk, baja in vigentes[modelo].items() if baja} | (set(altas) - {f["id"] for f in filas})
+        resultado[clave] = filas
+        resultado[f"{clave}_baja"] = sorted(bajas)
+    resultado["asistencias"] = _asistencias(dias)
+    return resultado
+
+
+def _trabajadores(qs):
+    filas = list(qs.values(*CAMPOS_TRABAJADOR))
+    proyectos = _asignaciones(Trabajador.proyectos.through, "trabajador_id", [f["id"] for f in filas])
+    for f in filas:
+        f["proyectos"] = proyectos.get(f["id"], [])
+    return filas
+
+
+def _dispositivos(qs):
+    filas = list(qs.values(*CAMPOS_DISPOSITIVO))
+    proyectos = _asignaciones(Dispositivo.proyectos.through, "dispositivo_id", [f["id"] for f in filas])
+    for f in filas:
+        f["proyectos"] = proyectos.get(f["id"], [])
+    return filas
+
+
+def _asignaciones(through, columna, ids, lote=900):
+    """{id: [proyecto_id, …]} leyendo la tabla intermedia por lotes de ids."""
+    asignaciones = {}
+    for i in range(0, len(ids), lote):
+        for pk, proyecto_id in (
+            through.objects.filter(**{f"{columna}__in": ids[i:i + lote]})
+            .order_by(columna, "proyecto_id").values_list(columna, "proyecto_id")
+        ):
+            asignaciones.setdefault(pk, []).append(proyecto_id)
+    return asignaciones
+
+
+def _asistencias(dias):
+    por_proyecto = {}
+    for proyecto_id, fecha in dias:
+        por_proyecto.setdefault(proyecto_id, set()).add(fecha)
+
+    resultado = []
+    for proyecto_id in sorted(por_proyecto):
+        fechas = sorted(por_proyecto[proyecto_id])
+        filas = {f: [] for f in fechas}
+        for trabajador_id, fecha, presente, tipo, hora in (
+            Asistencia.objects.filter(proyecto_id=proyecto_id, fecha__in=fechas)
+            .order_by("fecha", "trabajador_id")
+            .values_list("trabajador_id", "fecha", "presente", "tipo_retraso", "hora_entrada")
+        ):
+            filas[fecha].append({
+                "trabajador": trabajador_id, "presente": presente,
+                "tipo_retraso": tipo, "hora_entrada": hora,
+            })
+        resultado += [{"proyecto": proyecto_id, "fecha": f, "filas": filas[f]} for f in fechas]
+    return resultado
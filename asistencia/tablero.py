@@ -0,0 +1,277 @@
+"""
+Tablero de asistencia en vivo (server-sent events).
+
+Cada escritura de asistencias publica, al confirmarse la transacción, un
+evento por proyecto con las filas escritas: registro.guardar_asistencias
+(escaneos QR, sincronización y el formulario de cuadrilla) y las
+escrituras por ORM (API REST, admin) desde signals.py. El evento se
+serializa una sola vez y el canal lo reparte a los tableros suscritos a
+ese proyecto, así que cada escaneo cuesta un mensaje por tablero y no una
+recarga de la plantilla completa.
+
+Al conectarse, un tablero recibe el estado del día (una consulta) y luego
+solo los cambios; si se reconecta, vuelve a recibir el estado.
+
+El canal se elige con ASISTENCIA_TABLERO_BACKEND (ruta a una clase con
+suscribir/cancelar/publicar). CanalLocal reparte dentro del proceso; con
+varios procesos de servidor hace falta un backend compartido que, al
+recibir un evento de otro proceso, llame a Suscripcion.entregar.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Asistencia
+
+# Segundos sin eventos antes de mandar un comentario (detecta clientes caídos)
+LATIDO = 15
+# Eventos sin leer que se toleran a un tablero lento antes de pedirle que se reconecte
+LIMITE_PENDIENTES = 500
+# Milisegundos que espera EventSource antes de reconectarse
+REINTENTO_MS = 3000
+# Milisegundos que espera un tablero rechazado por falta de cupo (CupoFlujos)
+REINTENTO_OCUPADO_MS = 30000
+
+
+def formatear(evento, datos):
+    """Texto SSE de un evento."""
+    return f"event: {evento}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':'))}\n\n"
+
+
+class Suscripcion:
+    """
+    Cola de eventos de un tablero. El canal la llena desde cualquier hilo con
+    entregar(); la vista la consume con esperar() (WSGI, un hilo por
+    tablero) o esperar_async() (ASGI, en el event loop).
+    """
+
+    def __init__(self, proyecto_id):
+        self.proyecto_id = proyecto_id
+        self.desbordada = False
+        self._eventos = deque()
+        self._hay = threading.Event()
+        self._async = None  # (loop, asyncio.Event) del consumidor ASGI
+
+    def entregar(self, texto):
+        if len(self._eventos) >= LIMITE_PENDIENTES:
+            self.desbordada = True
+        else:
+            self._eventos.append(texto)
+        self._hay.set()
+        if self._async is not None:
+            loop, hay = self._async
+            loop.call_soon_threadsafe(hay.set)
+
+    def _pendientes(self):
+        self._hay.clear()
+        textos = []
+        while self._eventos:
+            textos.append(self._eventos.popleft())
+        return textos
+
+    def esperar(self, timeout=LATIDO):
+        """Eventos pendientes; bloquea hasta `timeout` si no hay ninguno."""
+        if not self._eventos:
+            self._hay.wait(timeout)
+        return self._pendientes()
+
+    async def esperar_async(self, timeout=LATIDO):
+        if self._async is None:
+            self._async = (asyncio.get_running_loop(), asyncio.Event())
+        _, hay = self._async
+        if not self._eventos:
+            try:
+                await asyncio.wait_for(hay.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        hay.clear()
+        return self._pendientes()
+
+
+class CanalLocal:
+    """Pub/sub en memoria del proceso: {proyecto_id: suscripciones}."""
+
+    def __init__(self):
+        self._suscripciones = {}
+        self._lock = threading.Lock()
+
+    def suscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.setdefault(suscripcion.proyecto_id, set()).add(suscripcion)
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            suscripciones = self._suscripciones.get(suscripcion.proyecto_id)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[suscripcion.proyecto_id]
+
+    def hay_suscriptores(self, proyecto_id):
+        return proyecto_id in self._suscripciones
+
+    def publicar(self, proyecto_id, texto):
+        with self._lock:
+            destinos = list(self._suscripciones.get(proyecto_id, ()))
+        for suscripcion in destinos:
+            suscripcion.entregar(texto)
+
+
+_canal = None
+_canal_lock = threading.Lock()
+
+
+def canal():
+    """El canal configurado en ASISTENCIA_TABLERO_BACKEND (uno por proceso)."""
+    global _canal
+    if _canal is None:
+        with _canal_lock:
+            if _canal is None:
+                ruta = getattr(settings, "ASISTENCIA_TABLERO_BACKEND", "asistencia.tablero.CanalLocal")
+                _canal = import_string(ruta)()
+    return _canal
+
+
+# =======================================================
+# Publicación
+# =======================================================
+def _fila(asistencia, campos):
+    fila = {"trabajador": asistencia.trabajador_id}
+    for campo in campos:
+        fila[campo] = getattr(asistencia, campo)
+    return fila
+
+
+def publicar_asistencias(asistencias, campos):
+    """
+    Publica tras el commit las asistencias escritas, agrupadas por proyecto y
+    día. Solo lleva `campos` (los que la escritura fijó): el formulario de
+    cuadrilla marca presente sin tocar tipo_retraso ni hora_entrada.
+    """
+    transaction.on_commit(lambda: _publicar(asistencias, campos))
+
+
+def _publicar(asistencias, campos):
+    # Se decide al confirmar: un tablero suscrito antes del commit pudo leer
+    # su estado inicial sin esta escritura y tiene que recibirla.
+    canal_ = canal()
+    hay = getattr(canal_, "hay_suscriptores", lambda proyecto_id: True)
+    grupos = {}
+    for a in asistencias:
+        if hay(a.proyecto_id):
+            grupos.setdefault((a.proyecto_id, a.fecha), []).append(a)
+    for (proyecto_id, fecha), filas in grupos.items():
+        canal_.publicar(proyecto_id, formatear("asistencia", {
+            "fecha": fecha, "filas": [_fila(a, campos) for a in filas],
+        }))
+
+
+# =======================================================
+# Flujo SSE
+# =======================================================
+def estado_inicial(proyecto_id):
+    """Evento "estado": la asistencia de hoy del proyecto."""
+    hoy = timezone.localdate()
+    filas = [
+        {"trabajador": t, "presente": p, "tipo_retraso": r, "hora_entrada": h}
+        for t, p, r, h in Asistencia.objects.filter(proyecto_id=proyecto_id, fecha=hoy)
+        .values_list("trabajador_id", "presente", "tipo_retraso", "hora_entrada")
+    ]
+    return formatear("estado", {"fecha": hoy, "filas": filas})
+
+
+def _apertura(proyecto_id):
+    """Suscribe antes de leer el estado: lo escrito mientras tanto llega después como evento."""
+    suscripcion = Suscripcion(proyecto_id)
+    canal().suscribir(suscripcion)
+    try:
+        return suscripcion, f"retry: {REINTENTO_MS}\n\n" + estado_inicial(proyecto_id)
+    except Exception:
+        canal().cancelar(suscripcion)
+        raise
+
+
+def flujo(proyecto_id):
+    """Generador SSE para WSGI: ocupa un hilo del servidor mientras el tablero está abierto."""
+    suscripcion, inicio = _apertura(proyecto_id)
+    try:
+        yield inicio
+        while not suscripcion.desbordada:
+            textos = suscripcion.esperar()
+            yield "".join(textos) if textos else ": latido\n\n"
+        yield formatear("recargar", {})
+    finally:
+        canal().cancelar(suscripcion)
+
+
+class CupoFlujos:
+    """
+    Tope de flujos SSE abiertos a la vez por WSGI, donde cada tablero ocupa
+    un hilo del pool del servidor (gestion_obra/servidor.py) durante toda la
+    conexión. Sin tope, unos cuantos tableros dejan a los escaneos esperando
+    un hilo libre; pasado el tope la vista responde 503 y el tablero
+    reintenta más tarde. El tope es ASISTENCIA_TABLERO_FLUJOS_WSGI.
+    """
+
+    def __init__(self, maximo=None):
+        self.maximo = maximo
+        self.abiertos = 0
+        self._lock = threading.Lock()
+
+    def abrir(self, proyecto_id):
+        """Iterable de flujo() que devuelve su lugar al cerrarse, o None si no hay cupo."""
+        maximo = self.maximo if self.maximo is not None else getattr(settings, "ASISTENCIA_TABLERO_FLUJOS_WSGI", 2)
+        with self._lock:
+            if self.abiertos >= maximo:
+                return None
+            self.abiertos += 1
+        return _FlujoConCupo(flujo(proyecto_id), self)
+
+    def liberar(self):
+        with self._lock:
+            self.abiertos -= 1
+
+
+class _FlujoConCupo:
+    """Envoltura de flujo(): la respuesta llama a close() aunque el flujo no se haya leído."""
+
+    def __init__(self, eventos, cupo):
+        self._eventos = eventos
+        self._cupo = cupo
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._eventos)
+
+    def close(self):
+        self._eventos.close()
+        cupo, self._cupo = self._cupo, None
+        if cupo is not None:
+            cupo.liberar()
+
+
+flujos_wsgi = CupoFlujos()
+
+
+async def flujo_async(proyecto_id):
+    """Generador SSE para ASGI (gestion_obra/asgi.py): no ocupa un hilo por tablero."""
+    from asgiref.sync import sync_to_async
+
+    suscripcion, inicio = await sync_to_async(_apertura)(proyecto_id)
+    try:
+        yield inicio
+        while not suscripcion.desbordada:
+            textos = await suscripcion.esperar_async()
+            yield "".join(textos) if textos else ": latido\n\n"
+        yield formatear("recargar", {})
+    finally:
+        canal().cancelar(suscripcion)
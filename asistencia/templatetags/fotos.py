@@ -0,0 +1,11 @@
+from django import template
+
+from asistencia.fotos import url_foto
+
+register = template.Library()
+
+
+@register.filter
+def variante(fotografia, nombre):
+    """{{ trabajador.fotografia|variante:"miniatura" }} -> URL de esa variante."""
+    return url_foto(fotografia.name if fotografia else "", nombre)
@@ -1,3 +1,1511 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from gestion_obra.estaticos import ArchivosEstaticos, RE_HASH_ESTATICO, comprimir
+from gestion_obra.metricas import leer_prometheus, limite_consultas, metricas
+
+from . import compacto, fotos, tokens_qr
+from .agrupador import agrupador
+from .archivo import PeriodoArchivado, archivar_mes, corte, pendientes, restaurar_mes
+from .autorizacion import CacheAutorizacion, cache_autorizacion
+from .busqueda import indice_trabajadores, normalizar
+from .benchmark import ESCENARIOS, comparar, correr_escenario, crear_cuadrilla, crear_proyecto, poblar
+from .horarios import reclasificar, tabla_horarios
+from .importacion import validar_fila
+from .paginacion import CursorPaginacion
+from .models import (
+    Asistencia, AsistenciaMensual, Dispositivo, EscaneoQR, Horario, Proyecto, ResumenDiarioProyecto,
+    ResumenMensualTrabajador, SesionAsistencia, Trabajador,
+)
+from .registro import olvidar_sesiones, registrar_asistencias_bulk, registrar_escaneo
+from .reportes import registros_nomina
+from .resumenes import CAMPOS_CONTEO, reconstruir_resumenes
+from .serializers import AsistenciaSerializer
+from .signals import recordar_llave_anterior
+from .tablero import Suscripcion, canal, flujos_wsgi
+from .templatetags.fotos import variante
+from .tokens_qr import TokenInvalido, emitir, revocaciones, verificar
+from .views import CACHE_INMUTABLE, servir_media
+
+
+# Las credenciales que generan los Trabajador creados en las pruebas van a
+# un directorio temporal, y en el mismo hilo: ninguna queda en media/ ni se
+# escribe después de terminar la prueba que la creó. Se firman con una clave
+# fija, sin crear qr_clave junto a la base.
+_media_pruebas = tempfile.TemporaryDirectory()
+_ajustes_pruebas = override_settings(
+    MEDIA_ROOT=_media_pruebas.name, ASISTENCIA_CREDENCIALES_ASINCRONAS=False,
+    ASISTENCIA_QR_CLAVES={"t": "clave de pruebas"}, ASISTENCIA_QR_CLAVE_LOCAL=None,
+)
+
+
+def setUpModule():
+    _ajustes_pruebas.enable()
+
+
+def tearDownModule():
+    _ajustes_pruebas.disable()
+    _media_pruebas.cleanup()
+
+
+# La espera del BEGIN IMMEDIATE entre 32 hilos no es una consulta lenta
+@override_settings(TASAL_METRICAS_CONSULTA_LENTA_MS=None)
+class EscaneoConcurrenteTests(TransactionTestCase):
+    """
+    Prueba de carga: 1,000 escaneos simultáneos desde 10 dispositivos sobre
+    2 proyectos deben registrarse sin errores y con una sola sesión por
+    dispositivo/proyecto/día.
+    """
+    ESCANEOS    = 1000
+    DISPOSITIVOS = 10
+    HILOS       = 32
+
+    def setUp(self):
+        cache_autorizacion.limpiar()
+        olvidar_sesiones()
+        self.proyectos = [crear_proyecto("Obra Norte"), crear_proyecto("Obra Sur")]
+        mitad = self.ESCANEOS // 2
+        self.trabajadores = (
+            crear_cuadrilla(self.proyectos[0], mitad, prefijo="Norte")
+            + crear_cuadrilla(self.proyectos[1], self.ESCANEOS - mitad, prefijo="Sur")
+        )
+        self.dispositivos = []
+        for i in range(self.DISPOSITIVOS):
+            disp = Dispositivo.objects.create(device_id=f"tablet-{i}")
+            disp.proyectos.set(self.proyectos)
+            self.dispositivos.append(disp.device_id)
+
+    def _escanear(self, i):
+        try:
+            trab_id   = self.trabajadores[i]
+            device_id = self.dispositivos[i % self.DISPOSITIVOS]
+            resp = Client().get(f"/asistencia/registrar-qr/{trab_id}/", {"device_id": device_id})
+            return resp.status_code
+        finally:
+            connections.close_all()
+
+    def test_escaneos_simultaneos_sin_errores(self):
+        with ThreadPoolExecutor(max_workers=self.HILOS) as pool:
+            codigos = list(pool.map(self._escanear, range(self.ESCANEOS)))
+
+        self.assertEqual([c for c in codigos if c != 200], [])
+        self.assertEqual(Asistencia.objects.count(), self.ESCANEOS)
+        self.assertEqual(
+            SesionAsistencia.objects.count(), self.DISPOSITIVOS * len(self.proyectos)
+        )
+
+
+class EscaneoAsyncTests(TransactionTestCase):
+    """
+    La misma ráfaga por la vista async (ruta ASGI): los escaneos simultáneos
+    se agrupan en pocas transacciones sin perder ninguno.
+    """
+    ESCANEOS     = 200
+    DISPOSITIVOS = 4
+
+    def setUp(self):
+        cache_autorizacion.limpiar()
+        olvidar_sesiones()
+        self.proyecto = crear_proyecto("Obra Async")
+        self.trabajadores = crear_cuadrilla(self.proyecto, self.ESCANEOS, prefijo="Async")
+        self.dispositivos = []
+        for i in range(self.DISPOSITIVOS):
+            disp = Dispositivo.objects.create(device_id=f"tablet-async-{i}")
+            disp.proyectos.add(self.proyecto)
+            self.dispositivos.append(disp.device_id)
+
+    async def _rafaga(self, peticiones):
+        cliente = AsyncClient()
+        respuestas = await asyncio.gather(*(
+            cliente.get(f"/asistencia/registrar-qr-async/{t}/", {"device_id": d}) for t, d in peticiones
+        ))
+        return respuestas, agrupador()
+
+    def test_rafaga_agrupada_sin_errores(self):
+        peticiones = [
+            (t, self.dispositivos[i % self.DISPOSITIVOS]) for i, t in enumerate(self.trabajadores)
+        ]
+        respuestas, instancia = async_to_sync(self._rafaga)(peticiones)
+
+        self.assertEqual([r.status_code for r in respuestas if r.status_code != 200], [])
+        self.assertTrue(all("tipo_retraso" in r.json() for r in respuestas))
+        self.assertEqual(Asistencia.objects.count(), self.ESCANEOS)
+        self.assertEqual(SesionAsistencia.objects.count(), self.DISPOSITIVOS)
+        self.assertEqual(instancia.escaneos, self.ESCANEOS)
+        self.assertLess(instancia.lotes, self.ESCANEOS)
+
+    def test_dispositivo_no_autorizado(self):
+        respuestas, _ = async_to_sync(self._rafaga)([(self.trabajadores[0], "tablet-ajena")])
+        self.assertEqual(respuestas[0].status_code, 403)
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class RegistroMasivoTests(TestCase):
+    """Resultado por elemento de registrar/: un error no tumba el lote."""
+
+    def setUp(self):
+        self.proyecto, self.otro = crear_proyecto("Obra masiva"), crear_proyecto("Otra masiva")
+        self.trabajadores = crear_cuadrilla(self.proyecto, 2, prefijo="Masivo")
+        # Con id 1 en el proyecto, True (int(True) == 1) encontraría a alguien
+        Trabajador.objects.filter(pk=1).delete()
+        Trabajador.objects.create(pk=1, nombre="Uno", apellido_paterno="P", apellido_materno="M",
+                                  categoria="Ayudante", telefono="0").proyectos.add(self.proyecto)
+        self.ajeno = crear_cuadrilla(self.otro, 1, prefijo="Ajeno")[0]
+
+    def registrar(self, asistencias):
+        r = self.client.post("/asistencia/registrar/", {
+            "project": self.proyecto.pk, "date": "2024-03-04", "asistencias": asistencias,
+        }, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        return r.json()["results"]
+
+    def test_resultados_por_elemento(self):
+        uno, dos = self.trabajadores
+        self.assertEqual(self.registrar([{"trabajador": uno, "presente": True}]),
+                         [{"trabajador": uno, "created": True, "presente": True}])
+        self.assertEqual(self.registrar([
+            {"trabajador": uno, "presente": False},
+            {"trabajador": 99999, "presente": True},
+            {"trabajador": self.ajeno, "presente": True},
+            {"trabajador": True, "presente": True},
+            {"trabajador": uno + 0.5, "presente": True},
+            {"trabajador": dos, "presente": True},
+            {"trabajador": dos, "presente": False},
+        ]), [
+            {"trabajador": uno, "created": False, "presente": False},
+            {"trabajador": 99999, "error": "Trabajador not found."},
+            {"trabajador": self.ajeno, "error": "Trabajador no asignado al proyecto."},
+            {"trabajador": True, "error": "Trabajador not found."},
+            {"trabajador": uno + 0.5, "error": "Trabajador not found."},
+            {"trabajador": dos, "created": True, "presente": True},
+            {"trabajador": dos, "created": False, "presente": False},
+        ])
+        # El último elemento de un mismo trabajador es el que queda
+        self.assertEqual(
+            dict(Asistencia.objects.filter(proyecto=self.proyecto).values_list("trabajador_id", "presente")),
+            {uno: False, dos: False},
+        )
+
+
+class SincronizarEscaneosTests(TestCase):
+    """Lotes de escaneos offline: reenviar el mismo lote no duplica nada."""
+
+    def setUp(self):
+        cache_autorizacion.limpiar()
+        olvidar_sesiones()
+        self.proyecto = crear_proyecto("Obra offline")
+        self.trabajadores = crear_cuadrilla(self.proyecto, 3, prefijo="Offline")
+        Dispositivo.objects.create(device_id="tablet-offline").proyectos.add(self.proyecto)
+
+    def enviar(self, escaneos):
+        return self.client.post("/asistencia/sincronizar-qr/", {
+            "device_id": "tablet-offline", "escaneos": escaneos,
+        }, content_type="application/json")
+
+    def test_reenvio_idempotente(self):
+        momento = timezone.now().replace(microsecond=0).isoformat()
+        lote = [{"clave": f"offline-{t}", "trabajador": t, "timestamp": momento} for t in self.trabajadores]
+        primera = self.enviar(lote)
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual([r["estado"] for r in primera.json()["results"]], ["registrado"] * 3)
+        self.assertEqual([r["duplicado"] for r in primera.json()["results"]], [False] * 3)
+
+        segunda = self.enviar(lote)
+        self.assertEqual(segunda.status_code, 200)
+        for antes, despues in zip(primera.json()["results"], segunda.json()["results"]):
+            self.assertTrue(despues.pop("duplicado"))
+            antes.pop("duplicado")
+            self.assertEqual(despues, antes)
+        self.assertEqual(Asistencia.objects.count(), 3)
+        self.assertEqual(EscaneoQR.objects.count(), 3)
+        self.assertEqual(SesionAsistencia.objects.count(), 1)
+
+    def test_clave_repetida_en_el_lote(self):
+        momento = timezone.now().isoformat()
+        t = self.trabajadores[0]
+        r = self.enviar([{"clave": "rep", "trabajador": t, "timestamp": momento}] * 2)
+        self.assertEqual([e["estado"] for e in r.json()["results"]], ["registrado", "rechazado"])
+        self.assertEqual(EscaneoQR.objects.count(), 1)
+
+
+class CacheAutorizacionTests(TestCase):
+    """Los cambios de dispositivos, trabajadores y asignaciones invalidan la caché del escaneo."""
+
+    def setUp(self):
+        cache_autorizacion.limpiar()
+        self.addCleanup(cache_autorizacion.limpiar)
+        olvidar_sesiones()
+        self.proyecto = crear_proyecto("Obra caché")
+        self.trabajador, self.otro = crear_cuadrilla(self.proyecto, 2, prefijo="Cache")
+        self.dispositivo = Dispositivo.objects.create(device_id="tablet-cache")
+        self.dispositivo.proyectos.add(self.proyecto)
+
+    def escanear(self, trabajador, device_id="tablet-cache"):
+        return self.client.get(f"/asistencia/registrar-qr/{trabajador}/", {"device_id": device_id})
+
+    def test_quitar_trabajador_del_proyecto(self):
+        self.assertEqual(self.escanear(self.trabajador).status_code, 200)
+        Trabajador.objects.get(pk=self.trabajador).proyectos.remove(self.proyecto)
+        self.assertEqual(self.escanear(self.trabajador).status_code, 403)
+        # Lado inverso: proyecto.trabajadores.remove
+        self.assertEqual(self.escanear(self.otro).status_code, 200)
+        self.proyecto.trabajadores.remove(self.otro)
+        self.assertEqual(self.escanear(self.otro).status_code, 403)
+
+    def test_vaciar_dispositivos_del_proyecto(self):
+        self.assertEqual(self.escanear(self.trabajador).status_code, 200)
+        self.proyecto.dispositivos.clear()
+        self.assertEqual(self.escanear(self.trabajador).status_code, 403)
+
+    def test_cambio_de_device_id_y_baja(self):
+        self.assertEqual(self.escanear(self.trabajador).status_code, 200)
+        self.dispositivo.device_id = "tablet-nueva"
+        self.dispositivo.save()
+        self.assertEqual(self.escanear(self.trabajador).status_code, 403)
+        self.assertEqual(self.escanear(self.trabajador, "tablet-nueva").status_code, 200)
+        Trabajador.objects.get(pk=self.otro).delete()
+        self.assertEqual(self.escanear(self.otro, "tablet-nueva").status_code, 404)
+
+    def test_ids_inexistentes_no_se_guardan_y_tope_lru(self):
+        for i in range(50):
+            self.assertEqual(self.escanear(10**6 + i).status_code, 404)
+        self.assertEqual(len(cache_autorizacion._local), 1)  # solo el dispositivo
+
+        with mock.patch.object(cache_autorizacion, "maximo", 2):
+            cache_autorizacion.proyectos_trabajador(self.trabajador)
+            cache_autorizacion.proyectos_trabajador(self.otro)
+            self.assertEqual(len(cache_autorizacion._local), 2)
+            self.assertNotIn(f"{cache_autorizacion.PREFIJO}:dispositivo:tablet-cache", cache_autorizacion._local)
+
+    def test_invalidacion_durante_una_carga(self):
+        # El trabajador sale del proyecto mientras otra petición lee sus
+        # proyectos: lo leído antes del cambio no debe quedar en la caché
+        for cache in (cache_autorizacion, CacheAutorizacion(alias="default", timeout=300)):
+            with self.subTest(backend=cache.alias):
+                cache.limpiar()
+                self.addCleanup(cache.limpiar)
+                trabajador = Trabajador.objects.get(pk=self.trabajador)
+                trabajador.proyectos.set([self.proyecto])
+                cargar = cache._cargar_trabajador
+
+                def cargar_y_quitar(trabajador_id):
+                    valor = cargar(trabajador_id)
+                    trabajador.proyectos.remove(self.proyecto)
+                    # La señal invalida cache_autorizacion; la otra instancia, a mano
+                    cache.invalidar_trabajadores([trabajador_id])
+                    return valor
+
+                with mock.patch.object(cache, "_cargar_trabajador", cargar_y_quitar):
+                    self.assertEqual(cache.proyectos_trabajador(self.trabajador), (self.proyecto.pk,))
+                self.assertEqual(cache.proyectos_trabajador(self.trabajador), ())
+
+
+class ImportacionTests(TestCase):
+    """Alta masiva desde un roster CSV: validación, duplicados y altas."""
+
+    CURP = "PERJ800101HDFRRN09"
+
+    def setUp(self):
+        self.proyecto = crear_proyecto("Obra importación")
+
+    def importar(self, filas):
+        texto = "nombre,apellido_paterno,apellido_materno,curp,nss,proyectos\n" + "".join(
+            ",".join(fila) + "\n" for fila in filas
+        )
+        roster = SimpleUploadedFile("roster.csv", texto.encode("utf-8"), content_type="text/csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post("/asistencia/importar-trabajadores/", {"roster": roster})
+        self.assertEqual(r.status_code, 200)
+        return r.json()
+
+    def test_validar_fila(self):
+        fila = {"nombre": "Juan", "apellido_paterno": "Pérez", "apellido_materno": "",
+                "curp": "perj800101hdfrrn0", "nss": "123-45", "proyectos": f"{self.proyecto.pk}, 999"}
+        errores = validar_fila(fila, {self.proyecto.pk})
+        self.assertEqual(errores, [
+            "apellido_materno es obligatorio.", "CURP inválida.", "NSS inválido (11 dígitos).",
+            "Proyecto 999 no existe.",
+        ])
+        self.assertEqual(fila["curp"], "PERJ800101HDFRRN0")
+        self.assertEqual(fila["proyectos"], {self.proyecto.pk})
+
+    def test_importar_con_error_y_duplicado(self):
+        Trabajador.objects.create(nombre="Ya", apellido_paterno="Existe", apellido_materno="X",
+                                  categoria="", telefono="", nss="99999999999")
+        resumen = self.importar([
+            ("Juan", "Pérez", "Rojas", self.CURP.lower(), "123 4567 8901", str(self.proyecto.pk)),
+            ("Mala", "Curp", "X", "NOESCURP", "", ""),
+            ("Otro", "Juan", "Igual", self.CURP, "", ""),          # CURP repetida en el roster
+            ("Ya", "Existe", "Otra vez", "", "99999999999", ""),   # NSS ya registrado
+        ])
+        self.assertEqual((resumen["creados"], resumen["errores"], resumen["duplicados"]), (1, 1, 2))
+        self.assertEqual([(d["fila"], d["estado"]) for d in resumen["detalle"]],
+                         [(3, "error"), (4, "duplicado"), (5, "duplicado")])
+
+        juan = Trabajador.objects.get(curp=self.CURP)
+        self.assertEqual((juan.nss, list(juan.proyectos.values_list("pk", flat=True))),
+                         ("12345678901", [self.proyecto.pk]))
+        self.assertEqual(juan.qr_proyecto, self.proyecto.pk)
+        self.assertEqual(indice_trabajadores.buscar("perez rojas")[0].id, juan.pk)
+
+        # Reimportar el mismo roster no crea a nadie más
+        resumen = self.importar([("Juan", "Pérez", "Rojas", self.CURP, "", "")])
+        self.assertEqual((resumen["creados"], resumen["duplicados"]), (0, 1))
+        self.assertEqual(Trabajador.objects.filter(curp=self.CURP).count(), 1)
+
+
+class PaginacionApiTests(TestCase):
+    """Paginación por cursor y ?fields= de los ModelViewSets."""
+
+    def setUp(self):
+        self.proyecto = crear_proyecto("Obra API")
+        self.otro = crear_proyecto("Otra obra API")
+        self.ids = crear_cuadrilla(self.proyecto, 5, prefijo="API")
+        crear_cuadrilla(self.otro, 2, prefijo="OTRA")
+
+    def test_cursor_recorre_sin_repetir(self):
+        url, vistos, paginas = f"/api/trabajadores/?proyecto={self.proyecto.pk}&page_size=2", [], 0
+        while url:
+            datos = self.client.get(url).json()
+            self.assertLessEqual(len(datos["results"]), 2)
+            self.assertNotIn("count", datos)
+            vistos += [t["id"] for t in datos["results"]]
+            url, paginas = datos["next"], paginas + 1
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, sorted(self.ids, reverse=True))
+
+    def test_tope_de_page_size(self):
+        with mock.patch.object(CursorPaginacion, "max_page_size", 3):
+            datos = self.client.get("/api/trabajadores/", {"page_size": 50}).json()
+        self.assertEqual(len(datos["results"]), 3)
+        self.assertIsNotNone(datos["next"])
+
+    def test_fields_recorta_respuesta_y_columnas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get("/api/trabajadores/", {"fields": "id, nombre,desconocido"}).json()
+        self.assertEqual({tuple(sorted(t)) for t in datos["results"]}, {("id", "nombre")})
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn("curp", consultas[0]["sql"])
+
+        # proyectos (M2M) solo se precarga si se pide
+        datos = self.client.get("/api/trabajadores/", {"fields": "id,proyectos", "proyecto": self.otro.pk}).json()
+        self.assertEqual([t["proyectos"] for t in datos["results"]], [[self.otro.pk]] * 2)
+
+
+class PlanDeConsultasTests(TestCase):
+    """
+    Ejecuta los endpoints de uso frecuente con un tope de consultas cada uno
+    (limite_consultas), captura sus SELECT y revisa el EXPLAIN QUERY PLAN de
+    cada uno: ninguno debe recorrer una tabla completa.
+    """
+    # Catálogos que se listan completos a propósito (selector de proyectos,
+    # tabla compilada de horarios)
+    TABLAS_PERMITIDAS = {"asistencia_proyecto", "asistencia_horario"}
+    RE_ESCANEO_COMPLETO = re.compile(r"^SCAN (\w+)$")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proyecto = crear_proyecto()
+        cls.trabajadores = crear_cuadrilla(cls.proyecto, 5)
+        cls.dispositivo = Dispositivo.objects.create(device_id="tablet-plan")
+        cls.dispositivo.proyectos.add(cls.proyecto)
+        hoy = date.today()
+        Asistencia.objects.bulk_create([
+            Asistencia(trabajador_id=t, proyecto=cls.proyecto, fecha=hoy - timedelta(days=d), presente=True)
+            for t in cls.trabajadores for d in range(1, 4)
+        ])
+        cls.usuario = User.objects.create_user("supervisor", password="x")
+
+    def setUp(self):
+        cache_autorizacion.limpiar()
+        olvidar_sesiones()
+        tabla_horarios.invalidar()
+
+    def planes(self, peticion, maximo):
+        with limite_consultas(maximo), CaptureQueriesContext(connection) as ctx:
+            resp = peticion()
+            if resp.streaming:
+                b"".join(resp.streaming_content)
+        self.assertLess(resp.status_code, 400)
+
+        planes = {}
+        for consulta in ctx.captured_queries:
+            sql = consulta["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                planes[sql] = [fila[-1] for fila in cursor.fetchall()]
+        self.assertTrue(planes)
+        return planes
+
+    def assertSinEscaneoCompleto(self, planes):
+        for sql, plan in planes.items():
+            for paso in plan:
+                m = self.RE_ESCANEO_COMPLETO.match(paso)
+                if m and m.group(1) not in self.TABLAS_PERMITIDAS:
+                    self.fail(f"Escaneo completo de {m.group(1)}:\n{sql}\n" + "\n".join(plan))
+
+    def assertUsaIndice(self, planes, indice):
+        self.assertTrue(
+            any(indice in paso for plan in planes.values() for paso in plan),
+            f"Ninguna consulta usa {indice}",
+        )
+
+    def test_exportar_excel(self):
+        hoy = date.today()
+        planes = self.planes(lambda: self.client.get("/asistencia/exportar/", {
+            "project_id": self.proyecto.pk,
+            "start_date": (hoy - timedelta(days=30)).isoformat(),
+            "end_date": hoy.isoformat(),
+        }), maximo=3)
+        self.assertSinEscaneoCompleto(planes)
+        self.assertUsaIndice(planes, "asistencia_asistenciamensual_proyecto_id_mes_trabajador_id")
+
+    def test_elegir_proyecto(self):
+        planes = self.planes(lambda: self.client.get(
+            "/asistencia/asistencia-elegir/", {"project_id": self.proyecto.pk}
+        ), maximo=5)
+        self.assertSinEscaneoCompleto(planes)
+
+    def test_vista_asistencia(self):
+        self.client.force_login(self.usuario)
+        planes = self.planes(lambda: self.client.get(f"/asistencia/vista/{self.proyecto.pk}/"), maximo=7)
+        self.assertSinEscaneoCompleto(planes)
+
+    def test_registrar_qr(self):
+        planes = self.planes(lambda: self.client.get(
+            f"/asistencia/registrar-qr/{self.trabajadores[0]}/", {"device_id": "tablet-plan"}
+        ), maximo=16)
+        self.assertSinEscaneoCompleto(planes)
+
+    def test_registrar_bulk(self):
+        planes = self.planes(lambda: self.client.post("/asistencia/registrar/", {
+            "project": self.proyecto.pk,
+            "date": date.today().isoformat(),
+            "asistencias": [{"trabajador": t, "presente": True} for t in self.trabajadores],
+        }, content_type="application/json"), maximo=16)
+        self.assertSinEscaneoCompleto(planes)
+
+    def test_sincronizar_escaneos(self):
+        ahora = date.today().isoformat() + "T07:00:00"
+        planes = self.planes(lambda: self.client.post("/asistencia/sincronizar-qr/", {
+            "device_id": "tablet-plan",
+            "escaneos": [
+                {"clave": f"plan-{t}", "trabajador": t, "timestamp": ahora} for t in self.trabajadores
+            ],
+        }, content_type="application/json"), maximo=21)
+        self.assertSinEscaneoCompleto(planes)
+
+    def test_resumen(self):
+        hoy = date.today()
+        planes = self.planes(lambda: self.client.get("/asistencia/resumen/", {
+            "project_id": self.proyecto.pk,
+            "start_date": (hoy - timedelta(days=30)).isoformat(),
+            "end_date": hoy.isoformat(),
+        }), maximo=3)
+        self.assertSinEscaneoCompleto(planes)
+
+    def test_reporte_nomina(self):
+        hoy = date.today()
+        for formato in ("csv", "ndjson"):
+            planes = self.planes(lambda: self.client.get("/asistencia/reporte-nomina/", {
+                "start_date": (hoy - timedelta(days=15)).isoformat(),
+                "end_date": hoy.isoformat(),
+                "formato": formato,
+            }), maximo=5)
+            self.assertSinEscaneoCompleto(planes)
+
+    def test_busqueda_por_curp_y_nss(self):
+        for campo, indice in (("curp", "trab_curp_idx"), ("nss", "trab_nss_idx")):
+            qs = Trabajador.objects.filter(**{campo: "X"})
+            planes = {str(qs.query): self._explicar(qs)}
+            self.assertSinEscaneoCompleto(planes)
+            self.assertUsaIndice(planes, indice)
+
+    def _explicar(self, qs):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [fila[-1] for fila in cursor.fetchall()]
+
+
+class ExportacionExcelTests(TestCase):
+    """Contenido de la hoja exportada: presente, falta, sin registro y el tipo de retraso."""
+
+    def test_celdas_de_la_rejilla(self):
+        import openpyxl
+
+        proyecto = crear_proyecto("Obra Excel")
+        ana, beto = (
+            Trabajador.objects.create(nombre=n, apellido_paterno=p, apellido_materno="M",
+                                      categoria="Ayudante", telefono="0")
+            for n, p in (("Ana", "Alba"), ("Beto", "Bravo"))
+        )
+        proyecto.trabajadores.add(ana, beto)
+        lunes = date(2024, 3, 4)
+        for trabajador, dia, presente, tipo in (
+            (ana, 0, True, "puntual"), (ana, 1, True, "retardo_leve"), (ana, 2, False, None),
+            (beto, 0, True, "retardo_alto"), (beto, 1, True, None),
+        ):
+            Asistencia.objects.create(trabajador=trabajador, proyecto=proyecto, fecha=lunes + timedelta(days=dia),
+                                      presente=presente, tipo_retraso=tipo)
+
+        resp = self.client.get("/asistencia/exportar/", {
+            "project_id": proyecto.pk, "start_date": "2024-03-04", "end_date": "2024-03-06",
+        })
+        self.assertEqual(resp.status_code, 200)
+        hoja = openpyxl.load_workbook(BytesIO(b"".join(resp.streaming_content)))["Asistencia"]
+        self.assertEqual(
+            [[c if c is not None else "" for c in fila] for fila in hoja.iter_rows(values_only=True)],
+            [
+                ["Nombre Completo", "Categoría", "L 04/03/24", "M 05/03/24", "MX 06/03/24"],
+                ["Ana Alba M", "Ayudante", "Puntual", "Retardo leve", "X"],
+                ["Beto Bravo M", "Ayudante", "Retardo alto", "✓", ""],
+            ],
+        )
+
+
+class ReporteNominaTests(TestCase):
+    """Filas, columnas y totales del reporte de nómina en CSV y NDJSON."""
+
+    def setUp(self):
+        self.obra, self.otra = crear_proyecto("Obra Nómina"), crear_proyecto("Otra Nómina")
+        self.ana, self.beto, self.caro = (
+            Trabajador.objects.create(nombre=n, apellido_paterno=p, apellido_materno="M",
+                                      categoria=c, telefono="0", curp=curp)
+            for n, p, c, curp in (("Ana", "Alba", "Ayudante", "CURPANA"), ("Beto", "Bravo", "Oficial", None),
+                                  ("Caro", "Cruz", "Peón", None))
+        )
+        self.ana.proyectos.add(self.obra)
+        self.beto.proyectos.add(self.obra)
+        self.caro.proyectos.add(self.otra)
+        lunes = date(2024, 3, 4)
+        for trabajador, proyecto, dia, presente, tipo in (
+            (self.ana, self.obra, 0, True, "puntual"), (self.ana, self.obra, 1, True, "retardo_leve"),
+            (self.beto, self.obra, 0, False, None), (self.beto, self.obra, 1, True, "retardo_alto"),
+            (self.caro, self.otra, 0, True, None),
+        ):
+            Asistencia.objects.create(trabajador=trabajador, proyecto=proyecto, fecha=lunes + timedelta(days=dia),
+                                      presente=presente, tipo_retraso=tipo)
+
+    def reporte(self, formato, **filtros):
+        resp = self.client.get("/asistencia/reporte-nomina/", {
+            "start_date": "2024-03-04", "end_date": "2024-03-05", "formato": formato, **filtros,
+        })
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content).decode("utf-8")
+
+    def test_csv(self):
+        filas = list(csv.reader(StringIO(self.reporte("csv"))))
+        self.assertEqual(filas[0], [
+            "proyecto", "proyecto_nombre", "trabajador", "nombre", "apellido_paterno", "apellido_materno",
+            "curp", "nss", "categoria", "2024-03-04", "2024-03-05",
+            "presentes", "puntuales", "retardos_leves", "retardos_altos", "ausentes",
+        ])
+        obra, otra = str(self.obra.pk), str(self.otra.pk)
+        self.assertEqual(filas[1:], [
+            [obra, "Obra Nómina", str(self.ana.pk), "Ana", "Alba", "M", "CURPANA", "", "Ayudante",
+             "puntual", "retardo_leve", "2", "1", "1", "0", "0"],
+            [obra, "Obra Nómina", str(self.beto.pk), "Beto", "Bravo", "M", "", "", "Oficial",
+             "ausente", "retardo_alto", "1", "0", "0", "1", "1"],
+            [otra, "Otra Nómina", str(self.caro.pk), "Caro", "Cruz", "M", "", "", "Peón",
+             "presente", "", "1", "0", "0", "0", "0"],
+        ])
+
+    def test_ndjson_de_un_proyecto(self):
+        registros = [json.loads(linea) for linea in self.reporte("ndjson", project_id=self.otra.pk).splitlines()]
+        self.assertEqual(registros, [{
+            "proyecto": self.otra.pk, "proyecto_nombre": "Otra Nómina", "trabajador": self.caro.pk,
+            "nombre": "Caro", "apellido_paterno": "Cruz", "apellido_materno": "M",
+            "curp": "", "nss": "", "categoria": "Peón",
+            "dias": {"2024-03-04": "presente"},
+            "totales": {"presentes": 1, "puntuales": 0, "retardos_leves": 0, "retardos_altos": 0, "ausentes": 0},
+        }])
+
+
+class RosterCondicionalTests(TestCase):
+    """Las páginas de asistencia responden 304 mientras la plantilla no cambia."""
+
+    def setUp(self):
+        self.proyecto = crear_proyecto("Obra roster")
+        crear_cuadrilla(self.proyecto, 3, prefijo="ROS")
+        self.client.force_login(User.objects.create_user("roster", password="x"))
+
+    def test_304_hasta_que_cambia_la_plantilla(self):
+        for url in (f"/asistencia/vista/{self.proyecto.pk}/",
+                    f"/asistencia/asistencia-elegir/?project_id={self.proyecto.pk}"):
+            with self.subTest(url=url):
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200)
+                etag = r["ETag"]
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+                nuevo = Trabajador.objects.create(nombre="Nuevo", apellido_paterno="Ingreso",
+                                                  apellido_materno=url[-3:], categoria="", telefono="")
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                nuevo.proyectos.add(self.proyecto)
+                r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(r.status_code, 200)
+                self.assertNotEqual(r["ETag"], etag)
+                self.assertContains(r, f"Ingreso {url[-3:]}")
+
+
+class HorariosTests(TestCase):
+    """Clasificación contra el turno programado y reclasificación del histórico."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proyecto = crear_proyecto()
+        cls.trabajadores = crear_cuadrilla(cls.proyecto, 3)
+        cls.dispositivo = Dispositivo.objects.create(device_id="tablet-horario")
+        cls.dispositivo.proyectos.add(cls.proyecto)
+        cls.lunes = date(2026, 1, 5)
+
+    def setUp(self):
+        olvidar_sesiones()
+        tabla_horarios.invalidar()
+
+    def escaneo(self, trabajador, hora, minuto):
+        momento = timezone.make_aware(datetime.combine(self.lunes, time(hora, minuto)))
+        return registrar_escaneo(trabajador, self.dispositivo.pk, self.proyecto.pk, momento)
+
+    def test_sin_horario_usa_primer_escaneo_del_dia(self):
+        self.assertEqual(self.escaneo(self.trabajadores[0], 9, 0).tipo, "puntual")
+        self.assertEqual(self.escaneo(self.trabajadores[1], 9, 30).tipo, "retardo_leve")
+        self.assertIsNone(self.escaneo(self.trabajadores[2], 10, 5).tipo)
+
+    def test_turno_mas_cercano_y_dia_especifico(self):
+        Horario.objects.create(proyecto=self.proyecto, turno="matutino", hora_entrada=time(7, 0))
+        Horario.objects.create(proyecto=self.proyecto, turno="nocturno", hora_entrada=time(19, 0),
+                               minutos_puntual=5, minutos_retardo_leve=15, minutos_maximos=30)
+        self.assertEqual(self.escaneo(self.trabajadores[0], 6, 50).tipo, "puntual")
+        self.assertEqual(self.escaneo(self.trabajadores[1], 19, 20).tipo, "retardo_alto")
+        self.assertIsNone(self.escaneo(self.trabajadores[2], 12, 0).tipo)
+
+        # Un horario para el lunes reemplaza a los generales ese día
+        Horario.objects.create(proyecto=self.proyecto, turno="matutino", dia_semana=0, hora_entrada=time(8, 0))
+        self.assertEqual(self.escaneo(self.trabajadores[2], 8, 5).tipo, "puntual")
+
+    def test_reclasificar_tras_cambio_de_horario(self):
+        Horario.objects.create(proyecto=self.proyecto, hora_entrada=time(7, 0))
+        self.escaneo(self.trabajadores[0], 7, 0)
+        self.escaneo(self.trabajadores[1], 7, 30)
+        Horario.objects.filter(proyecto=self.proyecto).update(hora_entrada=time(7, 30))
+
+        totales = reclasificar(self.lunes, self.lunes)
+        self.assertEqual((totales["revisadas"], totales["cambiadas"]), (2, 1))
+        self.assertEqual(
+            set(Asistencia.objects.values_list("trabajador_id", "tipo_retraso")),
+            {(self.trabajadores[0], "puntual"), (self.trabajadores[1], "puntual")},
+        )
+        # Un lote de 0 días nunca avanzaría
+        with self.assertRaises(ValueError):
+            reclasificar(self.lunes, self.lunes, dias_por_lote=0)
+        with self.assertRaisesMessage(CommandError, "--dias-por-lote"):
+            call_command("reclasificar_asistencia", dias_por_lote=0, stdout=StringIO())
+
+    def test_reclasificar_sin_horario_usa_la_sesion_del_dispositivo(self):
+        Horario.objects.create(proyecto=self.proyecto, hora_entrada=time(9, 0))
+        otra_tablet = Dispositivo.objects.create(device_id="tablet-horario-2")
+        otra_tablet.proyectos.add(self.proyecto)
+        self.escaneo(self.trabajadores[0], 7, 0)  # abre la sesión de la primera tablet a las 7:00
+        momento = timezone.make_aware(datetime.combine(self.lunes, time(9, 25)))
+        self.assertEqual(
+            registrar_escaneo(self.trabajadores[1], otra_tablet.pk, self.proyecto.pk, momento).tipo, "retardo_leve"
+        )
+        Asistencia.objects.create(trabajador_id=self.trabajadores[2], proyecto=self.proyecto, fecha=self.lunes,
+                                  presente=True, tipo_retraso="retardo_alto", hora_entrada=momento)
+        Horario.objects.filter(proyecto=self.proyecto).delete()
+
+        # Sin horario, 9:25 es la hora_base de su tablet (no las 7:00 de la otra);
+        # el registro sin dispositivo no tiene sesión y no se toca
+        totales = reclasificar(self.lunes, self.lunes)
+        self.assertEqual(
+            [totales[c] for c in ("revisadas", "cambiadas", "excedidas", "sin_sesion")], [3, 1, 0, 1]
+        )
+        self.assertEqual(
+            dict(Asistencia.objects.values_list("trabajador_id", "tipo_retraso")),
+            {self.trabajadores[0]: "puntual", self.trabajadores[1]: "puntual", self.trabajadores[2]: "retardo_alto"},
+        )
+
+
+class EstaticosTests(SimpleTestCase):
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.nombre = "app.0123456789ab.js"
+        self.ruta = os.path.join(carpeta.name, self.nombre)
+        with open(self.ruta, "w") as f:
+            f.write("console.log('tasal');\n" * 100)
+        self.assertTrue(comprimir(self.ruta))
+        siguiente = lambda environ, start_response: start_response("404 Not Found", []) or [b""]
+        self.app = ArchivosEstaticos(siguiente, [
+            ("/static/", carpeta.name, lambda r: bool(RE_HASH_ESTATICO.search(r))),
+        ])
+
+    def pedir(self, ruta, **environ):
+        respuesta = {}
+        def start_response(estado, encabezados):
+            respuesta.update(estado=estado, encabezados=dict(encabezados))
+        cuerpo = self.app({"REQUEST_METHOD": "GET", "PATH_INFO": ruta, **environ}, start_response)
+        return respuesta["estado"], respuesta["encabezados"], b"".join(cuerpo)
+
+    def test_gzip_cache_inmutable_y_304(self):
+        estado, encabezados, cuerpo = self.pedir(f"/static/{self.nombre}", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(estado, "200 OK")
+        self.assertEqual(encabezados["Content-Encoding"], "gzip")
+        self.assertIn("immutable", encabezados["Cache-Control"])
+        self.assertLess(len(cuerpo), os.path.getsize(self.ruta))
+
+        estado, _, _ = self.pedir(f"/static/{self.nombre}", HTTP_ACCEPT_ENCODING="gzip",
+                                  HTTP_IF_NONE_MATCH=encabezados["ETag"])
+        self.assertEqual(estado, "304 Not Modified")
+
+        estado, encabezados, _ = self.pedir(f"/static/{self.nombre}")
+        self.assertNotIn("Content-Encoding", encabezados)
+        self.assertEqual(self.pedir("/static/../settings.py")[0], "404 Not Found")
+
+
+class FotosTests(TestCase):
+    """Fotos direccionadas por contenido: deduplicación, variantes, migración y caché."""
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.media = carpeta.name
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    @staticmethod
+    def imagen(formato, color=(200, 120, 40)):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new("RGB", (30, 40), color).save(buffer, format=formato)
+        return buffer.getvalue()
+
+    def archivos(self, carpeta="trabajadores"):
+        ruta = os.path.join(self.media, carpeta)
+        return sorted(os.listdir(ruta)) if os.path.isdir(ruta) else []
+
+    def alta(self, nombre, datos):
+        self.client.post("/asistencia/alta-trabajador/", {
+            "nombre": nombre, "apellido_paterno": "Foto", "apellido_materno": "M", "categoria": "Ayudante",
+            "telefono": "0", "fotografia": "data:image/png;base64," + base64.b64encode(datos).decode(),
+        })
+        return Trabajador.objects.get(nombre=nombre)
+
+    def test_misma_foto_un_solo_juego_de_variantes(self):
+        # Los mismos píxeles en PNG y en BMP
+        uno, dos = self.alta("Uno", self.imagen("PNG")), self.alta("Dos", self.imagen("BMP"))
+        self.assertRegex(uno.fotografia.name, fotos.RE_FOTO)
+        self.assertEqual(uno.fotografia.name, dos.fotografia.name)
+        self.assertEqual(
+            [f"trabajadores/{f}" for f in self.archivos()],
+            sorted(fotos.archivos_de(uno.fotografia.name)),
+        )
+        self.assertEqual(len(self.archivos()), len(fotos.VARIANTES))
+        huella = fotos.RE_FOTO.match(uno.fotografia.name)["huella"]
+        self.assertEqual(variante(uno.fotografia, "miniatura"), f"/media/trabajadores/{huella}_miniatura.webp")
+
+    def test_migrar_media(self):
+        carpeta = os.path.join(self.media, "trabajadores")
+        os.makedirs(carpeta)
+        for nombre, datos in (("legado.png", self.imagen("PNG")), ("roto.png", b"no es una imagen"),
+                              ("huerfano.png", self.imagen("PNG", (0, 0, 0)))):
+            with open(os.path.join(carpeta, nombre), "wb") as f:
+                f.write(datos)
+        legado, roto = (
+            Trabajador.objects.create(nombre=n, apellido_paterno="Foto", apellido_materno="M",
+                                      categoria="Ayudante", telefono="0", fotografia=f"trabajadores/{n}.png")
+            for n in ("legado", "roto")
+        )
+
+        errores = StringIO()
+        call_command("migrar_media", procesos=1, purgar=True, stdout=StringIO(), stderr=errores)
+        self.assertIn("trabajadores/roto.png", errores.getvalue())
+        nuevo = Trabajador.objects.get(pk=legado.pk).fotografia.name
+        self.assertRegex(nuevo, fotos.RE_FOTO)
+        self.assertEqual(Trabajador.objects.get(pk=roto.pk).fotografia.name, "trabajadores/roto.png")
+        # El original convertido y el huérfano se borran; la foto que falló se queda
+        self.assertEqual(
+            [f"trabajadores/{f}" for f in self.archivos()],
+            sorted(fotos.archivos_de(nuevo) + ["trabajadores/roto.png"]),
+        )
+
+    def test_cache_control_de_media(self):
+        huella = "0123456789abcdef"
+        for nombre in (f"{huella}.webp", f"{huella}_miniatura.webp", "legado.png"):
+            os.makedirs(os.path.join(self.media, "trabajadores"), exist_ok=True)
+            with open(os.path.join(self.media, "trabajadores", nombre), "wb") as f:
+                f.write(b"x")
+        fabrica = RequestFactory()
+        for ruta, esperado in ((f"trabajadores/{huella}.webp", CACHE_INMUTABLE),
+                               (f"trabajadores/{huella}_miniatura.webp", CACHE_INMUTABLE),
+                               ("trabajadores/legado.png", "no-cache")):
+            resp = servir_media(fabrica.get(f"/media/{ruta}"), ruta)
+            self.assertEqual(resp["Cache-Control"], esperado, ruta)
+
+
+class ArranqueTests(TestCase):
+    """En un intérprete nuevo, como arranca el ejecutable."""
+    PRESUPUESTO_S = 5.0
+
+    def python(self, *argumentos, **entorno):
+        return subprocess.run(
+            [sys.executable, *argumentos], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=60,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "gestion_obra.settings",
+                 "TASAL_BASE_DATOS": str(connection.settings_dict["NAME"]), **entorno},
+        )
+
+    def test_dependencias_pesadas_diferidas(self):
+        proceso = self.python("-c", (
+            "import sys, django; django.setup(); import gestion_obra.wsgi, gestion_obra.urls; "
+            "print(sorted({'openpyxl', 'PIL', 'qrcode'} & set(sys.modules)))"
+        ))
+        self.assertEqual(proceso.stdout.strip(), "[]", proceso.stderr)
+
+    def test_arranque_hasta_primera_pagina(self):
+        # Sin producción para no correr collectstatic sobre el árbol
+        proceso = self.python(
+            "main.py", "--medir", "--servidor", "--host", "127.0.0.1", "--puerto", "0", "--sin-migrar",
+            TASAL_PRODUCCION="0", TASAL_PRESUPUESTO_ARRANQUE=str(self.PRESUPUESTO_S),
+        )
+        self.assertEqual(proceso.returncode, 0, proceso.stderr)
+        self.assertIn("primera_pagina", proceso.stderr)
+
+    def test_produccion_genera_y_conserva_secret_key(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            codigo = "from django.conf import settings as s; print(s.SECRET_KEY, s.ALLOWED_HOSTS)"
+            entorno = {"TASAL_PRODUCCION": "1", "TASAL_BASE_DATOS": os.path.join(carpeta, "db.sqlite3")}
+            entorno_sin = {**os.environ, **entorno}
+            entorno_sin.pop("DJANGO_SECRET_KEY", None)
+            entorno_sin.pop("DJANGO_ALLOWED_HOSTS", None)
+            salidas = [
+                subprocess.run([sys.executable, "-c", codigo], cwd=settings.BASE_DIR, env=entorno_sin,
+                               capture_output=True, text=True, timeout=60)
+                for _ in range(2)
+            ]
+            clave, hosts = salidas[0].stdout.split(" ", 1)
+            self.assertEqual(salidas[1].stdout, salidas[0].stdout, salidas[1].stderr)
+            self.assertNotIn("insecure", clave)
+            with open(os.path.join(carpeta, "secret_key")) as archivo:
+                self.assertEqual(archivo.read(), clave)
+            self.assertEqual(os.stat(os.path.join(carpeta, "secret_key")).st_mode & 0o777, 0o600)
+            self.assertEqual(hosts.strip(), "['localhost', '127.0.0.1', '[::1]']")
+
+    def test_produccion_exige_claves_qr(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            entorno = {**os.environ, "TASAL_PRODUCCION": "1", "DJANGO_SECRET_KEY": "x" * 50,
+                       "TASAL_BASE_DATOS": os.path.join(carpeta, "db.sqlite3")}
+            entorno.pop("TASAL_QR_CLAVES", None)
+            entorno.pop("TASAL_QR_CLAVE_LOCAL", None)
+
+            def correr(codigo, **extra):
+                return subprocess.run([sys.executable, "-c", codigo], cwd=settings.BASE_DIR,
+                                      env={**entorno, **extra}, capture_output=True, text=True, timeout=60)
+
+            # Cargar settings y las apps (manage.py check, collectstatic…) no escribe la clave
+            self.assertEqual(correr("import django; django.setup()").returncode, 0)
+            servir = correr("import gestion_obra.wsgi")
+            self.assertNotEqual(servir.returncode, 0)
+            self.assertIn("TASAL_QR_CLAVES", servir.stderr)
+            self.assertFalse(os.path.exists(os.path.join(carpeta, "qr_clave")))
+            # El ejecutable de escritorio (main.py) pide la clave local
+            local = correr("import gestion_obra.wsgi", TASAL_QR_CLAVE_LOCAL="1")
+            self.assertEqual(local.returncode, 0, local.stderr)
+            self.assertTrue(os.path.exists(os.path.join(carpeta, "qr_clave")))
+
+
+class TableroTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.proyecto = crear_proyecto()
+        cls.trabajadores = crear_cuadrilla(cls.proyecto, 3)
+        cls.dispositivo = Dispositivo.objects.create(device_id="tablet-tablero")
+        cls.usuario = User.objects.create_user("tablero", password="x")
+
+    @staticmethod
+    def cerrar(resp):
+        """Cierra un flujo como el servidor, sin que request_finished cierre la conexión de la prueba."""
+        with mock.patch.object(connection, "close_if_unusable_or_obsolete"):
+            resp.close()
+
+    def suscribir(self, proyecto_id):
+        suscripcion = Suscripcion(proyecto_id)
+        canal().suscribir(suscripcion)
+        self.addCleanup(canal().cancelar, suscripcion)
+        return suscripcion
+
+    def test_escrituras_publican_un_evento_por_proyecto_al_confirmar(self):
+        suscripcion = self.suscribir(self.proyecto.pk)
+        otro = self.suscribir(self.proyecto.pk + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_escaneo(self.trabajadores[0], self.dispositivo.pk, self.proyecto.pk, timezone.now())
+            self.assertEqual(suscripcion.esperar(timeout=0), [])  # aún sin commit
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_asistencias_bulk(self.proyecto, date.today(), [
+                {"trabajador": t, "presente": True} for t in self.trabajadores
+            ])
+
+        eventos = suscripcion.esperar(timeout=0)
+        self.assertEqual(len(eventos), 2)
+        self.assertIn(f'"trabajador":{self.trabajadores[0]},"presente":true,"tipo_retraso":"puntual"', eventos[0])
+        self.assertEqual(eventos[1].count('"trabajador"'), 3)
+        self.assertNotIn("tipo_retraso", eventos[1])  # el formulario no lo toca
+        self.assertEqual(otro.esperar(timeout=0), [])
+
+    def test_flujo_sse_empieza_con_el_estado_del_dia(self):
+        Asistencia.objects.create(trabajador_id=self.trabajadores[1], proyecto=self.proyecto,
+                                  fecha=timezone.localdate(), presente=True)
+        self.client.force_login(self.usuario)
+        resp = self.client.get(f"/asistencia/tablero/{self.proyecto.pk}/eventos/")
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        flujo = iter(resp.streaming_content)
+        primero = next(flujo).decode()
+        self.assertIn("event: estado", primero)
+        self.assertIn(f'"trabajador":{self.trabajadores[1]}', primero)
+        self.assertTrue(canal().hay_suscriptores(self.proyecto.pk))
+        self.cerrar(resp)
+        self.assertFalse(canal().hay_suscriptores(self.proyecto.pk))
+
+    @override_settings(ASISTENCIA_TABLERO_FLUJOS_WSGI=1)
+    def test_cupo_de_flujos_wsgi(self):
+        self.client.force_login(self.usuario)
+        url = f"/asistencia/tablero/{self.proyecto.pk}/eventos/"
+        ocupado = flujos_wsgi.abrir(self.proyecto.pk)
+        lleno = self.client.get(url)
+        self.assertEqual((lleno.status_code, lleno["Retry-After"]), (503, "30"))
+        self.assertEqual(lleno.content, b"retry: 30000\n\n")
+
+        ocupado.close()  # cerrado sin leer también devuelve el lugar
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("event: estado", next(iter(resp.streaming_content)).decode())
+        self.assertEqual(flujos_wsgi.abiertos, 1)
+        self.cerrar(resp)
+        self.assertEqual(flujos_wsgi.abiertos, 0)
+
+
+class SincronizacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.proyecto = crear_proyecto()
+        cls.trabajadores = crear_cuadrilla(cls.proyecto, 3)
+        cls.dispositivo = Dispositivo.objects.create(device_id="tablet-sync")
+        cls.dispositivo.proyectos.add(cls.proyecto)
+
+    def sync(self, token=None):
+        resp = self.client.get("/asistencia/sync/", {} if token is None else {"token": token})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_completo_y_luego_solo_los_cambios(self):
+        completo = self.sync()
+        self.assertTrue(completo["completo"])
+        self.assertEqual(len(completo["trabajadores"]), 3)
+        self.assertEqual(completo["dispositivos"][0]["proyectos"], [self.proyecto.pk])
+
+        registrar_escaneo(self.trabajadores[0], self.dispositivo.pk, self.proyecto.pk, timezone.now())
+        Trabajador.objects.filter(pk=self.trabajadores[1]).delete()
+        delta = self.sync(completo["token"])
+        self.assertFalse(delta["completo"])
+        self.assertEqual(delta["trabajadores"], [])
+        self.assertEqual(delta["trabajadores_baja"], [self.trabajadores[1]])
+        self.assertEqual(delta["proyectos"], [])
+        (dia,) = delta["asistencias"]
+        self.assertEqual([f["trabajador"] for f in dia["filas"]], [self.trabajadores[0]])
+
+        sin_cambios = self.sync(delta["token"])
+        self.assertEqual((sin_cambios["token"], sin_cambios["asistencias"]), (delta["token"], []))
+
+    def test_gzip_y_token_invalido(self):
+        resp = self.client.get("/asistencia/sync/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(self.client.get("/asistencia/sync/", {"token": "x"}).status_code, 400)
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        metricas.reiniciar()
+
+    def test_metrics_por_vista(self):
+        crear_cuadrilla(crear_proyecto(), 2)
+        for _ in range(3):
+            self.client.get("/asistencia/sync/")
+        self.client.get("/no-existe/")
+
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        vistas = leer_prometheus(resp.content.decode())
+        sync = vistas["sync"]
+        self.assertEqual(sync["tasal_peticion_segundos_count"], 3)
+        self.assertEqual(sync["cubetas"][-1], (float("inf"), 3))
+        self.assertGreater(sync["tasal_consultas_total"], 0)
+        self.assertIn("<sin_ruta>", vistas)
+
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.9").status_code, 403)
+
+    def test_limite_consultas_lista_las_repetidas(self):
+        ids = crear_cuadrilla(crear_proyecto(), 3)
+        with self.assertRaisesRegex(AssertionError, r"4 consultas, máximo 2\. Repetidas:\n  3× SELECT"):
+            with limite_consultas(2):
+                Proyecto.objects.count()
+                for pk in ids:
+                    Trabajador.objects.get(pk=pk)
+
+
+class BenchmarkTests(TestCase):
+    def test_datos_sinteticos_y_escenarios(self):
+        datos = poblar(proyectos=2, trabajadores=10, dias=8, dispositivos=1, semilla=3)
+        self.assertEqual(Trabajador.objects.count(), 10)
+        self.assertEqual(Asistencia.objects.count(), datos.asistencias)
+        self.assertEqual(SesionAsistencia.objects.filter(fecha=datos.ultimo_dia).count(),
+                         0 if datos.ultimo_dia.weekday() == 6 else 2)
+
+        for nombre in ("registrar-qr", "registrar", "api-asistencias"):
+            r = correr_escenario(ESCENARIOS[nombre], datos, peticiones=4, calentamiento=1)
+            self.assertGreater(r["consultas"], 0)
+            self.assertLessEqual(r["p50_ms"], r["p95_ms"])
+
+    def test_comparar_con_linea_base(self):
+        base = {"exportar": {"p95_ms": 100.0, "consultas": 3}}
+        self.assertEqual(comparar({"exportar": {"p95_ms": 120.0, "consultas": 3}}, base, 0.25), [])
+        regresiones = comparar({"exportar": {"p95_ms": 130.0, "consultas": 4}}, base, 0.25)
+        self.assertEqual(len(regresiones), 2)
+        # En endpoints de pocos ms se tolera un mínimo absoluto
+        self.assertEqual(comparar({"api": {"p95_ms": 3.5, "consultas": 1}},
+                                  {"api": {"p95_ms": 2.7, "consultas": 1}}, 0.25), [])
+
+
+class CompactoTests(TestCase):
+    """La asistencia compacta sigue a las escrituras y ambos lectores coinciden con las filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = poblar(proyectos=1, trabajadores=6, dias=45, dispositivos=1, semilla=5)
+        cls.proyecto = cls.datos.proyectos[0]
+
+    def esperado(self, desde, hasta):
+        celdas, presentes = {}, {}
+        for t, f, p, tipo in Asistencia.objects.filter(
+            proyecto_id=self.proyecto, fecha__range=(desde, hasta)
+        ).values_list("trabajador_id", "fecha", "presente", "tipo_retraso"):
+            celdas[(t, f)] = compacto.CODIGOS.index((p, tipo if p else None))
+            presentes[t] = presentes.get(t, 0) + p
+        return celdas, presentes
+
+    def assertCoincide(self, desde, hasta):
+        celdas, presentes = self.esperado(desde, hasta)
+        for numpy in (False, None):  # sin NumPy y, si está instalado, con NumPy
+            with mock.patch.object(compacto, "_np", numpy):
+                r = compacto.rejilla(self.proyecto, desde, hasta)
+                obtenido = {
+                    (t, f): c for t in r.trabajadores for f, c in zip(r.fechas, r.fila(t)) if c
+                }
+                self.assertEqual(obtenido, celdas)
+                self.assertEqual(compacto.dias_presentes(self.proyecto, desde, hasta), presentes)
+
+    def test_lectores_y_mantenimiento(self):
+        desde, hasta = self.datos.primer_dia + timedelta(days=3), self.datos.ultimo_dia
+        self.assertCoincide(desde, hasta)
+
+        trabajadores = self.datos.trabajadores[self.proyecto]
+        registrar_asistencias_bulk(Proyecto(pk=self.proyecto), hasta, [
+            {"trabajador": t, "presente": False} for t in trabajadores[:3]
+        ])
+        movida, borrada = Asistencia.objects.filter(
+            proyecto_id=self.proyecto, fecha__gte=desde).order_by("fecha", "-trabajador_id")[:2]
+        movida.fecha = hasta + timedelta(days=1)  # cambia de día (y quizá de mes)
+        movida.save()
+        borrada.delete()
+        self.assertCoincide(desde, hasta + timedelta(days=1))
+
+        conteos = {
+            (m.trabajador_id, m.mes): compacto.conteos(m.registros, m.presentes, m.tipos)
+            for m in AsistenciaMensual.objects.all()
+        }
+        self.assertEqual(conteos, {
+            (r["trabajador_id"], r["mes"]): {c: r[c] for c in CAMPOS_CONTEO}
+            for r in ResumenMensualTrabajador.objects.values("trabajador_id", "mes", *CAMPOS_CONTEO)
+        })
+
+
+class RellenoMigracionesTests(TestCase):
+    """Las migraciones de datos llenan las tablas derivadas con las asistencias previas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        poblar(proyectos=2, trabajadores=4, dias=40, dispositivos=1, semilla=9)
+
+    @staticmethod
+    def migracion(nombre):
+        return importlib.import_module(f"asistencia.migrations.{nombre}")
+
+    @staticmethod
+    def filas(modelo, *llave):
+        return sorted(modelo.objects.values_list(*llave, *CAMPOS_CONTEO))
+
+    def test_rellenar_resumenes(self):
+        diarios = self.filas(ResumenDiarioProyecto, "proyecto_id", "fecha")
+        mensuales = self.filas(ResumenMensualTrabajador, "trabajador_id", "proyecto_id", "mes")
+        ResumenDiarioProyecto.objects.all().delete()
+        ResumenMensualTrabajador.objects.exclude(pk=ResumenMensualTrabajador.objects.first().pk).delete()
+
+        self.migracion("0014_rellenar_resumenes").rellenar_resumenes(django_apps, connection.schema_editor())
+        self.assertEqual(self.filas(ResumenDiarioProyecto, "proyecto_id", "fecha"), diarios)
+        self.assertEqual(self.filas(ResumenMensualTrabajador, "trabajador_id", "proyecto_id", "mes"), mensuales)
+
+    def test_rellenar_asistencia_mensual(self):
+        columnas = ("trabajador_id", "proyecto_id", "mes", "registros", "presentes", "tipos")
+        compactos = sorted(AsistenciaMensual.objects.values_list(*columnas))
+        AsistenciaMensual.objects.filter(mes=AsistenciaMensual.objects.order_by("-mes")[0].mes).delete()
+
+        self.migracion("0015_rellenar_asistencia_mensual").rellenar_asistencia_mensual(
+            django_apps, connection.schema_editor())
+        self.assertEqual(sorted(AsistenciaMensual.objects.values_list(*columnas)), compactos)
+
+
+class ArchivoTests(TestCase):
+    """Archivar meses cerrados no cambia lo que leen resúmenes y nómina; restaurar es exacto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = poblar(proyectos=1, trabajadores=5, dias=100, dispositivos=1, semilla=7)
+        cls.proyecto = cls.datos.proyectos[0]
+
+    def filas(self):
+        return (
+            list(Asistencia.objects.order_by("pk").values_list()),
+            list(SesionAsistencia.objects.order_by("pk").values_list()),
+        )
+
+    def resumenes(self):
+        # Sin ids: reconstruir_resumenes vuelve a crear las filas de los meses vivos
+        return [
+            [{k: v for k, v in fila.items() if k != "id"} for fila in qs.values()]
+            for qs in (
+                ResumenDiarioProyecto.objects.order_by("proyecto", "fecha"),
+                ResumenMensualTrabajador.objects.order_by("trabajador", "mes"),
+                AsistenciaMensual.objects.order_by("trabajador", "mes"),
+            )
+        ]
+
+    def test_archivar_y_restaurar(self):
+        desde, hasta = self.datos.primer_dia, self.datos.ultimo_dia
+        filas, resumenes = self.filas(), self.resumenes()
+        nomina = list(registros_nomina(desde, hasta))
+
+        lotes = pendientes(2)
+        self.assertTrue(lotes)
+        for proyecto_id, mes in lotes:
+            archivar_mes(proyecto_id, mes)
+        self.assertFalse(Asistencia.objects.filter(fecha__lt=corte(2)).exists())
+        self.assertFalse(SesionAsistencia.objects.filter(fecha__lt=corte(2)).exists())
+
+        reconstruir_resumenes(desde, hasta)
+        self.assertEqual(self.resumenes(), resumenes)
+        self.assertEqual(list(registros_nomina(desde, hasta)), nomina)
+
+        trabajador = self.datos.trabajadores[self.proyecto][0]
+        with self.assertRaises(PeriodoArchivado):
+            registrar_asistencias_bulk(Proyecto(pk=self.proyecto), desde, [{"trabajador": trabajador}])
+        r = Client().post("/asistencia/registrar/", {
+            "project": self.proyecto, "date": desde.isoformat(),
+            "asistencias": [{"trabajador": trabajador, "presente": True}],
+        }, content_type="application/json")
+        self.assertEqual(r.status_code, 409)
+
+        # Escrituras por ORM: API REST y admin responden con un error de validación
+        viva = Asistencia.objects.order_by("-fecha").first()
+        with mock.patch.object(AsistenciaSerializer, "validate", lambda serializer, attrs: attrs):
+            r = Client().patch(f"/api/asistencias/{viva.pk}/", {"fecha": desde.isoformat()},
+                               content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("archivado", r.json()["fecha"][0])
+        admin = Client()
+        admin.force_login(User.objects.create_superuser("admin-archivo", password="x"))
+        r = admin.post(f"/admin/asistencia/asistencia/{viva.pk}/change/", {
+            "trabajador": viva.trabajador_id, "proyecto": viva.proyecto_id, "fecha": desde.isoformat(),
+            "presente": "on", "tipo_retraso": viva.tipo_retraso or "",
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "está archivado")
+        # La verificación va en la misma consulta que la llave anterior
+        viva.fecha = desde
+        with CaptureQueriesContext(connection) as consultas, self.assertRaises(PeriodoArchivado):
+            recordar_llave_anterior(Asistencia, viva)
+        self.assertEqual(len(consultas), 1)
+        viva.refresh_from_db()
+        self.assertGreaterEqual(viva.fecha, corte(2))
+
+        for proyecto_id, mes in lotes:
+            restaurar_mes(proyecto_id, mes)
+        self.assertEqual(self.filas(), filas)
+
+
+class BusquedaTests(TestCase):
+    """El índice de búsqueda ignora acentos, ordena por coincidencia y sigue a las escrituras."""
+
+    def setUp(self):
+        indice_trabajadores.limpiar()
+        self.addCleanup(indice_trabajadores.limpiar)
+        self.obra = crear_proyecto("Obra búsqueda")
+        self.otra = crear_proyecto("Otra obra")
+        datos = [
+            ("José Ángel", "Peña", "Núñez", "PENJ800101HDFXXX01", "12345678901", self.obra),
+            ("María", "Penagos", "Ibáñez", "PEIM900202MDFXXX02", "10987654321", self.obra),
+            ("Pedro", "Hernández", "Peña", None, None, self.otra),
+        ]
+        self.ids = []
+        for nombre, paterno, materno, curp, nss, proyecto in datos:
+            t = Trabajador.objects.create(nombre=nombre, apellido_paterno=paterno, apellido_materno=materno,
+                                          categoria="Ayudante", telefono="0", curp=curp, nss=nss)
+            t.proyectos.add(proyecto)
+            self.ids.append(t.pk)
+
+    def buscar(self, q, **kwargs):
+        return [f.id for f in indice_trabajadores.buscar(q, **kwargs)]
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar("  Peña-NÚÑEZ, José Ángel "), "pena nunez jose angel")
+
+    def test_busqueda(self):
+        pena, penagos, hernandez = self.ids
+        # Exacto antes que prefijo; a igual puntaje, por apellidos
+        self.assertEqual(self.buscar("pena"), [hernandez, pena, penagos])
+        self.assertEqual(self.buscar("PEÑA jose"), [pena])
+        self.assertEqual(self.buscar("nandez"), [hernandez])          # en medio de la palabra
+        self.assertEqual(self.buscar("penj80"), [pena])               # prefijo de CURP
+        self.assertEqual(self.buscar("87654"), [penagos])             # NSS en medio
+        self.assertEqual(self.buscar("pena", proyecto=self.otra.pk), [hernandez])
+        self.assertEqual(self.buscar("p"), [])
+
+    def test_sigue_a_las_escrituras_sin_consultas(self):
+        pena, penagos, hernandez = self.ids
+        self.buscar("pena")  # arma el índice
+        t = Trabajador.objects.get(pk=penagos)
+        t.apellido_paterno = "Olvera"
+        t.save()
+        t.proyectos.add(self.otra)
+        Trabajador.objects.get(pk=hernandez).delete()
+        with limite_consultas(0):
+            self.assertEqual(self.buscar("pena"), [pena])
+            self.assertEqual(self.buscar("olv", proyecto=self.otra.pk), [penagos])
+            r = self.client.get("/asistencia/buscar-trabajadores/", {"q": "ibañez"})
+        self.assertEqual([f["id"] for f in r.json()["resultados"]], [penagos])
+
+
+class TokensQRTests(TestCase):
+    """Credenciales firmadas: escaneo sin leer al trabajador, rotación, revocación y reemisión."""
+
+    def setUp(self):
+        revocaciones.invalidar()
+        cache_autorizacion.limpiar()
+        self.addCleanup(revocaciones.invalidar)
+        self.obra, self.otra = crear_proyecto("Obra QR"), crear_proyecto("Otra QR")
+        self.trabajador = Trabajador.objects.create(
+            nombre="Ana", apellido_paterno="Ruiz", apellido_materno="Soto", categoria="Ayudante", telefono="0")
+        self.trabajador.proyectos.add(self.obra)
+        self.trabajador.refresh_from_db()
+        Dispositivo.objects.create(device_id="tablet-qr").proyectos.add(self.obra)
+
+    def token(self):
+        t = Trabajador.objects.get(pk=self.trabajador.pk)
+        return emitir(t.pk, t.qr_proyecto, t.qr_emitido)
+
+    def escanear(self, token):
+        return self.client.get("/asistencia/registrar-qr/", {"token": token, "device_id": "tablet-qr"})
+
+    def test_escaneo_sin_consultar_trabajador(self):
+        token = self.token()
+        self.assertTrue(self.trabajador.codigo_qr.name.startswith("codigos_qr/"))
+        self.assertEqual(verificar(token)[:2], (self.trabajador.pk, self.obra.pk))
+        cache_autorizacion.dispositivo("tablet-qr")
+        cache_autorizacion.proyectos_trabajador(self.trabajador.pk)
+        revocaciones.tabla()
+        with CaptureQueriesContext(connection) as consultas:
+            r = self.escanear(token)
+        self.assertEqual(r.status_code, 200)
+        lecturas = [q["sql"] for q in consultas.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertFalse([sql for sql in lecturas if "asistencia_trabajador" in sql], lecturas)
+
+    def test_token_de_trabajador_inexistente_o_reasignado(self):
+        inexistente = emitir(99999, self.obra.pk, timezone.now())
+        self.assertEqual(self.escanear(inexistente).status_code, 404)
+        # Firma válida, pero el trabajador ya no está en el proyecto del token
+        ajeno = emitir(self.trabajador.pk, self.otra.pk, timezone.now())
+        r = self.escanear(ajeno)
+        self.assertEqual(r.status_code, 403)
+        self.assertIn("no asignado", r.json()["error"])
+        r = self.client.post("/asistencia/sincronizar-qr/", {
+            "device_id": "tablet-qr",
+            "escaneos": [
+                {"clave": "qr-x", "token": inexistente, "timestamp": timezone.now().isoformat()},
+                {"clave": "qr-y", "token": ajeno, "timestamp": timezone.now().isoformat()},
+            ],
+        }, content_type="application/json")
+        self.assertEqual([e["estado"] for e in r.json()["results"]], ["rechazado", "rechazado"])
+        self.assertFalse(Asistencia.objects.exists())
+
+    def test_firma_vencimiento_y_rotacion(self):
+        token = self.token()
+        self.assertEqual(self.escanear(token[:-1] + ("A" if token[-1] != "A" else "B")).status_code, 403)
+        self.assertEqual(self.escanear(f"{self.trabajador.pk}-Ana Ruiz").status_code, 403)
+        with self.assertRaisesMessage(TokenInvalido, "vencida"):
+            verificar(token, timezone.now() + timedelta(days=400))
+
+        with override_settings(ASISTENCIA_QR_CLAVES={"a": "vieja"}):
+            firmado = emitir(self.trabajador.pk, self.obra.pk, timezone.now())
+        with override_settings(ASISTENCIA_QR_CLAVES={"b": "nueva", "a": "vieja"}):
+            self.assertEqual(verificar(firmado).clave, "a")
+            self.assertTrue(emitir(self.trabajador.pk, self.obra.pk, timezone.now()).startswith("T1.b."))
+        with override_settings(ASISTENCIA_QR_CLAVES={"b": "nueva"}):
+            with self.assertRaisesMessage(TokenInvalido, "retirada"):
+                verificar(firmado)
+
+    def test_sin_claves_no_se_emite_ni_verifica(self):
+        token = self.token()
+        # Un token firmado con la clave que antes se derivaba de SECRET_KEY no pasa
+        cuerpo = f"T1.0.{token.split('.', 2)[2].rsplit('.', 1)[0]}"
+        falso = f"{cuerpo}.{tokens_qr._firmar(tokens_qr._derivar('0', settings.SECRET_KEY), cuerpo)}"
+        with self.assertRaisesMessage(TokenInvalido, "retirada"):
+            verificar(falso)
+
+        with override_settings(ASISTENCIA_QR_CLAVES={}):
+            with self.assertRaises(ImproperlyConfigured):
+                emitir(self.trabajador.pk, self.obra.pk, timezone.now())
+            with self.assertRaisesMessage(TokenInvalido, "claves"):
+                verificar(token)
+            tokens_qr.verificar_configuracion()  # en desarrollo no impide servir
+            with override_settings(PRODUCCION=True), self.assertRaises(ImproperlyConfigured):
+                tokens_qr.verificar_configuracion()
+
+    def test_clave_local_al_primer_uso(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "qr_clave")
+            with override_settings(ASISTENCIA_QR_CLAVES={}, ASISTENCIA_QR_CLAVE_LOCAL=ruta):
+                tokens_qr.verificar_configuracion()
+                self.assertFalse(os.path.exists(ruta))
+                token = emitir(self.trabajador.pk, self.obra.pk, timezone.now())
+                self.assertTrue(token.startswith("T1.l."))
+                self.assertEqual(verificar(token).trabajador_id, self.trabajador.pk)
+            self.assertEqual(os.stat(ruta).st_mode & 0o777, 0o600)
+
+    def test_cambio_de_proyecto_y_baja_revocan(self):
+        anterior = self.token()
+        revocaciones.tabla()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trabajador.proyectos.set([self.otra])
+        with self.assertRaisesMessage(TokenInvalido, "revocada"):
+            verificar(anterior)
+        nuevo = self.token()
+        self.assertEqual(verificar(nuevo).proyecto_id, self.otra.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Trabajador.objects.get(pk=self.trabajador.pk).delete()
+        with self.assertRaisesMessage(TokenInvalido, "revocada"):
+            verificar(nuevo)
+
+    def test_reemision_de_credenciales(self):
+        # Credencial del formato anterior: sin token firmado
+        Trabajador.objects.filter(pk=self.trabajador.pk).update(qr_emitido=None, qr_proyecto=None)
+        with tempfile.TemporaryDirectory() as salida, override_settings(MEDIA_ROOT=salida):
+            call_command("generar_credenciales", procesos=1, stdout=StringIO())
+            primera = self.token()
+            self.assertEqual(verificar(primera).proyecto_id, self.obra.pk)
+            call_command("generar_credenciales", procesos=1, reemitir=True,
+                         trabajadores=[self.trabajador.pk], stdout=StringIO())
+            archivo = Trabajador.objects.get(pk=self.trabajador.pk).codigo_qr.name
+            self.assertTrue(os.path.isfile(os.path.join(salida, archivo)))
+        revocaciones.invalidar()
+        with self.assertRaisesMessage(TokenInvalido, "revocada"):
+            verificar(primera)
+        verificar(self.token())
+
+    def test_sincronizacion_offline_con_token(self):
+        r = self.client.post("/asistencia/sincronizar-qr/", {
+            "device_id": "tablet-qr",
+            "escaneos": [
+                {"clave": "qr-1", "token": self.token(), "timestamp": timezone.now().isoformat()},
+                {"clave": "qr-2", "token": "T1.0.1.1.1.1.x", "timestamp": timezone.now().isoformat()},
+            ],
+        }, content_type="application/json")
+        estados = [e["estado"] for e in r.json()["results"]]
+        self.assertEqual(estados, ["registrado", "rechazado"])
+        self.assertTrue(Asistencia.objects.filter(trabajador=self.trabajador, proyecto=self.obra).exists())
+
+
+class CredencialesTests(TestCase):
+    """Archivos de credencial direccionados por contenido."""
+
+    def setUp(self):
+        self.obra, self.otra = crear_proyecto("Obra Credencial"), crear_proyecto("Otra Credencial")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trabajador = Trabajador.objects.create(
+                nombre="Luis", apellido_paterno="Mora", apellido_materno="Paz", categoria="Oficial", telefono="0")
+            self.trabajador.proyectos.add(self.obra)
+
+    def archivo(self):
+        return Trabajador.objects.get(pk=self.trabajador.pk).codigo_qr.name
+
+    def existe(self, nombre):
+        return os.path.isfile(os.path.join(settings.MEDIA_ROOT, nombre))
+
+    def test_mismo_contenido_conserva_el_archivo(self):
+        archivo = self.archivo()
+        self.assertTrue(self.existe(archivo))
+        with mock.patch("asistencia.credenciales.renderizar_png") as renderizar, \
+                self.captureOnCommitCallbacks(execute=True):
+            trabajador = Trabajador.objects.get(pk=self.trabajador.pk)
+            trabajador.telefono = "5550000000"
+            trabajador.save()
+        renderizar.assert_not_called()
+        self.assertEqual(self.archivo(), archivo)
+        self.assertTrue(self.existe(archivo))
+
+    def test_contenido_nuevo_reemplaza_el_archivo(self):
+        anterior = self.archivo()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trabajador.proyectos.set([self.otra])
+        nuevo = self.archivo()
+        self.assertNotEqual(nuevo, anterior)
+        self.assertTrue(self.existe(nuevo))
+        self.assertFalse(self.existe(anterior))
+
+    def test_generar_credenciales_omite_las_vigentes(self):
+        salida = StringIO()
+        call_command("generar_credenciales", procesos=1, trabajadores=[self.trabajador.pk], stdout=salida)
+        self.assertIn("Credenciales generadas: 0, sin cambios: 1", salida.getvalue())
+        os.remove(os.path.join(settings.MEDIA_ROOT, self.archivo()))
+        salida = StringIO()
+        call_command("generar_credenciales", procesos=1, trabajadores=[self.trabajador.pk], stdout=salida)
+        self.assertIn("Credenciales generadas: 1, sin cambios: 0", salida.getvalue())
+        self.assertTrue(self.existe(self.archivo()))
@@ -0,0 +1,235 @@
+"""
+Tokens QR firmados de las credenciales de trabajador.
+
+El QR lleva todo lo que el escaneo necesita, firmado con HMAC-SHA256:
+
+    T1.<clave>.<trabajador>.<proyecto>.<emitido>.<expira>.<firma>
+
+con los números en base 36 (emitido y expira en segundos Unix) y la firma
+truncada a 96 bits en base64url; unos 40 caracteres, un QR pequeño. Un
+escaneo se valida en el proceso, sin leer la base: la firma prueba que el
+trabajador y su proyecto principal son los que se emitieron, y la
+vigencia se comprueba contra la hora del escaneo.
+
+- Rotación: ASISTENCIA_QR_CLAVES es {id: secreto}; la primera clave firma
+  y las demás solo verifican. Se agrega la nueva al principio, se
+  reemiten las credenciales (`manage.py generar_credenciales`) y al final
+  se retira la anterior. Sin claves no se emite ni se acepta ningún
+  token (nunca se derivan de SECRET_KEY, que en desarrollo es pública), y
+  en producción no se sirve (verificar_configuracion, en wsgi.py y
+  asgi.py). Sin ASISTENCIA_QR_CLAVES, ASISTENCIA_QR_CLAVE_LOCAL es el
+  archivo de una clave de este equipo, que se genera al primer uso.
+- Revocación: RevocacionQR invalida los tokens de un trabajador emitidos
+  hasta cierto momento (o todos, si se dio de baja). Las filas vigentes se
+  tienen en memoria (Revocaciones) y se releen cada
+  ASISTENCIA_QR_REVOCACIONES_TTL para ver las de otros procesos.
+"""
+import base64
+import hashlib
+import hmac
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from gestion_obra.secretos import secreto_persistente
+
+PREFIJO = "T1"
+BYTES_FIRMA = 12
+
+CredencialQR = namedtuple("CredencialQR", "trabajador_id proyecto_id emitido expira clave")
+
+
+class TokenInvalido(Exception):
+    """El token no es de TASAL, su firma no cuadra, venció o fue revocado."""
+
+
+def es_token(texto):
+    return bool(texto) and texto.startswith(PREFIJO + ".")
+
+
+# =======================================================
+# Claves
+# =======================================================
+@lru_cache(maxsize=16)
+def _derivar(clave_id, secreto):
+    return hashlib.sha256(f"tasal.qr:{clave_id}:{secreto}".encode()).digest()
+
+
+@lru_cache(maxsize=4)
+def _clave_local(ruta):
+    return secreto_persistente(ruta, "TASAL_QR_CLAVES")
+
+
+def _claves():
+    """[(id, llave HMAC), …] con la clave activa primero; ImproperlyConfigured si no hay."""
+    configuradas = getattr(settings, "ASISTENCIA_QR_CLAVES", None)
+    if not configuradas:
+        local = getattr(settings, "ASISTENCIA_QR_CLAVE_LOCAL", None)
+        if not local:
+            raise ImproperlyConfigured("Sin ASISTENCIA_QR_CLAVES (TASAL_QR_CLAVES) no hay credenciales QR.")
+        configuradas = {"l": _clave_local(str(local))}
+    return [(clave_id, _derivar(clave_id, secreto)) for clave_id, secreto in configuradas.items()]
+
+
+def verificar_configuracion():
+    """Al servir (wsgi.py, asgi.py): en producción, sin claves QR no se sirve."""
+    if getattr(settings, "PRODUCCION", False):
+        _claves()
+
+
+def _firmar(llave, cuerpo):
+    firma = hmac.new(llave, cuerpo.encode("ascii"), hashlib.sha256).digest()[:BYTES_FIRMA]
+    return base64.urlsafe_b64encode(firma).decode("ascii").rstrip("=")
+
+
+def _b36(n):
+    digitos = "0123456789abcdefghijklmnopqrstuvwxyz"
+    texto = ""
+    while True:
+        n, resto = divmod(n, 36)
+        texto = digitos[resto] + texto
+        if not n:
+            return texto
+
+
+def segundos(momento):
+    return int(momento.timestamp())
+
+
+# =======================================================
+# Emisión y verificación
+# =======================================================
+def emitir(trabajador_id, proyecto_id, emitido):
+    """Token de la credencial; `emitido` es un datetime aware (se trunca a segundos)."""
+    clave_id, llave = _claves()[0]
+    dias = getattr(settings, "ASISTENCIA_QR_VIGENCIA_DIAS", 365)
+    inicio = segundos(emitido)
+    cuerpo = ".".join((
+        PREFIJO, clave_id, _b36(trabajador_id), _b36(proyecto_id) if proyecto_id else "",
+        _b36(inicio), _b36(inicio + dias * 86400),
+    ))
+    return f"{cuerpo}.{_firmar(llave, cuerpo)}"
+
+
+def verificar(token, momento=None):
+    """CredencialQR del token; TokenInvalido si no procede a `momento` (default: ahora)."""
+    partes = (token or "").split(".")
+    if len(partes) != 7 or partes[0] != PREFIJO or not token.isascii():
+        raise TokenInvalido("QR no reconocido.")
+    _, clave_id, trabajador, proyecto, emitido, expira, firma = partes
+    try:
+        llave = dict(_claves()).get(clave_id)
+    except ImproperlyConfigured:
+        raise TokenInvalido("No hay claves configuradas para verificar credenciales.")
+    if llave is None:
+        raise TokenInvalido("Credencial firmada con una clave retirada; reimprímala.")
+    if not hmac.compare_digest(firma, _firmar(llave, token.rsplit(".", 1)[0])):
+        raise TokenInvalido("Firma del QR inválida.")
+
+    credencial = CredencialQR(
+        int(trabajador, 36), int(proyecto, 36) if proyecto else None,
+        int(emitido, 36), int(expira, 36), clave_id,
+    )
+    ahora = segundos(momento) if momento else time.time()
+    if ahora > credencial.expira:
+        raise TokenInvalido("Credencial vencida.")
+    if revocaciones.revocado(credencial.trabajador_id, credencial.emitido):
+        raise TokenInvalido("Credencial revocada.")
+    if credencial.proyecto_id is None:
+        raise TokenInvalido("Trabajador sin proyecto.")
+    return credencial
+
+
+async def averificar(token, momento=None):
+    """verificar() para vistas async: solo sale del event loop si hay que releer las revocaciones."""
+    if revocaciones.vigente():
+        return verificar(token, momento)
+    return await sync_to_async(verificar)(token, momento)
+
+
+# =======================================================
+# Revocaciones en memoria
+# =======================================================
+class Revocaciones:
+    """trabajador_id -> emitido máximo revocado (inf: todos); seguro entre hilos."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._tabla = None
+        self._leida = 0.0
+        self._lock = threading.Lock()
+
+    def vigente(self):
+        ttl = self.ttl if self.ttl is not None else getattr(settings, "ASISTENCIA_QR_REVOCACIONES_TTL", 60)
+        return self._tabla is not None and time.monotonic() - self._leida <= ttl
+
+    def tabla(self):
+        tabla = self._tabla
+        if not self.vigente():
+            with self._lock:
+                if self._tabla is tabla:
+                    self._tabla = self.cargar()
+                    self._leida = time.monotonic()
+                tabla = self._tabla
+        return tabla
+
+    @staticmethod
+    def cargar():
+        """Una consulta; omite las que solo alcanzan tokens ya vencidos."""
+        from .models import RevocacionQR
+
+        dias = getattr(settings, "ASISTENCIA_QR_VIGENCIA_DIAS", 365)
+        vencidos = timezone.now() - timedelta(days=dias)
+        tabla = {}
+        for trabajador_id, hasta in (
+            RevocacionQR.objects.exclude(emitidos_hasta__lt=vencidos)
+            .values_list("trabajador_id", "emitidos_hasta")
+        ):
+            tope = math.inf if hasta is None else segundos(hasta)
+            tabla[trabajador_id] = max(tope, tabla.get(trabajador_id, tope))
+        return tabla
+
+    def revocado(self, trabajador_id, emitido):
+        tope = self.tabla().get(trabajador_id)
+        return tope is not None and emitido <= tope
+
+    def agregar(self, trabajador_id, emitidos_hasta=None):
+        """Refleja en memoria una RevocacionQR confirmada en este proceso."""
+        tope = math.inf if emitidos_hasta is None else segundos(emitidos_hasta)
+        with self._lock:
+            if self._tabla is not None:
+                self._tabla[trabajador_id] = max(tope, self._tabla.get(trabajador_id, tope))
+
+    def invalidar(self):
+        with self._lock:
+            self._tabla = None
+
+
+revocaciones = Revocaciones()
+
+
+def revocar(pares, motivo=""):
+    """
+    Revoca, por cada (trabajador_id, emitidos_hasta) de `pares`, los tokens
+    del trabajador emitidos hasta ese momento (None: todos).
+    """
+    from .models import RevocacionQR
+
+    pares = list(pares)
+    RevocacionQR.objects.bulk_create([
+        RevocacionQR(trabajador_id=t, emitidos_hasta=hasta, motivo=motivo) for t, hasta in pares
+    ])
+
+    def en_memoria():
+        for t, hasta in pares:
+            revocaciones.agregar(t, hasta)
+    transaction.on_commit(en_memoria)
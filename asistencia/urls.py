@@ -6,13 +6,22 @@ from .views import (
     AsistenciaViewSet,
     RegistrarAsistenciaView,
     ExportarAsistenciaExcelView,
+    ResumenAsistenciaView,
+    ReporteNominaView,
     asistencia_view,
     registrar_asistencia_form_view,
     RegistrarAsistenciaQRView,
+    registrar_qr_async_view,
+    SincronizarEscaneosView,
+    SincronizacionView,
+    ImportarTrabajadoresView,
+    BuscarTrabajadoresView,
     alta_trabajador_view,
     asistencia_elegir_proyecto_view,
     bienvenido_view,
     scan_offline_view,    # <-- import añadido
+    tablero_view,
+    tablero_eventos_view,
 )
 
 router = routers.DefaultRouter()
@@ -24,12 +33,23 @@ urlpatterns = [
     path('', include(router.urls)),
     path('registrar/',      RegistrarAsistenciaView.as_view(),       name='registrar-asistencia'),
     path('exportar/',       ExportarAsistenciaExcelView.as_view(),   name='exportar-asistencia'),
+    path('resumen/',        ResumenAsistenciaView.as_view(),         name='resumen-asistencia'),
+    path('reporte-nomina/', ReporteNominaView.as_view(),             name='reporte-nomina'),
     path('vista/<int:project_id>/', asistencia_view,                name='asistencia-view'),
     path('registrar-form/', registrar_asistencia_form_view,         name='asistencia-form-post'),
+    path('registrar-qr/', RegistrarAsistenciaQRView.as_view(), name='registrar-qr-token'),
     path('registrar-qr/<int:trabajador_id>/', RegistrarAsistenciaQRView.as_view(), name='registrar-qr'),
+    path('registrar-qr-async/', registrar_qr_async_view, name='registrar-qr-async-token'),
+    path('registrar-qr-async/<int:trabajador_id>/', registrar_qr_async_view, name='registrar-qr-async'),
+    path('sincronizar-qr/', SincronizarEscaneosView.as_view(),      name='sincronizar-qr'),
+    path('sync/',           SincronizacionView.as_view(),            name='sync'),
+    path('importar-trabajadores/', ImportarTrabajadoresView.as_view(), name='importar-trabajadores'),
+    path('buscar-trabajadores/', BuscarTrabajadoresView.as_view(),  name='buscar-trabajadores'),
     path('alta-trabajador/', alta_trabajador_view,                  name='alta-trabajador'),
     path('asistencia-elegir/', asistencia_elegir_proyecto_view,     name='asistencia-elegir'),
     path('bienvenido/',      bienvenido_view,                       name='bienvenido'),
+    path('tablero/<int:project_id>/', tablero_view,                  name='tablero'),
+    path('tablero/<int:project_id>/eventos/', tablero_eventos_view, name='tablero-eventos'),
 
     # Ruta para tu escáner offline:
     path('scan-offline/',    scan_offline_view,                     name='scan-offline'),
@@ -1,51 +1,160 @@
 import base64
-import io
-import qrcode
+import re
+import tempfile
+import zipfile
 
 from datetime import datetime, date, timedelta
-from django.http import HttpResponse
+from wsgiref.util import FileWrapper
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+from django.views.static import serve
 
 from rest_framework import viewsets, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from PIL import Image
-from django.core.files.base import ContentFile
-import openpyxl
-
 from .models import (
     Proyecto, Trabajador, Asistencia,
-    Dispositivo, SesionAsistencia
+    Dispositivo, SesionAsistencia, TIPOS_RETRASO,
+    ResumenDiarioProyecto, ResumenMensualTrabajador,
 )
 from .serializers import ProyectoSerializer, TrabajadorSerializer, AsistenciaSerializer
+from .agrupador import agrupador
+from .archivo import PeriodoArchivado
+from .autorizacion import cache_autorizacion
+from .busqueda import indice_trabajadores
+from .compacto import CODIGOS, rejilla
+from .fotos import guardar_foto, procesar_foto
+from .paginacion import CursorPaginacion, campos_solicitados, limitar_columnas
+from .importacion import ErrorImportacion, FuenteFotos, importar_trabajadores, leer_roster
+from .registro import registrar_asistencias_bulk, registrar_escaneo, sincronizar_escaneos
+from .resumenes import CAMPOS_CONTEO, inicio_de_mes
+from .reportes import FORMATOS, en_bloques, lineas_reporte
+from .rosters import estados_pagina, etag_pagina, ultima_modificacion
+from .sincronizacion import paquete
+from .tablero import REINTENTO_OCUPADO_MS, flujo_async, flujos_wsgi
+from .tokens_qr import TokenInvalido, averificar as averificar_token, verificar as verificar_token
 
 
 # =======================================================
 # ViewSets para API REST
 # =======================================================
-class ProyectoViewSet(viewsets.ModelViewSet):
+class ListadoApiMixin:
+    """
+    Paginación por cursor, ?fields= y lectura de filtros para los
+    ModelViewSets. En lectura solo se cargan las columnas pedidas.
+    """
+    pagination_class = CursorPaginacion
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = limitar_columnas(queryset, campos_solicitados(self.request))
+        return queryset
+
+    def parametro(self, nombre, convertir=int):
+        """Lee un filtro de la query string; un valor inválido responde 400."""
+        valor = self.request.query_params.get(nombre)
+        if valor in (None, ''):
+            return None
+        try:
+            return convertir(valor)
+        except ValueError:
+            raise ValidationError({nombre: 'Valor inválido.'})
+
+
+def _fecha(valor):
+    return datetime.strptime(valor, "%Y-%m-%d").date()
+
+
+class ProyectoViewSet(ListadoApiMixin, viewsets.ModelViewSet):
     queryset = Proyecto.objects.all()
     serializer_class = ProyectoSerializer
 
 
-class TrabajadorViewSet(viewsets.ModelViewSet):
+class TrabajadorViewSet(ListadoApiMixin, viewsets.ModelViewSet):
+    """
+    Filtros: ?proyecto=<id>, ?curp=, ?nss=.
+    """
     queryset = Trabajador.objects.all()
     serializer_class = TrabajadorSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        proyecto = self.parametro('proyecto')
+        if proyecto is not None:
+            queryset = queryset.filter(proyectos=proyecto)
+        for campo in ('curp', 'nss'):
+            valor = self.parametro(campo, str)
+            if valor:
+                queryset = queryset.filter(**{campo: valor})
+
+        campos = campos_solicitados(self.request)
+        if campos is None or 'proyectos' in campos:
+            queryset = queryset.prefetch_related('proyectos')
+        return queryset
+
 
-class AsistenciaViewSet(viewsets.ModelViewSet):
+class AsistenciaViewSet(ListadoApiMixin, viewsets.ModelViewSet):
+    """
+    Filtros: ?proyecto=<id>, ?trabajador=<id>, ?fecha_desde=YYYY-MM-DD,
+    ?fecha_hasta=YYYY-MM-DD, ?tipo_retraso=<tipo>, ?presente=true|false.
+    Solo lista las tablas vivas: los meses archivados (archivo.py) se leen
+    por la exportación, los resúmenes y el reporte de nómina.
+    """
     queryset = Asistencia.objects.all()
     serializer_class = AsistenciaSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        filtros = {
+            'proyecto_id':  self.parametro('proyecto'),
+            'trabajador_id': self.parametro('trabajador'),
+            'fecha__gte':   self.parametro('fecha_desde', _fecha),
+            'fecha__lte':   self.parametro('fecha_hasta', _fecha),
+        }
+        tipo = self.parametro('tipo_retraso', str)
+        if tipo:
+            if tipo not in dict(TIPOS_RETRASO):
+                raise ValidationError({'tipo_retraso': 'Valor inválido.'})
+            filtros['tipo_retraso'] = tipo
+        presente = self.parametro('presente', str)
+        if presente:
+            filtros['presente'] = presente.lower() in ('1', 'true', 'si', 'sí')
+        return queryset.filter(**{k: v for k, v in filtros.items() if v is not None})
+
+    # El serializer ya rechaza los meses archivados; esto cubre el mes que
+    # se archiva entre la validación y el guardado (señal pre_save)
+    def perform_create(self, serializer):
+        try:
+            super().perform_create(serializer)
+        except PeriodoArchivado as e:
+            raise ValidationError({'fecha': [str(e)]})
+
+    def perform_update(self, serializer):
+        try:
+            super().perform_update(serializer)
+        except PeriodoArchivado as e:
+            raise ValidationError({'fecha': [str(e)]})
+
 
 # =======================================================
 # Vistas web y API complementarias
 # =======================================================
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_pagina, last_modified_func=ultima_modificacion)
 def asistencia_elegir_proyecto_view(request):
+    # Los querysets son perezosos: con el fragmento en caché no se ejecutan
     proyectos = Proyecto.objects.all().order_by('nombre')
     project_id = request.GET.get('project_id')
     selected_project = None
@@ -55,10 +164,13 @@ def asistencia_elegir_proyecto_view(request):
         selected_project = get_object_or_404(Proyecto, pk=project_id)
         trabajadores = selected_project.trabajadores.all().order_by('apellido_paterno', 'apellido_materno')
 
+    estados = estados_pagina(request, selected_project.pk if selected_project else None)
     return render(request, 'asistencia/asistencia_elegir.html', {
         'proyectos': proyectos,
         'selected_project': selected_project,
         'trabajadores': trabajadores,
+        'huella_catalogo': estados['catalogo'][0],
+        'huella_roster': estados['roster'][0],
     })
 
 
@@ -82,32 +194,25 @@ class RegistrarAsistenciaView(APIView):
             return Response({"error": "Date format must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
         proyecto = get_object_or_404(Proyecto, pk=project_id)
-        results = []
-
-        for item in asistencias_data:
-            trab_id = item.get("trabajador")
-            presente = item.get("presente", False)
-            try:
-                trab = Trabajador.objects.get(pk=trab_id)
-            except Trabajador.DoesNotExist:
-                results.append({"trabajador": trab_id, "error": "Trabajador not found."})
-                continue
-
-            asistencia, created = Asistencia.objects.update_or_create(
-                trabajador=trab,
-                proyecto=proyecto,
-                fecha=fecha,
-                defaults={"presente": presente}
-            )
-            results.append({"trabajador": trab_id, "created": created, "presente": presente})
+        try:
+            results = registrar_asistencias_bulk(proyecto, fecha, asistencias_data)
+        except PeriodoArchivado as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
         return Response({"status": "success", "results": results}, status=status.HTTP_200_OK)
 
 
 class ExportarAsistenciaExcelView(APIView):
     """
-    Versión simple: exporta asistencia a Excel con project_id, start_date, end_date.
+    Exporta asistencia a Excel con project_id, start_date, end_date.
+    Una sola consulta a la asistencia compacta para todo el rango, workbook
+    en modo write-only y respuesta en streaming para que la memoria no
+    crezca con el rango.
     """
+    DIAS = {0: "L", 1: "M", 2: "MX", 3: "J", 4: "V", 5: "S", 6: "D"}
+    TIPOS_RETRASO = dict(TIPOS_RETRASO)
+    CHUNK = 64 * 1024
+
     def get(self, request):
         project_id     = request.GET.get('project_id')
         start_date_str = request.GET.get('start_date')
@@ -123,51 +228,157 @@ class ExportarAsistenciaExcelView(APIView):
             return HttpResponse("Formato de fecha debe ser YYYY-MM-DD.", status=400)
 
         proyecto     = get_object_or_404(Proyecto, pk=project_id)
-        trabajadores = proyecto.trabajadores.all().order_by('apellido_paterno', 'apellido_materno')
+        trabajadores = (
+            proyecto.trabajadores
+            .order_by('apellido_paterno', 'apellido_materno')
+            .values_list('id', 'nombre', 'apellido_paterno', 'apellido_materno', 'categoria')
+        )
         delta        = end_date - start_date
         fechas       = [start_date + timedelta(days=i) for i in range(delta.days + 1)]
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Asistencia"
+        # Rejilla trabajador × día desde la asistencia compacta: una fila por
+        # trabajador y mes en lugar de una por día
+        celdas = rejilla(proyecto.pk, start_date, end_date)
+        valores = [""] + [self.valor_celda(*codigo) for codigo in CODIGOS[1:]]
+
+        import openpyxl  # solo al exportar: no pesa en el arranque
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Asistencia")
 
         # Encabezados
-        ws.cell(row=1, column=1, value="Nombre Completo")
-        ws.cell(row=1, column=2, value="Categoría")
-        for idx, f in enumerate(fechas, start=3):
-            dia = {0:"L",1:"M",2:"MX",3:"J",4:"V",5:"S",6:"D"}[f.weekday()]
-            ws.cell(row=1, column=idx, value=f"{dia} {f.strftime('%d/%m/%y')}")
+        ws.append(
+            ["Nombre Completo", "Categoría"]
+            + [f"{self.DIAS[f.weekday()]} {f.strftime('%d/%m/%y')}" for f in fechas]
+        )
 
         # Datos
-        for r, trab in enumerate(trabajadores, start=2):
-            nombre = f"{trab.nombre} {trab.apellido_paterno} {trab.apellido_materno}"
-            ws.cell(row=r, column=1, value=nombre)
-            ws.cell(row=r, column=2, value=trab.categoria)
-            for c, f in enumerate(fechas, start=3):
-                try:
-                    asi = Asistencia.objects.get(trabajador=trab, proyecto=proyecto, fecha=f)
-                    ws.cell(row=r, column=c, value="✓" if asi.presente else "X")
-                except Asistencia.DoesNotExist:
-                    ws.cell(row=r, column=c, value="")
-
-        response = HttpResponse(
+        for trab_id, nombre, paterno, materno, categoria in trabajadores.iterator(chunk_size=500):
+            ws.append(
+                [f"{nombre} {paterno} {materno}", categoria]
+                + [valores[c] for c in celdas.fila(trab_id)]
+            )
+
+        archivo = tempfile.TemporaryFile()
+        wb.save(archivo)
+        tamano = archivo.tell()
+        archivo.seek(0)
+
+        response = StreamingHttpResponse(
+            FileWrapper(archivo, self.CHUNK),
             content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
+        response['Content-Length'] = tamano
         fname = f"asistencia_{project_id}_{start_date_str}_to_{end_date_str}.xlsx"
         response['Content-Disposition'] = f'attachment; filename="{fname}"'
-        wb.save(response)
+        return response
+
+    @classmethod
+    def valor_celda(cls, presente, tipo_retraso):
+        if not presente:
+            return "X"
+        return cls.TIPOS_RETRASO.get(tipo_retraso, "✓")
+
+
+class ResumenAsistenciaView(APIView):
+    """
+    Tablero de asistencia con project_id, start_date, end_date.
+    Lee solo las tablas de resúmenes precalculados, nunca el histórico:
+      dias:         conteos por día del proyecto
+      trabajadores: conteos mensuales por trabajador (meses que tocan el rango)
+    """
+    def get(self, request):
+        project_id     = request.GET.get('project_id')
+        start_date_str = request.GET.get('start_date')
+        end_date_str   = request.GET.get('end_date')
+
+        if not project_id or not start_date_str or not end_date_str:
+            return Response({"error": "project_id, start_date y end_date son requeridos."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end_date   = datetime.strptime(end_date_str,   "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "Date format must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        proyecto = get_object_or_404(Proyecto, pk=project_id)
+        dias = (
+            ResumenDiarioProyecto.objects
+            .filter(proyecto=proyecto, fecha__range=(start_date, end_date))
+            .order_by('fecha')
+            .values('fecha', *CAMPOS_CONTEO)
+        )
+        meses = (
+            ResumenMensualTrabajador.objects
+            .filter(proyecto=proyecto, mes__range=(inicio_de_mes(start_date), end_date))
+            .order_by('mes', 'trabajador_id')
+            .values('trabajador_id', 'mes', *CAMPOS_CONTEO)
+        )
+        return Response({
+            "proyecto": proyecto.pk,
+            "dias": list(dias),
+            "trabajadores": [
+                {"trabajador": r.pop('trabajador_id'), **r} for r in meses
+            ],
+        })
+
+
+class ReporteNominaView(APIView):
+    """
+    Reporte de nómina de todos los proyectos (o de project_id=1,2,…) entre
+    start_date y end_date, en streaming como CSV o NDJSON (?formato=).
+    Una fila por trabajador y proyecto: identidad, estado de cada día y totales.
+    """
+    CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def get(self, request):
+        start_date_str = request.GET.get('start_date')
+        end_date_str   = request.GET.get('end_date')
+        formato        = request.GET.get('formato', 'csv')
+
+        if not start_date_str or not end_date_str:
+            return Response({"error": "start_date y end_date son requeridos."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if formato not in FORMATOS:
+            return Response({"error": f"formato debe ser uno de: {', '.join(FORMATOS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end_date   = datetime.strptime(end_date_str,   "%Y-%m-%d").date()
+            proyectos  = [int(p) for p in request.GET.get('project_id', '').split(',') if p.strip()]
+        except ValueError:
+            return Response({"error": "Date format must be YYYY-MM-DD and project_id a list of ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({"error": "start_date no puede ser posterior a end_date."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            en_bloques(lineas_reporte(formato, start_date, end_date, proyectos)),
+            content_type=f"{self.CONTENT_TYPES[formato]}; charset=utf-8",
+        )
+        fname = f"nomina_{start_date_str}_to_{end_date_str}.{formato}"
+        response['Content-Disposition'] = f'attachment; filename="{fname}"'
         return response
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_pagina, last_modified_func=ultima_modificacion)
 def asistencia_view(request, project_id):
     proyecto     = get_object_or_404(Proyecto, pk=project_id)
     trabajadores = proyecto.trabajadores.all().order_by('apellido_paterno', 'apellido_materno')
     fecha_actual = date.today().strftime("%Y-%m-%d")
+    estados      = estados_pagina(request, proyecto.pk)
     return render(request, 'asistencia/asistencia.html', {
         'proyecto': proyecto,
+        'selected_project': proyecto,
+        'proyectos': Proyecto.objects.order_by('nombre'),
         'trabajadores': trabajadores,
         'fecha': fecha_actual,
+        'huella_catalogo': estados['catalogo'][0],
+        'huella_roster': estados['roster'][0],
     })
 
 
@@ -185,16 +396,13 @@ def registrar_asistencia_form_view(request):
             messages.error(request, "Formato de fecha inválido.")
             return redirect('alta_trabajador')
 
-        proyecto     = get_object_or_404(Proyecto, pk=project_id)
-        trabajadores = proyecto.trabajadores.all()
-        for trab in trabajadores:
-            if f"asistencia_{trab.id}" in request.POST:
-                Asistencia.objects.update_or_create(
-                    trabajador=trab,
-                    proyecto=proyecto,
-                    fecha=fecha,
-                    defaults={"presente": True}
-                )
+        proyecto = get_object_or_404(Proyecto, pk=project_id)
+        marcados = [
+            {"trabajador": pk, "presente": True}
+            for pk in proyecto.trabajadores.values_list("pk", flat=True)
+            if f"asistencia_{pk}" in request.POST
+        ]
+        registrar_asistencias_bulk(proyecto, fecha, marcados)
         messages.success(request, "Asistencia registrada con éxito.")
         return redirect(f"{redirect('asistencia-elegir')}?project_id={project_id}")
     return redirect('alta_trabajador')
@@ -228,15 +436,7 @@ def alta_trabajador_view(request):
             try:
                 fmt, imgstr = foto_data.split(';base64,')
                 img_data     = base64.b64decode(imgstr)
-                image        = Image.open(io.BytesIO(img_data))
-                image        = image.resize((300, 400))
-                buf          = io.BytesIO()
-                image.save(buf, format='PNG')
-                trabajador.fotografia.save(
-                    "trabajador_foto.png",
-                    ContentFile(buf.getvalue()),
-                    save=False
-                )
+                trabajador.fotografia.name = guardar_foto(*procesar_foto(img_data))
             except Exception:
                 messages.error(request, "Error al procesar la fotografía.")
 
@@ -246,17 +446,10 @@ def alta_trabajador_view(request):
 
         messages.success(request, "Trabajador dado de alta correctamente.")
 
-        # Generar QR para la credencial
-        qr_data     = f"{trabajador.id}-{trabajador.nombre} {trabajador.apellido_paterno}"
-        qr_img      = qrcode.make(qr_data)
-        buffer_qr   = io.BytesIO()
-        qr_img.save(buffer_qr, format='PNG')
-        qr_b64      = base64.b64encode(buffer_qr.getvalue()).decode("utf-8")
-
+        # El QR de la credencial (trabajador.codigo_qr) se genera en segundo plano
         return render(request, 'asistencia/alta_trabajador.html', {
             'proyectos': proyectos,
             'nueva_credencial': trabajador,
-            'qr_image_base64': qr_b64,
         })
 
     return render(request, 'asistencia/alta_trabajador.html', {'proyectos': proyectos})
@@ -266,53 +459,242 @@ class RegistrarAsistenciaQRView(APIView):
     """
     Registra asistencia vía QR y device_id:
       - Solo dispositivos autorizados.
-      - Primer escaneo del día fija hora_base.
-      - Permite hasta 60 min.
-      - ≤10min: puntual; 11–40: retardo_leve; 41–60: retardo_alto; >60: rechazado.
+      - registrar-qr/?token=…: el token firmado de la credencial
+        (tokens_qr.py) trae trabajador y proyecto; se verifica sin consultas
+        y la caché de autorización confirma que el trabajador existe y sigue
+        en ese proyecto (404 / 403). registrar-qr/<id>/ es el formato
+        anterior, con el id en la ruta.
+      - Con Horario: el retraso se mide contra la entrada del turno más cercano
+        y sus tolerancias.
+      - Sin Horario: el primer escaneo del día fija hora_base y aplica
+        ≤10min: puntual; 11–40: retardo_leve; 41–60: retardo_alto; >60: rechazado.
     """
-    def get(self, request, trabajador_id):
+    def get(self, request, trabajador_id=None):
         device_id = request.GET.get('device_id')
         if not device_id:
             return Response({'error': 'device_id es requerido.'}, status=status.HTTP_400_BAD_REQUEST)
+        if trabajador_id is None and not request.GET.get('token'):
+            return Response({'error': 'token es requerido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 1) validar dispositivo (caché de autorización, sin consultas en caliente)
+        info_disp = cache_autorizacion.dispositivo(device_id)
+        if info_disp is None:
+            return Response({'error': 'Dispositivo no autorizado.'}, status=status.HTTP_403_FORBIDDEN)
+        disp_id, proyectos_disp = info_disp
+
+        # 2) obtener trabajador + proyecto: del token firmado o el principal,
+        #    y en ambos casos confirmarlos contra la caché
+        proj_id = None
+        if trabajador_id is None:
+            try:
+                credencial = verificar_token(request.GET['token'])
+            except TokenInvalido as e:
+                return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+            trabajador_id, proj_id = credencial.trabajador_id, credencial.proyecto_id
+        proyectos_trab = cache_autorizacion.proyectos_trabajador(trabajador_id)
+        if proyectos_trab is None:
+            raise Http404('Trabajador no encontrado.')
+        if proj_id is None:
+            proj_id = proyectos_trab[0] if proyectos_trab else None
+        elif proj_id not in proyectos_trab:
+            return Response({'error': 'Trabajador no asignado al proyecto de la credencial.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        if proj_id not in proyectos_disp:
+            return Response({'error': 'Device no autorizado para este proyecto.'}, status=status.HTTP_403_FORBIDDEN)
+
+        # 3) sesión diaria, clasificación y registro
+        resultado = registrar_escaneo(trabajador_id, disp_id, proj_id, timezone.now())
+        if resultado.tipo is None:
+            return Response({'error': f'Tiempo excedido (>{resultado.maximos} min).'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': 'Asistencia registrada.', 'tipo_retraso': resultado.tipo},
+                        status=status.HTTP_200_OK)
+
+
+@require_GET
+async def registrar_qr_async_view(request, trabajador_id=None):
+    """
+    RegistrarAsistenciaQRView para servidores ASGI: mismas reglas y
+    respuestas, sin ocupar un hilo por escaneo. La autorización sale de la
+    caché (y del token firmado) sin dejar el event loop y los escaneos
+    simultáneos se graban en lotes (agrupador.py).
+    """
+    device_id = request.GET.get('device_id')
+    if not device_id:
+        return JsonResponse({'error': 'device_id es requerido.'}, status=400)
+    if trabajador_id is None and not request.GET.get('token'):
+        return JsonResponse({'error': 'token es requerido.'}, status=400)
+
+    info_disp = await cache_autorizacion.adispositivo(device_id)
+    if info_disp is None:
+        return JsonResponse({'error': 'Dispositivo no autorizado.'}, status=403)
+    disp_id, proyectos_disp = info_disp
+
+    proj_id = None
+    if trabajador_id is None:
+        try:
+            credencial = await averificar_token(request.GET['token'])
+        except TokenInvalido as e:
+            return JsonResponse({'error': str(e)}, status=403)
+        trabajador_id, proj_id = credencial.trabajador_id, credencial.proyecto_id
+    proyectos_trab = await cache_autorizacion.aproyectos_trabajador(trabajador_id)
+    if proyectos_trab is None:
+        raise Http404('Trabajador no encontrado.')
+    if proj_id is None:
+        proj_id = proyectos_trab[0] if proyectos_trab else None
+    elif proj_id not in proyectos_trab:
+        return JsonResponse({'error': 'Trabajador no asignado al proyecto de la credencial.'}, status=403)
+    if proj_id not in proyectos_disp:
+        return JsonResponse({'error': 'Device no autorizado para este proyecto.'}, status=403)
+
+    resultado = await agrupador().registrar(trabajador_id, disp_id, proj_id, timezone.now())
+    if resultado.tipo is None:
+        return JsonResponse({'error': f'Tiempo excedido (>{resultado.maximos} min).'}, status=400)
+    return JsonResponse({'message': 'Asistencia registrada.', 'tipo_retraso': resultado.tipo})
+
+
+class SincronizarEscaneosView(APIView):
+    """
+    Sincroniza en lote los escaneos QR encolados offline por un dispositivo:
+    { device_id, escaneos: [ {trabajador, timestamp, clave}, … ] }
+    Cada escaneo se clasifica con su timestamp del dispositivo y el lote se
+    confirma en una transacción. Reenviar un lote es idempotente por `clave`.
+    """
+    MAX_ESCANEOS = 500
+
+    def post(self, request):
+        device_id = request.data.get('device_id')
+        escaneos  = request.data.get('escaneos', [])
+        if not device_id:
+            return Response({'error': 'device_id es requerido.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(escaneos, list) or not all(isinstance(e, dict) for e in escaneos):
+            return Response({'error': 'escaneos debe ser una lista de objetos.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(escaneos) > self.MAX_ESCANEOS:
+            return Response({'error': f'Máximo {self.MAX_ESCANEOS} escaneos por lote.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1) validar dispositivo
         try:
             disp = Dispositivo.objects.get(device_id=device_id)
         except Dispositivo.DoesNotExist:
             return Response({'error': 'Dispositivo no autorizado.'}, status=status.HTTP_403_FORBIDDEN)
 
-        # 2) obtener trabajador + proyecto
-        trab = get_object_or_404(Trabajador, pk=trabajador_id)
-        proj = trab.proyectos.first()
-        if proj not in disp.proyectos.all():
-            return Response({'error': 'Device no autorizado para este proyecto.'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            resultados = sincronizar_escaneos(disp, escaneos)
+        except PeriodoArchivado as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'status': 'success', 'results': resultados}, status=status.HTTP_200_OK)
 
-        hoy   = date.today()
-        ahora = timezone.now()
 
-        # 3) sesión diaria
-        sesion, creada = SesionAsistencia.objects.get_or_create(
-            dispositivo=disp, proyecto=proj, fecha=hoy,
-            defaults={'hora_base': ahora}
-        )
-        minutos = 0 if creada else (ahora - sesion.hora_base).total_seconds() / 60
-
-        # 4) clasificar o rechazar
-        if minutos > 60:
-            return Response({'error': 'Tiempo excedido (>60 min).'}, status=status.HTTP_400_BAD_REQUEST)
-        elif minutos <= 10:
-            tipo = 'puntual'
-        elif minutos <= 40:
-            tipo = 'retardo_leve'
+@method_decorator(gzip_page, name='dispatch')
+class SincronizacionView(APIView):
+    """
+    Sincronización delta de las apps móviles (ver sincronizacion.py).
+    GET ?token=<último token recibido>: sin token, o con uno ya podado,
+    responde el paquete completo; si no, solo lo que cambió después.
+    Comprimido con gzip cuando el cliente lo acepta.
+    """
+    def get(self, request):
+        token = request.query_params.get('token')
+        if token in (None, ''):
+            desde = None
         else:
-            tipo = 'retardo_alto'
+            try:
+                desde = int(token)
+            except ValueError:
+                return Response({'error': 'token inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+            if desde < 0:
+                return Response({'error': 'token inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(paquete(desde), status=status.HTTP_200_OK)
 
-        # 5) grabar asistencia
-        Asistencia.objects.update_or_create(
-            trabajador=trab, proyecto=proj, fecha=hoy,
-            defaults={'presente': True, 'tipo_retraso': tipo}
-        )
-        return Response({'message': 'Asistencia registrada.', 'tipo_retraso': tipo}, status=status.HTTP_200_OK)
+
+class BuscarTrabajadoresView(APIView):
+    """
+    Typeahead de trabajadores para el registro y los escáneres:
+    GET ?q=<texto>&proyecto=<id>&limite=<n> busca por nombre, apellidos,
+    CURP o NSS sin importar acentos ni mayúsculas (ver busqueda.py).
+    Responde desde el índice en memoria, sin consultas.
+    """
+    LIMITE = 10
+    LIMITE_MAXIMO = 50
+
+    def get(self, request):
+        try:
+            proyecto = int(request.query_params['proyecto']) if request.query_params.get('proyecto') else None
+            limite = int(request.query_params.get('limite') or self.LIMITE)
+        except ValueError:
+            return Response({'error': 'proyecto y limite deben ser enteros.'}, status=status.HTTP_400_BAD_REQUEST)
+        limite = max(1, min(limite, self.LIMITE_MAXIMO))
+        fichas = indice_trabajadores.buscar(request.query_params.get('q', ''), limite, proyecto)
+        return Response({'resultados': [ficha._asdict() for ficha in fichas]}, status=status.HTTP_200_OK)
+
+
+class ImportarTrabajadoresView(APIView):
+    """
+    Alta masiva de trabajadores (multipart):
+      - roster: archivo .csv o .xlsx (nombre, apellido_paterno, apellido_materno,
+        categoria, telefono, curp, nss, proyectos, foto).
+      - fotos: .zip opcional con las fotografías referidas en la columna foto.
+      - proyecto: id opcional para las filas sin proyectos.
+    """
+    def post(self, request):
+        roster = request.FILES.get('roster')
+        if not roster:
+            return Response({'error': 'roster es requerido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        proyecto_id = request.data.get('proyecto')
+        if proyecto_id:
+            proyecto_id = get_object_or_404(Proyecto, pk=proyecto_id).pk
+
+        try:
+            fotos = request.FILES.get('fotos')
+            resumen = importar_trabajadores(
+                leer_roster(roster, roster.name),
+                fotos=FuenteFotos(archivo_zip=fotos) if fotos else None,
+                proyecto_default=proyecto_id,
+            )
+        except (ErrorImportacion, zipfile.BadZipFile) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'success', **resumen}, status=status.HTTP_200_OK)
+
+
+# =======================================================
+# Tablero en vivo
+# =======================================================
+@login_required
+def tablero_view(request, project_id):
+    """Plantilla del proyecto; el estado de cada trabajador llega por tablero_eventos_view."""
+    proyecto = get_object_or_404(Proyecto, pk=project_id)
+    trabajadores = proyecto.trabajadores.order_by('apellido_paterno', 'apellido_materno').values(
+        'id', 'nombre', 'apellido_paterno', 'apellido_materno', 'categoria',
+    )
+    return render(request, 'asistencia/tablero.html', {
+        'proyecto': proyecto,
+        'trabajadores': trabajadores,
+        'reintento_ocupado_ms': REINTENTO_OCUPADO_MS,
+    })
+
+
+@login_required
+def tablero_eventos_view(request, project_id):
+    """
+    text/event-stream con el estado del día y luego cada asistencia escrita
+    en el proyecto. Servido por ASGI no ocupa un hilo por tablero; por WSGI
+    se admiten ASISTENCIA_TABLERO_FLUJOS_WSGI a la vez y los demás reciben 503.
+    """
+    if not Proyecto.objects.filter(pk=project_id).exists():
+        raise Http404
+    if isinstance(request, ASGIRequest):
+        eventos = flujo_async(project_id)
+    else:
+        eventos = flujos_wsgi.abrir(project_id)
+        if eventos is None:
+            response = HttpResponse(f"retry: {REINTENTO_OCUPADO_MS}\n\n", status=503,
+                                    content_type='text/event-stream')
+            response['Retry-After'] = str(REINTENTO_OCUPADO_MS // 1000)
+            return response
+    response = StreamingHttpResponse(eventos, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # que un proxy no acumule los eventos
+    return response
 
 
 def bienvenido_view(request):
@@ -324,3 +706,28 @@ def scan_offline_view(request):
     Página offline que abre la cámara y escanea el QR.
     """
     return render(request, "asistencia/scan_offline.html")
+
+
+# =======================================================
+# Archivos de MEDIA
+# =======================================================
+# Nombres direccionados por contenido (fotos.py y credenciales.py): si el
+# contenido cambia, cambia la URL, así que el navegador puede guardarlos
+# sin volver a preguntar.
+MEDIA_INMUTABLE = re.compile(
+    r"^(trabajadores/[0-9a-f]{16}(_[a-z]+)?\.webp|codigos_qr/trabajador_\d+_[0-9a-f]{12}\.png)$"
+)
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+
+def servir_media(request, path):
+    """
+    Sirve MEDIA_ROOT con encabezados de caché: un año para los archivos
+    direccionados por contenido y revalidación para los nombres heredados.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if MEDIA_INMUTABLE.match(path):
+        response['Cache-Control'] = CACHE_INMUTABLE
+    else:
+        response['Cache-Control'] = "no-cache"
+    return response
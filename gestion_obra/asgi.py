@@ -9,8 +9,33 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_obra.settings')
 
 application = get_asgi_application()
+
+# En producción no se sirve sin claves para las credenciales QR
+from asistencia.tokens_qr import verificar_configuracion  # noqa: E402
+verificar_configuracion()
+
+if getattr(settings, 'ASISTENCIA_BUSQUEDA_PRECARGAR', False):
+    from asistencia.busqueda import indice_trabajadores
+    indice_trabajadores.precargar()
+
+# Sin DEBUG, /static/ y /media/ los sirve la misma envoltura que en WSGI
+# (gestion_obra/estaticos.py), adaptada a ASGI; lo demás va directo a Django
+if not settings.DEBUG:
+    from asgiref.wsgi import WsgiToAsgi
+    from django.core.wsgi import get_wsgi_application
+    from gestion_obra.estaticos import envolver
+
+    _django = application
+    _archivos = WsgiToAsgi(envolver(get_wsgi_application()))
+    _prefijos = (settings.STATIC_URL, settings.MEDIA_URL)
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith(_prefijos):
+            return await _archivos(scope, receive, send)
+        return await _django(scope, receive, send)
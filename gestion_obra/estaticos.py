@@ -0,0 +1,137 @@
+"""
+Estáticos y MEDIA en modo producción (TASAL_PRODUCCION=1), sin servidor web
+delante.
+
+- EstaticosComprimidos: el almacenamiento de collectstatic. Nombra cada
+  archivo con el hash de su contenido (ManifestStaticFilesStorage) y deja
+  junto a los de texto una copia .gz precomprimida.
+- ArchivosEstaticos: envoltura WSGI que contesta /static/ y /media/ antes de
+  llegar a Django: elige la copia .gz si el cliente la acepta, responde 304
+  con If-None-Match y manda caché de un año a los nombres con hash (o
+  direccionados por contenido en MEDIA) y revalidación a los demás.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+EXTENSIONES_COMPRIMIBLES = (".css", ".js", ".json", ".svg", ".html", ".txt", ".map", ".xml", ".ico")
+# Por debajo de esto gzip no compensa la cabecera
+TAMANO_MINIMO_GZIP = 512
+
+# nombre.0123456789ab.ext, el patrón de ManifestStaticFilesStorage
+RE_HASH_ESTATICO = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+BLOQUE = 64 * 1024
+
+
+def comprimir(ruta):
+    """Escribe ruta.gz si la copia comprimida es menor; devuelve True si la escribió."""
+    destino = ruta + ".gz"
+    with open(ruta, "rb") as origen:
+        datos = origen.read()
+    if len(datos) < TAMANO_MINIMO_GZIP:
+        return False
+    # mtime=0: el mismo archivo produce siempre el mismo .gz
+    comprimido = gzip.compress(datos, compresslevel=9, mtime=0)
+    if len(comprimido) >= len(datos):
+        return False
+    with open(destino, "wb") as f:
+        f.write(comprimido)
+    shutil.copystat(ruta, destino)
+    return True
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """Manifest con hash + copias .gz de los archivos de texto."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nombre in set(paths) | set(self.hashed_files.values()):
+            if nombre.endswith(EXTENSIONES_COMPRIMIBLES) and self.exists(nombre):
+                comprimir(self.path(nombre))
+
+
+class ArchivosEstaticos:
+    """
+    Envoltura WSGI para servir archivos de disco sin pasar por Django.
+    `rutas` es una lista de (prefijo_url, carpeta, es_inmutable) donde
+    es_inmutable(ruta_relativa) decide el Cache-Control. Lo que no existe
+    en disco sigue a la aplicación (y termina en su 404).
+    """
+
+    def __init__(self, aplicacion, rutas):
+        self.aplicacion = aplicacion
+        self.rutas = [(prefijo, os.fspath(carpeta), inmutable) for prefijo, carpeta, inmutable in rutas]
+
+    def __call__(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") in ("GET", "HEAD"):
+            ruta_url = environ.get("PATH_INFO", "")
+            for prefijo, carpeta, inmutable in self.rutas:
+                if ruta_url.startswith(prefijo):
+                    relativa = ruta_url[len(prefijo):]
+                    archivo = self._archivo(carpeta, relativa)
+                    if archivo:
+                        return self._servir(environ, start_response, archivo, inmutable(relativa))
+                    break
+        return self.aplicacion(environ, start_response)
+
+    @staticmethod
+    def _archivo(carpeta, relativa):
+        try:
+            archivo = safe_join(carpeta, relativa)
+        except SuspiciousFileOperation:  # ../ fuera de la carpeta
+            return None
+        return archivo if relativa and os.path.isfile(archivo) else None
+
+    def _servir(self, environ, start_response, archivo, inmutable):
+        tipo, _ = mimetypes.guess_type(archivo)
+        encabezados = [
+            ("Content-Type", tipo or "application/octet-stream"),
+            ("Cache-Control", CACHE_INMUTABLE if inmutable else CACHE_REVALIDAR),
+        ]
+        comprimible = archivo.endswith(EXTENSIONES_COMPRIMIBLES)
+        if comprimible:
+            encabezados.append(("Vary", "Accept-Encoding"))
+            if "gzip" in environ.get("HTTP_ACCEPT_ENCODING", "") and os.path.isfile(archivo + ".gz"):
+                archivo = archivo + ".gz"
+                encabezados.append(("Content-Encoding", "gzip"))
+
+        estado = os.stat(archivo)
+        etag = f'"{estado.st_size:x}-{int(estado.st_mtime):x}"'
+        encabezados += [
+            ("ETag", etag),
+            ("Last-Modified", formatdate(estado.st_mtime, usegmt=True)),
+        ]
+        if etag in environ.get("HTTP_IF_NONE_MATCH", ""):
+            start_response("304 Not Modified", encabezados)
+            return []
+
+        encabezados.append(("Content-Length", str(estado.st_size)))
+        start_response("200 OK", encabezados)
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        envoltura = environ.get("wsgi.file_wrapper", FileWrapper)
+        return envoltura(open(archivo, "rb"), BLOQUE)
+
+
+def envolver(aplicacion):
+    """Aplica ArchivosEstaticos con las rutas de settings (STATIC_ROOT y MEDIA_ROOT)."""
+    from django.conf import settings
+    from asistencia.views import MEDIA_INMUTABLE
+
+    return ArchivosEstaticos(aplicacion, [
+        (settings.STATIC_URL, settings.STATIC_ROOT, lambda r: bool(RE_HASH_ESTATICO.search(r))),
+        (settings.MEDIA_URL, settings.MEDIA_ROOT, lambda r: bool(MEDIA_INMUTABLE.match(r))),
+    ])
@@ -0,0 +1,265 @@
+"""
+Métricas de peticiones y consultas, en memoria del proceso.
+
+- MetricasMiddleware: mide cada petición (latencia hasta la respuesta) y,
+  con un execute_wrapper sobre las conexiones, cuenta sus consultas, el
+  tiempo en la base, las repetidas (misma plantilla SQL más de una vez: el
+  síntoma de un N+1) y las lentas. Se agrupa por nombre de la vista (la
+  ruta de urls.py), no por URL, para acotar las series.
+- /metrics (`exponer`): las métricas en formato de texto de Prometheus.
+  `manage.py metricas_top` lo lee de un servidor en marcha y ordena las
+  vistas más caras.
+- limite_consultas: context manager para pruebas que falla si un bloque
+  hace más de N consultas y lista las plantillas repetidas.
+
+Las consultas lentas (TASAL_METRICAS_CONSULTA_LENTA_MS) y las plantillas
+que se repiten TASAL_METRICAS_REPETICIONES veces en una petición se anotan
+en el logger "tasal.metricas".
+
+En ASGI las consultas corren en el hilo de sync_to_async y no en el del
+middleware: ahí solo se mide la latencia. En respuestas en flujo (SSE,
+reportes) la latencia llega hasta las cabeceras.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+
+log = logging.getLogger("tasal.metricas")
+
+# Límites superiores (segundos) del histograma de latencia
+CUBETAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIN_RUTA = "<sin_ruta>"
+# Largo máximo del SQL en el log
+LARGO_SQL = 500
+
+
+class Observador:
+    """execute_wrapper que cuenta y cronometra las consultas de un bloque."""
+
+    def __init__(self, lenta_ms=None):
+        self.lenta_ms = lenta_ms
+        self.consultas = 0
+        self.segundos = 0.0
+        self.plantillas = Counter()
+        self.lentas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.segundos += duracion
+            self.plantillas[sql] += 1
+            if self.lenta_ms is not None and duracion * 1000 >= self.lenta_ms:
+                self.lentas.append((sql, duracion))
+
+    @property
+    def repetidas(self):
+        """Consultas de más: las que repiten una plantilla ya ejecutada."""
+        return sum(n - 1 for n in self.plantillas.values() if n > 1)
+
+
+class _Vista:
+    __slots__ = ("peticiones", "errores", "cubetas", "segundos", "consultas",
+                 "consultas_max", "segundos_bd", "repetidas", "lentas")
+
+    def __init__(self):
+        self.peticiones = self.errores = self.consultas = self.consultas_max = 0
+        self.repetidas = self.lentas = 0
+        self.segundos = self.segundos_bd = 0.0
+        self.cubetas = [0] * len(CUBETAS)
+
+
+class Metricas:
+    """Acumulado por vista; lo comparten los hilos del servidor."""
+
+    def __init__(self):
+        self._vistas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, segundos, estado, observador=None):
+        with self._lock:
+            v = self._vistas.get(vista)
+            if v is None:
+                v = self._vistas[vista] = _Vista()
+            v.peticiones += 1
+            v.errores += estado >= 500
+            v.segundos += segundos
+            for i, limite in enumerate(CUBETAS):
+                if segundos <= limite:
+                    v.cubetas[i] += 1
+                    break
+            if observador is not None:
+                v.consultas += observador.consultas
+                v.consultas_max = max(v.consultas_max, observador.consultas)
+                v.segundos_bd += observador.segundos
+                v.repetidas += observador.repetidas
+                v.lentas += len(observador.lentas)
+
+    def reiniciar(self):
+        with self._lock:
+            self._vistas.clear()
+
+    def prometheus(self):
+        """Texto de exposición de Prometheus (version 0.0.4)."""
+        with self._lock:
+            vistas = sorted(self._vistas.items())
+            lineas = [
+                "# HELP tasal_peticion_segundos Latencia de las peticiones por vista.",
+                "# TYPE tasal_peticion_segundos histogram",
+            ]
+            for nombre, v in vistas:
+                acumulado = 0
+                for limite, n in zip(CUBETAS, v.cubetas):
+                    acumulado += n
+                    lineas.append(f'tasal_peticion_segundos_bucket{{vista="{_etiqueta(nombre)}",le="{limite}"}} {acumulado}')
+                lineas.append(f'tasal_peticion_segundos_bucket{{vista="{_etiqueta(nombre)}",le="+Inf"}} {v.peticiones}')
+                lineas.append(f'tasal_peticion_segundos_sum{{vista="{_etiqueta(nombre)}"}} {v.segundos:.6f}')
+                lineas.append(f'tasal_peticion_segundos_count{{vista="{_etiqueta(nombre)}"}} {v.peticiones}')
+            for metrica, tipo, ayuda, atributo in (
+                ("tasal_peticion_errores_total", "counter", "Respuestas 5xx.", "errores"),
+                ("tasal_consultas_total", "counter", "Consultas SQL ejecutadas.", "consultas"),
+                ("tasal_consultas_max", "gauge", "Máximo de consultas en una petición.", "consultas_max"),
+                ("tasal_consulta_segundos_total", "counter", "Tiempo en la base de datos.", "segundos_bd"),
+                ("tasal_consultas_repetidas_total", "counter", "Consultas que repiten una plantilla SQL en la misma petición.", "repetidas"),
+                ("tasal_consultas_lentas_total", "counter", "Consultas por encima de TASAL_METRICAS_CONSULTA_LENTA_MS.", "lentas"),
+            ):
+                lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} {tipo}"]
+                for nombre, v in vistas:
+                    valor = getattr(v, atributo)
+                    valor = f"{valor:.6f}" if isinstance(valor, float) else valor
+                    lineas.append(f'{metrica}{{vista="{_etiqueta(nombre)}"}} {valor}')
+        return "\n".join(lineas) + "\n"
+
+
+def _etiqueta(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metricas = Metricas()
+
+
+# =======================================================
+# Middleware
+# =======================================================
+def _nombre_vista(request):
+    coincidencia = getattr(request, "resolver_match", None)
+    if coincidencia is None:
+        return SIN_RUTA
+    return coincidencia.view_name or coincidencia._func_path
+
+
+class MetricasMiddleware:
+    """Va primero en MIDDLEWARE: la latencia incluye al resto de los middleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "TASAL_METRICAS", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lenta_ms = getattr(settings, "TASAL_METRICAS_CONSULTA_LENTA_MS", 100)
+        self.repeticiones = getattr(settings, "TASAL_METRICAS_REPETICIONES", 10)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self._llamar_async(request)
+        observador = Observador(self.lenta_ms)
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(observador))
+            response = self.get_response(request)
+        segundos = time.perf_counter() - inicio
+        vista = _nombre_vista(request)
+        metricas.registrar(vista, segundos, response.status_code, observador)
+        self._anotar(vista, observador)
+        return response
+
+    async def _llamar_async(self, request):
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        metricas.registrar(_nombre_vista(request), time.perf_counter() - inicio, response.status_code)
+        return response
+
+    def _anotar(self, vista, observador):
+        for sql, duracion in observador.lentas:
+            log.warning("Consulta lenta (%.0f ms) en %s: %s", duracion * 1000, vista, sql[:LARGO_SQL])
+        for sql, veces in observador.plantillas.items():
+            if veces >= self.repeticiones:
+                log.warning("Consulta repetida %d veces en %s (¿N+1?): %s", veces, vista, sql[:LARGO_SQL])
+
+
+# =======================================================
+# Exposición
+# =======================================================
+def exponer(request):
+    """GET /metrics: solo desde TASAL_METRICAS_IPS o para usuarios staff."""
+    permitidas = getattr(settings, "TASAL_METRICAS_IPS", ("127.0.0.1", "::1"))
+    usuario = getattr(request, "user", None)
+    if request.META.get("REMOTE_ADDR") not in permitidas and not (usuario and usuario.is_staff):
+        raise PermissionDenied
+    return HttpResponse(metricas.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+RE_MUESTRA = re.compile(r'^(\w+)\{vista="((?:[^"\\]|\\.)*)"(?:,le="([^"]+)")?\} (\S+)$')
+
+
+def leer_prometheus(texto):
+    """
+    Inverso de Metricas.prometheus(): {vista: {"cubetas": [(le, n), …],
+    "tasal_consultas_total": n, …}} (sin el prefijo de histograma).
+    """
+    vistas = {}
+    for linea in texto.splitlines():
+        m = RE_MUESTRA.match(linea)
+        if not m:
+            continue
+        metrica, vista, le, valor = m.groups()
+        vista = re.sub(r"\\(.)", lambda c: "\n" if c.group(1) == "n" else c.group(1), vista)
+        datos = vistas.setdefault(vista, {"cubetas": []})
+        if le is not None:
+            datos["cubetas"].append((float(le), float(valor)))
+        else:
+            datos[metrica] = float(valor)
+    return vistas
+
+
+# =======================================================
+# Pruebas
+# =======================================================
+@contextmanager
+def limite_consultas(maximo, usando=DEFAULT_DB_ALIAS):
+    """
+    Falla (AssertionError) si el bloque ejecuta más de `maximo` consultas;
+    el mensaje lista las plantillas repetidas. A diferencia de
+    assertNumQueries es un tope: bajar el número no rompe la prueba.
+
+        with limite_consultas(6):
+            self.client.get("/asistencia/exportar/", …)
+    """
+    observador = Observador()
+    with connections[usando].execute_wrapper(observador):
+        yield observador
+    if observador.consultas > maximo:
+        repetidas = "\n".join(
+            f"  {veces}× {sql[:LARGO_SQL]}" for sql, veces in observador.plantillas.most_common() if veces > 1
+        )
+        raise AssertionError(
+            f"{observador.consultas} consultas, máximo {maximo}."
+            + (f" Repetidas:\n{repetidas}" if repetidas else "")
+        )
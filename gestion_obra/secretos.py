@@ -0,0 +1,48 @@
+"""
+Secretos sin configuración previa.
+
+El ejecutable de escritorio arranca en modo producción sin variables de
+entorno; en lugar de usar una clave conocida (la del repositorio), genera
+una aleatoria la primera vez y la guarda junto a la base de datos, con
+permisos solo para el usuario. Las ejecuciones siguientes la releen, así
+que las sesiones y firmas siguen siendo válidas entre reinicios. Así se
+obtienen SECRET_KEY en producción y la clave de los tokens QR.
+"""
+import os
+import secrets
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def secreto_persistente(ruta, variable):
+    """
+    Contenido de `ruta`; si no existe, lo crea con un secreto aleatorio.
+    Si no se puede escribir, pide definir `variable` en el entorno.
+    """
+    for _ in range(50):
+        try:
+            with open(ruta, encoding="ascii") as archivo:
+                secreto = archivo.read().strip()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            raise ImproperlyConfigured(f"No se pudo leer {ruta} ({e}); defina {variable}.")
+        else:
+            if secreto:
+                return secreto
+            time.sleep(0.1)  # otro proceso lo acaba de crear y aún no lo escribe
+            continue
+
+        try:
+            # O_EXCL: si dos procesos arrancan a la vez, el segundo lee el del primero
+            descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            continue
+        except OSError as e:
+            raise ImproperlyConfigured(f"No se pudo guardar el secreto en {ruta} ({e}); defina {variable}.")
+        secreto = secrets.token_urlsafe(50)
+        with os.fdopen(descriptor, "w", encoding="ascii") as archivo:
+            archivo.write(secreto)
+        return secreto
+    raise ImproperlyConfigured(f"{ruta} está vacío; bórrelo o defina {variable}.")
@@ -0,0 +1,139 @@
+"""
+Servidor HTTP integrado para main.py (escritorio y servidor Linux).
+
+Usa waitress si está instalado; si no, un servidor WSGI de la biblioteca
+estándar que atiende cada conexión en un pool de hilos de tamaño fijo (el
+wsgiref de runserver atiende de a una o abre un hilo por conexión sin
+límite). Con `asgi=True` usa uvicorn (ServidorASGI) para la aplicación de
+gestion_obra/asgi.py. En todos los casos corre dentro del mismo proceso,
+en un hilo propio.
+"""
+import asyncio
+import logging
+import socket
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+log = logging.getLogger("tasal.servidor")
+
+
+class _Manejador(WSGIRequestHandler):
+    def log_message(self, formato, *args):
+        log.debug("%s %s", self.address_string(), formato % args)
+
+
+class ServidorWSGI(WSGIServer):
+    """WSGIServer de wsgiref con un pool de `hilos` para las conexiones."""
+
+    def __init__(self, direccion, aplicacion, hilos):
+        super().__init__(direccion, _Manejador)
+        self.set_app(aplicacion)
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="tasal-http")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ServidorASGI:
+    """
+    uvicorn en un hilo con su propio event loop. El socket se abre aquí
+    para que un puerto ocupado falle al construir, como en los otros motores.
+    """
+
+    def __init__(self, direccion, aplicacion, hilos):
+        import uvicorn
+
+        self._socket = socket.create_server(direccion)
+        self.server_port = self._socket.getsockname()[1]
+        # `hilos` no aplica: Django corre cada vista síncrona en un hilo propio
+        self._servidor = uvicorn.Server(uvicorn.Config(
+            aplicacion, lifespan="off", log_level="warning", access_log=False,
+        ))
+
+    def run(self):
+        asyncio.run(self._servidor.serve(sockets=[self._socket]))
+
+    def close(self):
+        self._servidor.should_exit = True
+
+
+class Servidor:
+    """Servidor en marcha: `url`, `detener()` y el nombre del motor usado."""
+
+    def __init__(self, aplicacion, host, puerto, hilos, asgi=False):
+        if asgi:
+            self.motor = "uvicorn"
+            self._servidor = ServidorASGI((host, puerto), aplicacion, hilos)
+            self.puerto = self._servidor.server_port
+            self._correr, self._cerrar = self._servidor.run, self._servidor.close
+        else:
+            self._crear_wsgi(aplicacion, host, puerto, hilos)
+        self.host = host
+        self._hilo = threading.Thread(target=self._correr, name="tasal-servidor", daemon=True)
+
+    def _crear_wsgi(self, aplicacion, host, puerto, hilos):
+        try:
+            from waitress.server import create_server
+        except ImportError:
+            self.motor = "wsgiref"
+            self._servidor = ServidorWSGI((host, puerto), aplicacion, hilos)
+            self.puerto = self._servidor.server_port
+            self._correr, self._cerrar = self._servidor.serve_forever, self._detener_wsgiref
+        else:
+            self.motor = "waitress"
+            self._servidor = create_server(aplicacion, host=host, port=puerto, threads=hilos)
+            self.puerto = self._servidor.effective_port
+            self._correr, self._cerrar = self._servidor.run, self._servidor.close
+
+    @property
+    def url(self):
+        host = "127.0.0.1" if self.host in ("", "0.0.0.0") else self.host
+        return f"http://{host}:{self.puerto}"
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def _detener_wsgiref(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def detener(self):
+        self._cerrar()
+
+    def esperar(self):
+        """Bloquea hasta que el servidor se detiene."""
+        self._hilo.join()
+
+
+def esperar_listo(url, limite=30.0, intervalo=0.05):
+    """
+    Sondea `url` hasta recibir un 200 o agotar `limite` segundos. Devuelve
+    los segundos que tardó; lanza TimeoutError si no respondió.
+    """
+    inicio = time.perf_counter()
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as respuesta:
+                if respuesta.status == 200:
+                    return time.perf_counter() - inicio
+        except OSError:  # aún no escucha, o respondió con error
+            pass
+        if time.perf_counter() - inicio > limite:
+            raise TimeoutError(f"{url} no respondió en {limite:.0f} s")
+        time.sleep(intervalo)
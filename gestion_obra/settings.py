@@ -8,7 +8,11 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-DEBUG = True
+# Modo producción (main.py lo activa; en un servidor, TASAL_PRODUCCION=1):
+# sin DEBUG, estáticos con hash y comprimidos y secretos desde el entorno.
+PRODUCCION = os.environ.get('TASAL_PRODUCCION') == '1'
+
+DEBUG = not PRODUCCION
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
@@ -17,9 +21,25 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-SECRET_KEY = 'django-insecure-!&h-xq@u-r84k@xy$...)'
+# TASAL_BASE_DATOS: otra ubicación de la base (p. ej. fuera del ejecutable)
+BASE_DATOS = Path(os.environ.get('TASAL_BASE_DATOS', BASE_DIR / 'db.sqlite3'))
+
+# En producción sin DJANGO_SECRET_KEY se genera una clave aleatoria y se
+# guarda junto a la base (gestion_obra/secretos.py); la del repositorio
+# solo sirve en desarrollo.
+if os.environ.get('DJANGO_SECRET_KEY'):
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+elif PRODUCCION:
+    from gestion_obra.secretos import secreto_persistente
+    SECRET_KEY = secreto_persistente(BASE_DATOS.parent / 'secret_key', 'DJANGO_SECRET_KEY')
+else:
+    SECRET_KEY = 'django-insecure-!&h-xq@u-r84k@xy$...)'
 
-ALLOWED_HOSTS = ['*']
+# En producción, por default solo este equipo; `main.py --servidor` agrega
+# el nombre y la IP de red del equipo para las tabletas.
+ALLOWED_HOSTS = os.environ.get(
+    'DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1,[::1]' if PRODUCCION else '*'
+).split(',')
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -33,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gestion_obra.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,7 +86,21 @@ WSGI_APPLICATION = 'gestion_obra.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': BASE_DATOS,
+        'OPTIONS': {
+            # Varios escáneres escriben a la vez: WAL deja leer mientras se
+            # escribe, BEGIN IMMEDIATE toma el candado de escritura al inicio
+            # (evita el "database is locked" al promover un candado de lectura)
+            # y timeout es el busy_timeout en segundos.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Base de pruebas en archivo para que las pruebas de concurrencia
+        # usen conexiones reales entre hilos.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -92,3 +127,140 @@ LOGIN_REDIRECT_URL = '/bienvenido/'
 # LOGOUT_REDIRECT_URL = '/api/asistencia-elegir/'
 # ruta absoluta donde Django volcará todos los staticfiles
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# En producción collectstatic nombra los archivos con su hash y deja copias
+# .gz; gestion_obra/estaticos.py los sirve con caché de un año.
+if PRODUCCION:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'gestion_obra.estaticos.EstaticosComprimidos'},
+    }
+
+# --------------------------
+# SERVIDOR INTEGRADO (main.py)
+# --------------------------
+TASAL_SERVIDOR_HILOS = int(os.environ.get('TASAL_SERVIDOR_HILOS', 8))
+# Segundos desde que arranca main.py hasta que /salud/ responde; si se
+# excede, el arranque se registra como advertencia.
+TASAL_PRESUPUESTO_ARRANQUE = float(os.environ.get('TASAL_PRESUPUESTO_ARRANQUE', 3.0))
+
+# --------------------------
+# CACHÉ
+# --------------------------
+# En memoria del proceso, sin servicios externos. Los fragmentos de plantilla
+# de las páginas de asistencia se nombran con la versión guardada en
+# Proyecto (ver asistencia/rosters.py), así que con varios procesos cada uno
+# solo repite el render, nunca sirve una plantilla vieja. Para compartirlos
+# entre procesos basta con el backend de archivos:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': os.path.join(BASE_DIR, 'cache'),
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tasal',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    }
+}
+
+# --------------------------
+# CACHÉ DE AUTORIZACIÓN DEL ESCANEO QR
+# --------------------------
+# None: caché en memoria del proceso. Con un alias de CACHES (p. ej. 'default')
+# las entradas se comparten entre procesos del servidor.
+ASISTENCIA_CACHE_AUTORIZACION = None
+ASISTENCIA_CACHE_AUTORIZACION_TTL = 300  # segundos
+# Entradas de la caché en memoria (LRU); los ids inexistentes no se guardan
+ASISTENCIA_CACHE_AUTORIZACION_MAXIMO = 10000
+
+# --------------------------
+# MÉTRICAS (/metrics, gestion_obra/metricas.py)
+# --------------------------
+TASAL_METRICAS = True
+TASAL_METRICAS_CONSULTA_LENTA_MS = 100  # None: no anota consultas lentas
+# Veces que una misma plantilla SQL puede repetirse en una petición antes de anotarla como N+1
+TASAL_METRICAS_REPETICIONES = 10
+# Quién puede leer /metrics sin sesión de staff (el scraper de Prometheus)
+TASAL_METRICAS_IPS = ['127.0.0.1', '::1']
+
+# --------------------------
+# HORARIOS
+# --------------------------
+# Cada proceso recompila su tabla de horarios al cambiar un Horario; este
+# TTL acota lo que tarda en ver un cambio hecho desde otro proceso.
+ASISTENCIA_HORARIOS_TTL = 60  # segundos
+
+# --------------------------
+# TABLERO EN VIVO
+# --------------------------
+# Reparto de eventos de asistencia a los tableros (asistencia/tablero.py).
+# CanalLocal solo llega a los tableros conectados a este proceso.
+ASISTENCIA_TABLERO_BACKEND = 'asistencia.tablero.CanalLocal'
+# Tableros abiertos a la vez por WSGI: cada uno ocupa uno de los
+# TASAL_SERVIDOR_HILOS mientras está conectado; pasado el tope se responde
+# 503 y el tablero reintenta. Por ASGI no hay tope.
+ASISTENCIA_TABLERO_FLUJOS_WSGI = max(1, TASAL_SERVIDOR_HILOS // 4)
+
+# --------------------------
+# SINCRONIZACIÓN DELTA (apps móviles)
+# --------------------------
+# Días de asistencia que trae un paquete completo (sin token o con token podado).
+ASISTENCIA_SYNC_DIAS = 7
+# `manage.py podar_cambios` borra de la bitácora lo anterior a esto; un
+# cliente que no sincronizó en ese lapso recibe un paquete completo.
+ASISTENCIA_SYNC_RETENCION_DIAS = 30
+
+# --------------------------
+# ESCANEO QR POR ASGI (asistencia/agrupador.py)
+# --------------------------
+# Escaneos simultáneos que se graban juntos en una transacción, y cuánto
+# se espera (ms) a que lleguen más antes de grabar un lote incompleto.
+ASISTENCIA_ESCANEO_LOTE = 100
+ASISTENCIA_ESCANEO_VENTANA_MS = 0
+
+# --------------------------
+# BÚSQUEDA DE TRABAJADORES (asistencia/busqueda.py)
+# --------------------------
+# El índice en memoria se arma al arrancar el servidor (wsgi.py) y se
+# actualiza con las señales; cada tantos segundos se rearma para ver los
+# cambios hechos desde otros procesos (None: nunca).
+ASISTENCIA_BUSQUEDA_PRECARGAR = True
+ASISTENCIA_BUSQUEDA_TTL = 600
+
+# --------------------------
+# ARCHIVO DE ASISTENCIA HISTÓRICA
+# --------------------------
+# `manage.py archivar` mueve a AsistenciaArchivada los meses anteriores a los
+# últimos N (mínimo 2: el mes en curso y el anterior siguen abiertos).
+ASISTENCIA_ARCHIVO_MESES = 13
+
+# --------------------------
+# BENCHMARKS
+# --------------------------
+# Líneas base de `manage.py bench_suite` (por escala e hilos); se actualizan con --guardar
+ASISTENCIA_BENCH_LINEA_BASE = BASE_DIR / 'asistencia' / 'bench_linea_base.json'
+
+# --------------------------
+# CREDENCIALES QR
+# --------------------------
+# Los PNG se renderizan en un pool de hilos tras el commit; con
+# ASINCRONAS = False se generan en el mismo hilo (útil en pruebas).
+ASISTENCIA_CREDENCIALES_ASINCRONAS = True
+ASISTENCIA_CREDENCIALES_HILOS = 2
+# Claves HMAC de los tokens QR {id: secreto} (asistencia/tokens_qr.py): la
+# primera firma y las demás solo verifican, para rotarlas sin invalidar las
+# credenciales impresas. En producción son obligatorias.
+# TASAL_QR_CLAVES="2026b:secreto,2026a:secreto-anterior"
+ASISTENCIA_QR_CLAVES = dict(
+    c.split(':', 1) for c in os.environ.get('TASAL_QR_CLAVES', '').split(',') if c
+)
+# Sin TASAL_QR_CLAVES, en desarrollo (o en producción con
+# TASAL_QR_CLAVE_LOCAL=1, como el ejecutable de escritorio: un solo equipo)
+# se usa una clave aleatoria guardada junto a la base. tokens_qr la crea al
+# primer uso, no aquí: cargar settings no escribe nada.
+ASISTENCIA_QR_CLAVE_LOCAL = (
+    BASE_DATOS.parent / 'qr_clave'
+    if not PRODUCCION or os.environ.get('TASAL_QR_CLAVE_LOCAL') == '1' else None
+)
+ASISTENCIA_QR_VIGENCIA_DIAS = 365
+# Cada cuánto se releen las revocaciones hechas desde otros procesos
+ASISTENCIA_QR_REVOCACIONES_TTL = 60  # segundos
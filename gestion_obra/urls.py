@@ -5,13 +5,20 @@ from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
 from django.http import HttpResponse
 from django.conf import settings
-from django.conf.urls.static import static
-from asistencia.views import bienvenido_view
+from django.db import connection
+from asistencia.views import bienvenido_view, servir_media
+from gestion_obra.metricas import exponer as metricas
 
 # Vista sencilla para la página principal
 def home(request):
     return HttpResponse("Bienvenido a Constructora Electromecánica TASAL - Centro de Gestión")
 
+# Sonda de arranque (main.py espera a que responda antes de abrir la ventana)
+def salud(request):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return HttpResponse("ok", content_type="text/plain")
+
 urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
@@ -27,6 +34,8 @@ urlpatterns = [
     # Home y Bienvenida
     path('', home, name='home'),
     path('bienvenido/', bienvenido_view, name='bienvenido'),
+    path('salud/', salud, name='salud'),
+    path('metrics', metricas, name='metricas'),
 
     # API REST (ModelViewSets)
     path('api/', include('asistencia.api_urls')),
@@ -35,6 +44,9 @@ urlpatterns = [
     path('asistencia/', include('asistencia.urls')),
 ]
 
-# Servir media en DEBUG
+# Servir media en DEBUG (con Cache-Control para los archivos direccionados por contenido);
+# sin DEBUG lo hace la envoltura de gestion_obra/estaticos.py
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.*)$', servir_media),
+    ]
@@ -9,8 +9,23 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gestion_obra.settings')
 
 application = get_wsgi_application()
+
+# En producción no se sirve sin claves para las credenciales QR
+from asistencia.tokens_qr import verificar_configuracion  # noqa: E402
+verificar_configuracion()
+
+# Índice de búsqueda de trabajadores en un hilo, sin demorar el arranque
+if getattr(settings, 'ASISTENCIA_BUSQUEDA_PRECARGAR', False):
+    from asistencia.busqueda import indice_trabajadores
+    indice_trabajadores.precargar()
+
+# Sin DEBUG nadie más sirve /static/ ni /media/ (ver gestion_obra/estaticos.py)
+if not settings.DEBUG:
+    from gestion_obra.estaticos import envolver
+    application = envolver(application)
@@ -1,13 +1,193 @@
+"""
+Arranque de TASAL en modo producción, con el servidor dentro del proceso.
+
+    python main.py                  ventana de escritorio (pywebview)
+    python main.py --servidor       solo el servidor (p. ej. en Linux)
+    python main.py --medir          arranca, mide y sale (código 1 si excede el presupuesto)
+    python main.py --servidor --asgi  con uvicorn (escaneo QR async en ráfagas)
+
+La ventana se abre cuando /salud/ ya responde, no tras una espera a ciegas.
+Cada fase del arranque (hasta servir la primera página) se mide y el total
+se compara contra TASAL_PRESUPUESTO_ARRANQUE. Para ver qué cuesta importar:
+`python manage.py perfil_arranque`.
+"""
+import argparse
+import logging
 import os
-import webview
-import threading
+import sys
+import time
+
+INICIO = time.perf_counter()
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gestion_obra.settings")
+os.environ.setdefault("TASAL_PRODUCCION", "1")
+# Un solo equipo: sin TASAL_QR_CLAVES, la clave QR se genera junto a la base
+os.environ.setdefault("TASAL_QR_CLAVE_LOCAL", "1")
+
+HOST  = "127.0.0.1"
+PORT  = 8000
+TITULO = "TASAL - Control de Asistencia"
+PRIMERA_PAGINA = "/accounts/login/"
+
+log = logging.getLogger("tasal")
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=TITULO)
+    parser.add_argument("--servidor", action="store_true", help="Sin ventana: solo sirve HTTP.")
+    parser.add_argument("--medir", action="store_true", help="Mide el arranque y sale.")
+    parser.add_argument("--host", default=None, help=f"Default {HOST}; 0.0.0.0 con --servidor.")
+    parser.add_argument("--puerto", type=int, default=PORT, help="0 elige uno libre.")
+    parser.add_argument("--hilos", type=int, default=None, help="Default TASAL_SERVIDOR_HILOS.")
+    parser.add_argument("--asgi", action="store_true", help="Sirve gestion_obra/asgi.py con uvicorn.")
+    parser.add_argument("--sin-migrar", action="store_true", help="No aplica migraciones pendientes.")
+    return parser.parse_args()
+
+
+def nombres_del_equipo():
+    """
+    Nombres con los que las tabletas de la red llegan a este equipo: los
+    locales, el nombre del equipo y la IP de la interfaz de salida (un
+    connect UDP no envía nada ni consulta DNS).
+    """
+    import socket
+
+    nombres = ["localhost", "127.0.0.1", "[::1]", socket.gethostname()]
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("10.255.255.255", 1))
+            nombres.append(s.getsockname()[0])
+    except OSError:
+        pass
+    return nombres
+
+
+def migraciones_pendientes():
+    """
+    True si algún archivo de migración no figura en django_migrations. Listar
+    las carpetas y hacer una consulta cuesta mucho menos que cargar el grafo
+    de migraciones como hace `migrate`. Si no se pueden listar (módulos
+    dentro del ejecutable) se asume que sí hay pendientes.
+    """
+    from importlib.util import find_spec
+
+    from django.apps import apps
+    from django.db import DatabaseError, connection
+
+    en_disco = set()
+    for app in apps.get_app_configs():
+        spec = find_spec(f"{app.name}.migrations")
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for carpeta in spec.submodule_search_locations:
+            if not os.path.isdir(carpeta):
+                return True
+            en_disco.update(
+                (app.label, archivo[:-3]) for archivo in os.listdir(carpeta)
+                if archivo.endswith(".py") and archivo != "__init__.py"
+            )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT app, name FROM django_migrations")
+            aplicadas = set(cursor.fetchall())
+    except DatabaseError:  # base nueva
+        return True
+    return not en_disco <= aplicadas
+
+
+def preparar(migrar=True):
+    """Configura Django y deja base y estáticos listos; devuelve la aplicación WSGI."""
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    django.setup()
+    if migrar and migraciones_pendientes():
+        call_command("migrate", interactive=False, verbosity=0)
+    manifiesto = os.path.join(settings.STATIC_ROOT, "staticfiles.json")
+    if settings.PRODUCCION and not os.path.exists(manifiesto):
+        # Primera ejecución sin estáticos empaquetados: nombres con hash y .gz
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    from gestion_obra.wsgi import application
+    return application
+
+
+def main():
+    args = _argumentos()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    fases = {}
+    marca = INICIO
+
+    def fase(nombre):
+        nonlocal marca
+        ahora = time.perf_counter()
+        fases[nombre] = ahora - marca
+        marca = ahora
+
+    host = args.host or ("0.0.0.0" if args.servidor else HOST)
+    if host == "0.0.0.0":
+        # Sin DJANGO_ALLOWED_HOSTS la producción solo acepta localhost
+        os.environ.setdefault("DJANGO_ALLOWED_HOSTS", ",".join(nombres_del_equipo()))
+
+    aplicacion = preparar(migrar=not args.sin_migrar)
+    fase("django")
+
+    from django.conf import settings
+    from gestion_obra.servidor import Servidor, esperar_listo
+
+    hilos = args.hilos or settings.TASAL_SERVIDOR_HILOS
+    asgi = args.asgi
+    if asgi:
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            log.warning("uvicorn no está instalado; se sirve por WSGI.")
+            asgi = False
+        else:
+            from gestion_obra.asgi import application as aplicacion
+    try:
+        servidor = Servidor(aplicacion, host, args.puerto, hilos, asgi=asgi).iniciar()
+    except OSError:
+        if args.servidor:
+            raise
+        # Escritorio: si el puerto está ocupado cualquier otro sirve
+        servidor = Servidor(aplicacion, host, 0, hilos, asgi=asgi).iniciar()
+    fase("escucha")
+
+    esperar_listo(f"{servidor.url}/salud/")
+    fase("listo")
+    esperar_listo(f"{servidor.url}{PRIMERA_PAGINA}", limite=10)
+    fase("primera_pagina")
+
+    total = sum(fases.values())
+    presupuesto = settings.TASAL_PRESUPUESTO_ARRANQUE
+    detalle = ", ".join(f"{n} {s * 1000:.0f} ms" for n, s in fases.items())
+    nivel = logging.INFO if total <= presupuesto else logging.WARNING
+    log.log(nivel, "Arranque en %.2f s (presupuesto %.1f s): %s; %s con %d hilos en %s",
+            total, presupuesto, detalle, servidor.motor, hilos, servidor.url)
+
+    if args.medir:
+        servidor.detener()
+        return 0 if total <= presupuesto else 1
+
+    if not args.servidor:
+        try:
+            import webview
+        except ImportError:
+            log.warning("pywebview no está instalado; abra %s en el navegador.", servidor.url)
+        else:
+            webview.create_window(TITULO, servidor.url, width=1200, height=800)
+            webview.start()
+            servidor.detener()
+            return 0
 
-# Cambia este puerto si ya está en uso
-PORT = 8000
+    try:
+        servidor.esperar()
+    except KeyboardInterrupt:
+        servidor.detener()
+    return 0
 
-def start_django():
-    os.system(f"python manage.py runserver {PORT}")
 
 if __name__ == '__main__':
-    threading.Thread(target=start_django, daemon=True).start()
-    webview.create_window("TASAL - Control de Asistencia", f"http://127.0.0.1:{PORT}", width=1200, height=800)
+    sys.exit(main())
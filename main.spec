@@ -1,12 +1,31 @@
 # -*- mode: python ; coding: utf-8 -*-
+# El servidor corre dentro del ejecutable (main.py): Django, las apps y sus
+# plantillas y los estáticos ya recolectados (collectstatic con
+# TASAL_PRODUCCION=1) viajan en el paquete.
+from PyInstaller.utils.hooks import collect_data_files, collect_submodules
 
+hiddenimports = (
+    collect_submodules('gestion_obra')
+    + collect_submodules('asistencia')
+    + collect_submodules('rest_framework')
+    + collect_submodules('django.contrib')
+    # compacto.py la importa al primer uso; en el ejecutable siempre va la
+    # ruta vectorizada
+    + ['numpy']
+)
+datas = (
+    collect_data_files('asistencia')
+    + collect_data_files('rest_framework')
+    + collect_data_files('django.contrib.admin')
+    + [('templates', 'templates'), ('staticfiles', 'staticfiles')]
+)
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=datas,
+    hiddenimports=hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,120 @@
+// cola_escaneos.js
+// Cola de escaneos QR en IndexedDB. Cada escaneo se guarda con su hora del
+// dispositivo, una clave única y, si la credencial es nueva, su token
+// firmado; la cola se envía en lotes a /asistencia/sincronizar-qr/ y solo se
+// borra lo que el servidor confirmó. Reenviar un lote es seguro: el
+// servidor deduplica por clave.
+
+const ColaEscaneos = (() => {
+  const DB_NOMBRE = 'TASAL_Escaneos';
+  const STORE     = 'pendientes';
+  const TAM_LOTE  = 200;
+  const URL_SYNC  = '/asistencia/sincronizar-qr/';
+
+  let sincronizando = false;
+  let dbPromesa     = null;
+
+  function abrir() {
+    if (!dbPromesa) {
+      dbPromesa = new Promise((resolve, reject) => {
+        const req = indexedDB.open(DB_NOMBRE, 1);
+        req.onupgradeneeded = () => {
+          req.result.createObjectStore(STORE, { keyPath: 'clave' });
+        };
+        req.onsuccess = () => resolve(req.result);
+        req.onerror   = () => reject(req.error);
+      });
+    }
+    return dbPromesa;
+  }
+
+  function transaccion(modo, fn) {
+    return abrir().then(db => new Promise((resolve, reject) => {
+      const tx    = db.transaction(STORE, modo);
+      const store = tx.objectStore(STORE);
+      const res   = fn(store);
+      tx.oncomplete = () => resolve(res && 'result' in res ? res.result : undefined);
+      tx.onerror    = () => reject(tx.error);
+    }));
+  }
+
+  function nuevaClave(deviceId) {
+    if (window.crypto && crypto.randomUUID) {
+      return crypto.randomUUID();
+    }
+    return `${deviceId}-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+  }
+
+  function encolar(deviceId, trabajadorId, token) {
+    const escaneo = {
+      clave:      nuevaClave(deviceId),
+      device_id:  deviceId,
+      trabajador: trabajadorId,
+      timestamp:  new Date().toISOString(),
+    };
+    if (token) {
+      escaneo.token = token;
+    }
+    return transaccion('readwrite', store => store.add(escaneo)).then(() => escaneo);
+  }
+
+  function pendientes() {
+    return transaccion('readonly', store => store.getAll());
+  }
+
+  function borrar(claves) {
+    return transaccion('readwrite', store => claves.forEach(c => store.delete(c)));
+  }
+
+  function csrfToken() {
+    const m = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return m ? decodeURIComponent(m[1]) : '';
+  }
+
+  // Envía la cola agrupada por dispositivo, en lotes de TAM_LOTE.
+  // Devuelve la lista de resultados que confirmó el servidor.
+  async function sincronizar() {
+    if (sincronizando || !navigator.onLine) {
+      return [];
+    }
+    sincronizando = true;
+    const confirmados = [];
+    try {
+      const registros = await pendientes();
+      const porDispositivo = {};
+      registros.forEach(r => (porDispositivo[r.device_id] = porDispositivo[r.device_id] || []).push(r));
+
+      for (const [deviceId, lista] of Object.entries(porDispositivo)) {
+        for (let i = 0; i < lista.length; i += TAM_LOTE) {
+          const lote = lista.slice(i, i + TAM_LOTE);
+          const resp = await fetch(URL_SYNC, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken() },
+            body: JSON.stringify({
+              device_id: deviceId,
+              escaneos:  lote.map(({ clave, trabajador, timestamp, token }) => ({ clave, trabajador, timestamp, token })),
+            }),
+          });
+          if (!resp.ok) {
+            // Error del servidor o dispositivo no autorizado: se conserva la cola.
+            console.error('Error sincronizando escaneos, status:', resp.status);
+            return confirmados;
+          }
+          const { results } = await resp.json();
+          await borrar(results.map(r => r.clave));
+          confirmados.push(...results);
+        }
+      }
+    } catch (error) {
+      console.error('Sin conexión al sincronizar escaneos:', error);
+    } finally {
+      sincronizando = false;
+    }
+    return confirmados;
+  }
+
+  window.addEventListener('online', () => sincronizar());
+  setInterval(() => sincronizar(), 15000);
+
+  return { encolar, pendientes, sincronizar };
+})();
@@ -1,10 +1,11 @@
-const CACHE_NAME = 'asistencia-shell-v1';
+const CACHE_NAME = 'asistencia-shell-v2';
 const APP_SHELL = [
   '/',
   '/static/manifest.json',
   '/static/icons/icon-192.png',
   '/static/icons/icon-512.png',
   '/asistencia/scan-offline/',       // tu HTML
+  '/static/js/cola_escaneos.js',
   'https://unpkg.com/html5-qrcode@2.4.1/minified/html5-qrcode.min.js'
 ];
 
@@ -8,28 +8,23 @@ import {
   StyleSheet, 
   Alert 
 } from 'react-native';
-import AsyncStorage from '@react-native-async-storage/async-storage';
-import axios from 'axios';
+import { datosLocales, sincronizar } from '../services/sincronizacion';
 
 export default function ProjectSelectionScreen({ navigation }) {
   const [projects, setProjects] = useState([]);
   const [loading, setLoading] = useState(true);
 
-  // Función para obtener los proyectos del servidor o de la copia local
+  // Función para obtener los proyectos: sincroniza solo los cambios con el
+  // servidor y, sin conexión, usa la copia local
   const fetchProjects = async () => {
     try {
-      // Reemplaza la URL con la de tu API en la nube
-      const response = await axios.get('http://YOUR_SERVER_DOMAIN/api/projects/');
-      setProjects(response.data);
-
-      // Guarda los proyectos en AsyncStorage para usarlos offline
-      await AsyncStorage.setItem('projects', JSON.stringify(response.data));
+      const datos = await sincronizar();
+      setProjects(Object.values(datos.proyectos));
     } catch (error) {
       Alert.alert('Error', 'No se pudieron cargar los proyectos en línea, cargando copia local.');
-      // Si falla, intenta cargar desde almacenamiento local
-      const storedProjects = await AsyncStorage.getItem('projects');
-      if (storedProjects !== null) {
-        setProjects(JSON.parse(storedProjects));
+      const datos = await datosLocales();
+      if (datos.token !== null) {
+        setProjects(Object.values(datos.proyectos));
       } else {
         Alert.alert('Error', 'No hay proyectos almacenados localmente.');
       }
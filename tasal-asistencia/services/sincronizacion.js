@@ -0,0 +1,48 @@
+import AsyncStorage from '@react-native-async-storage/async-storage';
+import axios from 'axios';
+
+// Reemplaza la URL con la de tu API en la nube
+const URL_SYNC = 'http://YOUR_SERVER_DOMAIN/asistencia/sync/';
+const CLAVE = 'sync_datos';
+
+const vacio = () => ({ token: null, proyectos: {}, trabajadores: {}, dispositivos: {}, asistencias: {} });
+
+const aplicar = (lista, bajas, destino) => {
+  lista.forEach((fila) => { destino[fila.id] = fila; });
+  bajas.forEach((id) => { delete destino[id]; });
+};
+
+// Copia local de proyectos, trabajadores, dispositivos y asistencias
+export const datosLocales = async () => {
+  const guardado = await AsyncStorage.getItem(CLAVE);
+  return guardado !== null ? JSON.parse(guardado) : vacio();
+};
+
+// Pide al servidor solo lo que cambió desde el último token (axios acepta gzip)
+// y lo aplica sobre la copia local. Sin conexión lanza el error y la copia
+// local sigue siendo válida.
+export const sincronizar = async () => {
+  const local = await datosLocales();
+  const params = local.token !== null ? { token: local.token } : {};
+  const { data } = await axios.get(URL_SYNC, { params });
+
+  const datos = data.completo ? vacio() : local;
+  aplicar(data.proyectos, data.proyectos_baja, datos.proyectos);
+  aplicar(data.trabajadores, data.trabajadores_baja, datos.trabajadores);
+  aplicar(data.dispositivos, data.dispositivos_baja, datos.dispositivos);
+  // La baja de un proyecto o trabajador arrastra sus asistencias
+  Object.keys(datos.asistencias).forEach((llave) => {
+    const proyecto = llave.split('|')[0];
+    if (!(proyecto in datos.proyectos)) delete datos.asistencias[llave];
+  });
+  data.asistencias.forEach((dia) => {
+    datos.asistencias[`${dia.proyecto}|${dia.fecha}`] = dia.filas;
+  });
+  Object.keys(datos.asistencias).forEach((llave) => {
+    datos.asistencias[llave] = datos.asistencias[llave].filter((fila) => fila.trabajador in datos.trabajadores);
+  });
+
+  datos.token = data.token;
+  await AsyncStorage.setItem(CLAVE, JSON.stringify(datos));
+  return datos;
+};